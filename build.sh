@@ -4,5 +4,7 @@ set -o errexit
 
 pip install -r requirements.txt
 
+# builds the CSS bundles, hashes every file into staticfiles.json and writes
+# .gz/.br variants, so WhiteNoise can serve them compressed and cache them forever
 python manage.py collectstatic --no-input
 python manage.py migrate
\ No newline at end of file
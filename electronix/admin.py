@@ -1,35 +1,89 @@
+from django.conf import settings
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
 from .models import Product, Customer, Order, OrderProduct, Review, FounderInfo, ReviewLike
 
+# unfiltered changelists of tables estimated above this many rows show the
+# planner's estimate instead of running COUNT(*) over the whole table
+ESTIMATED_COUNT_ABOVE = getattr(settings, 'ADMIN_ESTIMATED_COUNT_ABOVE', 100_000)
+
+
+class EstimatedCountPaginator(Paginator):
+    """Pages a changelist without counting every row of a huge table.
+
+    On PostgreSQL an unfiltered list takes its total from pg_class.reltuples,
+    kept current by autovacuum; filtered lists, small tables and other
+    databases count exactly.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                    [connection.ops.quote_name(queryset.model._meta.db_table)],
+                )
+                row = cursor.fetchone()
+            # -1 until the table is first analyzed
+            if row and row[0] > ESTIMATED_COUNT_ABOVE:
+                return row[0]
+        return super().count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelist settings for tables that grow with traffic"""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False  # skips the second COUNT(*) behind "N of M selected"
+
+
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ('name', 'price', 'stock', 'is_active', 'created_date')
+    list_display = ('name', 'sku', 'price', 'stock', 'is_active', 'created_date')
     list_filter = ('is_active',)
-    search_fields = ('name', 'details')
+    search_fields = ('name', 'sku', 'details')
 
 @admin.register(Customer)
 class CustomerAdmin(admin.ModelAdmin):
     list_display = ('user', 'phone', 'created_date')
+    list_select_related = ('user',)
     search_fields = ('user__username', 'phone')
+    raw_id_fields = ('user',)
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(LargeTableAdmin):
     list_display = ('id', 'customer', 'status', 'total_price', 'created_date')
     list_filter = ('status',)
+    list_select_related = ('customer__user',)
+    autocomplete_fields = ('customer',)
 
 @admin.register(OrderProduct)
-class OrderProductAdmin(admin.ModelAdmin):
+class OrderProductAdmin(LargeTableAdmin):
     list_display = ('order', 'product', 'quantity', 'price')
+    list_select_related = ('order__customer__user', 'product')
+    raw_id_fields = ('order',)
+    autocomplete_fields = ('product',)
 
 @admin.register(Review)
 class ReviewAdmin(admin.ModelAdmin):
     list_display = ('title', 'customer', 'rating', 'is_approved')
     list_filter = ('is_approved', 'rating')
+    list_select_related = ('customer__user',)
+    search_fields = ('title',)
+    autocomplete_fields = ('customer',)
 
 @admin.register(FounderInfo)
 class FounderInfoAdmin(admin.ModelAdmin):
     list_display = ('name', 'position', 'is_active')
 
 @admin.register(ReviewLike)
-class ReviewLikeAdmin(admin.ModelAdmin):
-    list_display = ('review', 'customer', 'created_date')
\ No newline at end of file
+class ReviewLikeAdmin(LargeTableAdmin):
+    list_display = ('review', 'customer', 'created_date')
+    list_select_related = ('review__customer__user', 'customer__user')
+    raw_id_fields = ('review',)
+    autocomplete_fields = ('customer',)
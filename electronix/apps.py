@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class ElectronixConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'electronix'
+
+    def ready(self):
+        from django.core import checks
+
+        from . import signals  # noqa: F401
+        from .likes import check_write_behind_cache
+
+        checks.register(check_write_behind_cache, checks.Tags.caches)
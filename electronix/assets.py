@@ -0,0 +1,111 @@
+"""CSS bundles built at collectstatic time.
+
+Each bundle in ASSET_BUNDLES is concatenated and minified next to its sources,
+then hashed and pre-compressed (gzip and brotli) with everything else, so a
+page links one immutable file instead of one file per stylesheet.
+"""
+import posixpath
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+# bundle name -> source stylesheets, in cascade order
+ASSET_BUNDLES = getattr(settings, 'ASSET_BUNDLES', {
+    'storefront': ['electronics/sixth.css', 'electronics/account_menu.css'],
+    'checkout': ['electronics/sixth.css'],
+    'account': ['electronics/allauth_styles.css'],
+    'about': ['electronics/allauth_styles.css', 'electronics/about_us.css'],
+    'cart': ['electronics/allauth_styles.css', 'electronics/cart.css'],
+    'login': ['electronics/login.css'],
+    'signup': ['electronics/signup.css'],
+    'google-auth': ['electronics/google_auth.css'],
+})
+
+# string literals and url() values are copied through untouched
+_PROTECTED = re.compile(r'''"(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|url\([^)]*\)''')
+_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+_SPACE = re.compile(r'\s+')
+_AROUND_PUNCTUATION = re.compile(r'\s*([{};,>])\s*')
+
+
+def bundle_path(name):
+    """Static path of bundle name, beside its sources so relative url()s still resolve"""
+    sources = ASSET_BUNDLES[name]
+    directories = {posixpath.dirname(source) for source in sources}
+    if len(directories) != 1:
+        raise ImproperlyConfigured(f"CSS bundle {name!r} mixes sources from {sorted(directories)}")
+    return posixpath.join(directories.pop(), f'{name}.bundle.css')
+
+
+def _minify_code(css):
+    css = _SPACE.sub(' ', css)
+    css = _AROUND_PUNCTUATION.sub(r'\1', css)
+    return css.replace(';}', '}')
+
+
+def minify_css(css):
+    """Strip comments and collapse whitespace, leaving strings and url()s alone"""
+    css = _COMMENT.sub('', css)
+    out, position = [], 0
+    for match in _PROTECTED.finditer(css):
+        out.append(_minify_code(css[position:match.start()]))
+        out.append(match.group())
+        position = match.end()
+    out.append(_minify_code(css[position:]))
+    return ''.join(out).strip()
+
+
+def build_bundle(name):
+    """Minified concatenation of bundle name's sources, found through the staticfiles finders"""
+    parts = []
+    for source in ASSET_BUNDLES[name]:
+        path = finders.find(source)
+        if path is None:
+            raise ImproperlyConfigured(f"CSS bundle {name!r} source {source!r} was not found")
+        with open(path, encoding='utf-8') as f:
+            parts.append(minify_css(f.read()))
+    return '\n'.join(parts) + '\n'
+
+
+def manifest_loaded():
+    """True once collectstatic has written the manifest of hashed names"""
+    return bool(getattr(staticfiles_storage, 'hashed_files', None))
+
+
+def asset_version():
+    """Hash of the collectstatic manifest, empty before there is one; changes whenever a hashed name does"""
+    return getattr(staticfiles_storage, 'manifest_hash', '')
+
+
+def bundle_is_built(name):
+    """True once collectstatic has put bundle name into the manifest"""
+    return manifest_loaded() and bundle_path(name) in staticfiles_storage.hashed_files
+
+
+class BundledStaticFilesStorage(CompressedManifestStaticFilesStorage):
+    """Manifest storage that writes the CSS bundles before hashing and compressing.
+
+    Until collectstatic has written a manifest (development, tests) names are
+    served unhashed instead of failing every {% static %} lookup.  Once there
+    is a manifest, a name missing from it raises ValueError as usual.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            for name in ASSET_BUNDLES:
+                path = bundle_path(name)
+                if self.exists(path):
+                    self.delete(path)
+                self.save(path, ContentFile(build_bundle(name).encode()))
+                paths[path] = (self, path)
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+
+    def stored_name(self, name):
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
@@ -0,0 +1,108 @@
+"""Async twins of the read-heavy views in views.py, routed when ASYNC_VIEWS is on"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.db import DEFAULT_DB_ALIAS
+from django.shortcuts import aget_object_or_404, render
+from django.utils.http import urlencode
+from django.views import View
+
+from .cart import aget_cart_summary
+from .catalog import DEFAULT_SORT, SORTS, acart_lines, aget_catalog_page, overlay_cart
+from .fragments import aload_versions
+from .inventory import astock_levels, overlay_stock
+from .likes import apending_likes
+from .models import FounderInfo, Product, Review, ReviewLike
+from .recommendations import arelated_products
+from .reviews import aget_review_page
+from .stats import aget_storefront_stats, rating_summary
+
+
+async def _render(request, template_name, context):
+    request.user = await request.auser()
+    # rendered on a thread: {% cache %} only has the sync cache API, one lookup
+    # per product or review card, each of which would block the event loop on
+    # Redis or the file cache
+    return await sync_to_async(render)(request, template_name, context)
+
+
+@login_required(login_url='account_login')
+async def laptops(request):
+    sort = request.GET.get('sort', DEFAULT_SORT)
+    if sort not in SORTS:
+        sort = DEFAULT_SORT
+    cursor = request.GET.get('cursor')
+    user = await request.auser()
+    page, lines, summary, versions = await asyncio.gather(
+        aget_catalog_page(sort, cursor), acart_lines(user), aget_cart_summary(user),
+        aload_versions('catalog'),
+    )
+    products = page['products']
+    overlay_cart(products, user, lines)
+    overlay_stock(products, await astock_levels([product.id for product in products]))
+
+    next_cursor = page['next_cursor']
+    return await _render(request, "electronics/products_page.html", {
+        'products': products,
+        'next_url': '?' + urlencode({'sort': sort, 'cursor': next_cursor}) if next_cursor else None,
+        'first_url': '?' + urlencode({'sort': sort}) if cursor else None,
+        'cart_summary': summary,
+        'fragment_versions': versions,
+    })
+
+
+async def about_us(request):
+    counters, versions = await asyncio.gather(aget_storefront_stats(), aload_versions('founders'))
+    return await _render(request, 'electronics/about_us.html', {
+        # lazy: read only when the founder grid is cold, on the render thread;
+        # the grid is a shared cache, filled from the primary
+        'founders': FounderInfo.objects.using(DEFAULT_DB_ALIAS).filter(is_active=True).order_by('created_date'),
+        'fragment_versions': versions,
+        'total_products': counters['active_products'],
+        'total_orders': counters['placed_orders'],
+        'total_reviews': counters['approved_reviews'],
+    })
+
+
+async def product_detail(request, pk):
+    product = await aget_object_or_404(Product, pk=pk)
+    overlay_stock([product], {product.id: product.stock})
+    return await _render(request, 'electronics/detail.html', {
+        'product': product, 'related_products': await arelated_products(product)
+    })
+
+
+class ListReviewsView(View):
+    async def get(self, request):
+        cursor = request.GET.get('cursor')
+        page, counters, versions = await asyncio.gather(
+            aget_review_page(cursor), aget_storefront_stats(), aload_versions('reviews'),
+        )
+        next_cursor = page['next_cursor']
+        return await _render(request, 'electronics/review_list.html', {
+            'reviews': page['reviews'],
+            'next_url': '?' + urlencode({'cursor': next_cursor}) if next_cursor else None,
+            'first_url': '?' if cursor else None,
+            'rating_summary': rating_summary(counters),
+            'fragment_versions': versions,
+        })
+
+
+class ReviewDetailView(View):
+    async def get(self, request, pk):
+        review = await aget_object_or_404(Review.objects.select_related('customer__user'), pk=pk)
+        user = await request.auser()
+        pending, has_liked = await asyncio.gather(
+            apending_likes(review.id), _has_liked(review, user),
+        )
+        review.likes += pending
+        return await _render(request, 'electronics/review_detail.html', {
+            'review': review, 'object': review, 'has_liked': has_liked,
+        })
+
+
+async def _has_liked(review, user):
+    if not user.is_authenticated:
+        return False
+    return await ReviewLike.objects.filter(review=review, customer__user=user).aexists()
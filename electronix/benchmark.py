@@ -0,0 +1,415 @@
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import (
+    CaptureQueriesContext, setup_databases, setup_test_environment, teardown_databases, teardown_test_environment,
+)
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+
+from . import cart, reports, urls
+from .catalog import invalidate_catalog
+from .inventory import OutOfStock
+from .likes import recount_likes
+from .stats import reconcile
+from .models import Product, Customer, Order, OrderProduct, Review, ReviewLike
+
+# Maximum number of SQL queries (session and user lookups included) each named
+# URL may run.  Budgets are independent of data volume: a view that walks a
+# relation per row will blow through its budget once the seed is large enough.
+QUERY_BUDGETS = {
+    'main-page': 2,
+    'laptops-list': 6,
+    'product-search': 6,
+    'about-us': 6,
+    'product-detail': 6,  # the random fallback scans twice when it wraps around the id range
+    'electronics-cart': 6,
+    'create-order': 10,
+    'update_cart': 10,
+    'update_cart_in_cart': 10,
+    'remove_from_cart': 10,
+    'clear_cart': 10,
+    # one small JSON response per click instead of a redirect and a full page
+    'cart_api_summary': 3,
+    'cart_api_add': 10,
+    'cart_api_subtract': 10,
+    'cart_api_remove': 10,
+    'cart_api_clear': 10,
+    'checkout': 6,
+    'order_success': 2,
+    'submit_review': 4,
+    'review_thanks': 3,
+    'review_list': 6,
+    'review_detail': 6,
+    'toggle_review_like': 12,
+    'contact_support': 3,
+    'metrics': 2,
+    'sales_report': 8,  # one query per report section, over the rollups only
+    'debug_google': 0,
+    'forgotpass': 2,
+    'account_login': 4,
+    'account_signup': 4,
+    'account_logout': 4,
+    'account_email': 8,
+    'account_email_verification_sent': 4,
+    'account_confirm_email': 6,
+    'account_change_password': 6,
+    'account_set_password': 4,
+    'account_reset_password': 4,
+    'account_reset_password_done': 4,
+    'account_reset_password_from_key': 6,
+    'account_reset_password_from_key_done': 4,
+    'policy': 3,
+    'socialaccount_connections': 6,
+    'terms': 3,
+    'privacy': 3,
+}
+
+POST_VIEWS = {
+    'create-order', 'update_cart', 'update_cart_in_cart', 'remove_from_cart',
+    'clear_cart', 'toggle_review_like',
+    'cart_api_add', 'cart_api_subtract', 'cart_api_remove', 'cart_api_clear',
+}
+# run last, they empty the shopper's cart
+DESTRUCTIVE_VIEWS = ['cart_api_remove', 'remove_from_cart', 'cart_api_clear', 'clear_cart']
+
+
+BRANDS = {
+    'Asus': ['ROG Zephyrus', 'TUF Gaming', 'Zenbook', 'Vivobook'],
+    'Acer': ['Predator Helios', 'Nitro', 'Swift', 'Aspire'],
+    'Dell': ['XPS', 'Alienware', 'Inspiron', 'Latitude'],
+    'Lenovo': ['ThinkPad Carbon', 'Legion', 'Yoga', 'IdeaPad'],
+    'MSI': ['Titan', 'Stealth', 'Katana', 'Prestige'],
+    'Apple': ['MacBook Air', 'MacBook Pro'],
+}
+CPUS = ['Intel Core i5', 'Intel Core i7', 'Intel Core i9', 'AMD Ryzen 7', 'AMD Ryzen 9', 'Apple M3']
+GPUS = ['RTX 4050', 'RTX 4060', 'RTX 4070', 'RTX 4080', 'RTX 4090', 'Integrated graphics']
+FEATURES = [
+    'OLED display', '240Hz panel', 'Thunderbolt 4', 'backlit keyboard', 'Wi-Fi 7',
+    'fingerprint reader', 'aluminium chassis', 'long battery life', 'vapor chamber cooling',
+    'quiet fans', 'webcam shutter', 'USB-C charging',
+]
+
+
+# the bench commands cache in this process only: the configured cache may be
+# shared with a running server, which must never see throwaway rows
+BENCH_CACHES = {'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'electronix-bench',
+}}
+
+
+@contextmanager
+def throwaway_database():
+    """Run the block on a fresh test database and a private in-memory cache, both dropped after"""
+    setup_test_environment(debug=False)
+    old_config = setup_databases(verbosity=0, interactive=False, aliases={'default'})
+    try:
+        with override_settings(CACHES=BENCH_CACHES):
+            try:
+                yield
+            finally:
+                cache.clear()
+    finally:
+        teardown_databases(old_config, verbosity=0)
+        teardown_test_environment()
+
+
+def _product_name(rng, i):
+    brand = rng.choice(list(BRANDS))
+    return (
+        f"{brand} {rng.choice(BRANDS[brand])} {rng.randint(13, 18)}\" #{i} / {rng.choice(CPUS)} / "
+        f"{rng.choice([8, 16, 32, 64])}GB RAM / {rng.choice([512, 1024, 2048])}GB SSD / {rng.choice(GPUS)}"
+    )
+
+
+@dataclass
+class Seed:
+    shopper: User
+    product: Product | None
+    review: Review | None
+    cart_line: OrderProduct | None
+
+
+@dataclass
+class ViewTiming:
+    name: str
+    method: str
+    status: int
+    queries: int
+    budget: int
+    median_ms: float
+    max_ms: float
+
+    @property
+    def over_budget(self):
+        return self.queries > self.budget
+
+    @property
+    def failed(self):
+        # a crash runs few queries, it must not pass as within budget
+        return self.status >= 500
+
+
+def seed_shop(products=2000, customers=500, reviews=3000, orders=2000, cart_lines=20, seed=0):
+    """Bulk-insert a realistic shop and return the shopper used for measuring"""
+    rng = random.Random(seed)
+    password = make_password('benchmark')
+
+    User.objects.bulk_create(
+        User(username=f"bench-{i}", email=f"bench-{i}@example.com", password=password)
+        for i in range(customers)
+    )
+    users = list(User.objects.filter(username__startswith='bench-').order_by('id'))
+    Customer.objects.bulk_create(Customer(user=user) for user in users)
+    customer_list = list(Customer.objects.filter(user__in=users).order_by('id'))
+
+    Product.objects.bulk_create(
+        (
+            Product(
+                name=_product_name(rng, i),
+                image='products/macbook.png',
+                price=Decimal(rng.randint(400, 4000)),
+                details=" ".join(rng.choice(FEATURES) for _ in range(12)) * 4,
+                stock=rng.randint(0, 50),
+            )
+            for i in range(products)
+        ),
+        batch_size=1000,
+    )
+    product_list = list(Product.objects.order_by('id'))
+    invalidate_catalog()
+
+    Review.objects.bulk_create(
+        Review(
+            customer=rng.choice(customer_list), title=f"Review {i}",
+            content="Solid machine for the price. " * 10, rating=rng.randint(1, 5),
+        )
+        for i in range(reviews)
+    )
+
+    statuses = ['pending', 'processing', 'shipped', 'completed']
+    now = timezone.now()
+    Order.objects.bulk_create(
+        Order(
+            customer=rng.choice(customer_list), status=rng.choice(statuses),
+            placed_date=now - timedelta(days=rng.randint(0, 90)),
+        )
+        for _ in range(orders)
+    )
+    lines, placed = [], list(Order.objects.order_by('id'))
+    for order in placed:
+        for product in rng.sample(product_list, rng.randint(1, 4)):
+            line = OrderProduct(order=order, product=product, quantity=rng.randint(1, 3), price=product.price)
+            lines.append(line)
+            order.total_price += line.subtotal
+            order.line_count += 1
+            order.unit_count += line.quantity
+    OrderProduct.objects.bulk_create(lines, batch_size=1000)
+    Order.objects.bulk_update(placed, ['total_price', 'line_count', 'unit_count'], batch_size=1000)
+
+    shopper = customer_list[0]
+    cart = Order.objects.create(customer=shopper, status='cart')
+    cart_items = OrderProduct.objects.bulk_create(
+        OrderProduct(order=cart, product=product, quantity=2, price=product.price)
+        for product in product_list[:cart_lines]
+    )
+    cart.update_total()
+
+    reconcile()
+    reports.backfill()
+
+    review = Review.objects.order_by('id').first()
+    if review:
+        ReviewLike.objects.bulk_create(
+            ReviewLike(review=review, customer=customer) for customer in customer_list[1:50]
+        )
+        recount_likes()  # bulk_create skips the counter
+    return Seed(
+        shopper=shopper.user, product=product_list[-1] if product_list else None,
+        review=review, cart_line=cart_items[-1] if cart_items else None,
+    )
+
+
+def _url_kwargs(pattern, seed):
+    values = {
+        'pk': seed.review.pk if pattern.name.startswith('review') else seed.product.pk,
+        'product_id': seed.cart_line.product_id,
+        'item_id': seed.cart_line.pk,
+        'review_id': seed.review.pk,
+        'action': 'add',
+        'key': 'benchmark',
+        'uidb36': '1',
+    }
+    return {name: values[name] for name in pattern.pattern.converters}
+
+
+def view_cases(seed):
+    """(name, method, path) for every named URL in electronix.urls, safe ones first"""
+    cases = []
+    for pattern in urls.urlpatterns:
+        if not isinstance(pattern, URLPattern) or not pattern.name:
+            continue
+        method = 'post' if pattern.name in POST_VIEWS else 'get'
+        path = reverse(pattern.name, kwargs=_url_kwargs(pattern, seed))
+        cases.append((pattern.name, method, path))
+    return sorted(cases, key=lambda case: DESTRUCTIVE_VIEWS.index(case[0]) + 1
+                  if case[0] in DESTRUCTIVE_VIEWS else 0)
+
+
+def measure_views(client, seed, repeat=3):
+    """Time every named view and count the queries of its last run"""
+    results = []
+    for name, method, path in view_cases(seed):
+        timings = []
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                response = getattr(client, method)(path)
+                timings.append((time.perf_counter() - start) * 1000)
+        results.append(ViewTiming(
+            name=name, method=method.upper(), status=response.status_code,
+            queries=len(queries), budget=QUERY_BUDGETS.get(name, 0),
+            median_ms=statistics.median(timings), max_ms=max(timings),
+        ))
+    return results
+
+
+def format_table(results):
+    lines = [f"{'view':<40} {'method':<6} {'status':>6} {'queries':>8} {'budget':>6} {'p50 ms':>9} {'max ms':>9}"]
+    for row in results:
+        flag = '  ERROR' if row.failed else '  OVER' if row.over_budget else ''
+        lines.append(
+            f"{row.name:<40} {row.method:<6} {row.status:>6} {row.queries:>8} {row.budget:>6} "
+            f"{row.median_ms:>9.2f} {row.max_ms:>9.2f}{flag}"
+        )
+    return "\n".join(lines)
+
+
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+}
+
+
+@dataclass
+class SessionQueries:
+    engine: str
+    name: str
+    method: str
+    queries: float
+    session_queries: float
+
+
+def _session_cases(seed):
+    product_id = seed.cart_line.product_id
+    return [
+        ('laptops-list', 'get', reverse('laptops-list')),
+        ('electronics-cart', 'get', reverse('electronics-cart')),
+        # sets a flash message
+        ('update_cart', 'post', reverse('update_cart', args=[product_id, 'add'])),
+    ]
+
+
+def measure_sessions(seed, repeat=20):
+    """Queries per request, and how many of them touch django_session, under each session engine"""
+    results = []
+    for engine, backend in SESSION_ENGINES.items():
+        with override_settings(SESSION_ENGINE=backend):
+            client = Client()
+            client.force_login(seed.shopper)
+            for name, method, path in _session_cases(seed):
+                getattr(client, method)(path)  # warm the caches the view itself uses
+                with CaptureQueriesContext(connection) as queries:
+                    for _ in range(repeat):
+                        getattr(client, method)(path)
+                session = sum('django_session' in query['sql'] for query in queries)
+                results.append(SessionQueries(
+                    engine=engine, name=name, method=method.upper(),
+                    queries=len(queries) / repeat, session_queries=session / repeat,
+                ))
+    return results
+
+
+def format_sessions(results):
+    lines = [f"{'engine':<10} {'view':<20} {'method':<6} {'queries':>8} {'session':>8}"]
+    for row in results:
+        lines.append(
+            f"{row.engine:<10} {row.name:<20} {row.method:<6} {row.queries:>8.1f} {row.session_queries:>8.1f}"
+        )
+    return "\n".join(lines)
+
+
+@dataclass
+class CheckoutRace:
+    shoppers: int
+    stock: int
+    placed: int
+    remaining: int
+    spare_remaining: int
+    seconds: float
+
+    @property
+    def rejected(self):
+        return self.shoppers - self.placed
+
+    @property
+    def consistent(self):
+        """No unit sold twice, and rejected checkouts took nothing from their other line"""
+        return (
+            self.placed <= self.stock
+            and self.remaining == self.stock - self.placed
+            and self.spare_remaining == self.shoppers - self.placed
+        )
+
+    @property
+    def rate(self):
+        return self.shoppers / self.seconds if self.seconds else 0
+
+
+def checkout_race(shoppers=200, stock=50, workers=16):
+    """Check out shoppers carts at once from a pool of threads.
+
+    Every cart holds one unit of a product with only stock units and one of a
+    product with enough for everybody, so the first stock checkouts succeed
+    and the others must fail without taking their second line.
+    """
+    # bulk_create, like seed_shop, so no image derivatives land in the real MEDIA_ROOT
+    hot, spare = Product.objects.bulk_create([
+        Product(name="Limited edition", image='products/macbook.png', price=Decimal('1999.00'), stock=stock),
+        Product(name="Laptop sleeve", image='products/macbook.png', price=Decimal('29.00'), stock=shoppers),
+    ])
+    User.objects.bulk_create(User(username=f"race-{i}") for i in range(shoppers))
+    Customer.objects.bulk_create(Customer(user=user) for user in User.objects.filter(username__startswith='race-'))
+    buyers = list(Customer.objects.filter(user__username__startswith='race-').order_by('id'))
+    for customer in buyers:
+        cart.add_to_cart(customer, hot)
+        cart.add_to_cart(customer, spare)
+
+    def buy(customer):
+        try:
+            return cart.checkout(customer) is not None
+        except OutOfStock:
+            return False
+        finally:
+            connection.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(workers) as pool:
+        placed = sum(pool.map(buy, buyers))
+    seconds = time.perf_counter() - start
+
+    hot.refresh_from_db()
+    spare.refresh_from_db()
+    return CheckoutRace(shoppers, stock, placed, hot.stock, spare.stock, seconds)
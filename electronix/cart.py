@@ -0,0 +1,285 @@
+import json
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import Decimal
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Subquery
+from django.utils import timezone
+
+from . import reports
+from .inventory import reserve
+from .models import Customer, Order, OrderProduct
+
+CART_SUMMARY_CACHE_TIMEOUT = getattr(settings, 'CART_SUMMARY_CACHE_TIMEOUT', 600)
+# carts untouched for this long are deleted by manage.py expire_carts
+CART_TTL_DAYS = getattr(settings, 'CART_TTL_DAYS', 30)
+EXPIRE_BATCH_SIZE = 500
+
+# {customer id: user id} of the carts _expire_batch is deleting
+_expiring_owners = ContextVar('expiring_owners', default=None)
+
+
+class CartSummary(NamedTuple):
+    lines: int
+    units: int
+    total: Decimal
+
+
+EMPTY_SUMMARY = CartSummary(0, 0, Decimal('0.00'))
+
+
+def _summary_key(user_id):
+    return f"cart-summary:{user_id}"
+
+
+def _summary_row(user):
+    return (
+        Order.objects.filter(customer__user=user, status='cart')
+        .order_by('id')
+        .values_list('line_count', 'unit_count', 'total_price')
+    )
+
+
+def get_cart_summary(user):
+    """Cached line count, unit count and total of the user's cart"""
+    key = _summary_key(user.pk)
+    summary = cache.get(key)
+    if summary is None:
+        row = _summary_row(user).first()
+        summary = CartSummary(*row) if row else EMPTY_SUMMARY
+        cache.set(key, summary, CART_SUMMARY_CACHE_TIMEOUT)
+    return summary
+
+
+async def aget_cart_summary(user):
+    key = _summary_key(user.pk)
+    summary = await cache.aget(key)
+    if summary is None:
+        row = await _summary_row(user).afirst()
+        summary = CartSummary(*row) if row else EMPTY_SUMMARY
+        await cache.aset(key, summary, CART_SUMMARY_CACHE_TIMEOUT)
+    return summary
+
+
+def cart_state(customer, **line):
+    """The cart line matching line (None once it is gone, or when line is empty) and a fresh CartSummary.
+
+    One query when the line still exists, its order row carries the totals.
+    """
+    item = line and (
+        OrderProduct.objects.select_related('order')
+        .filter(order__customer=customer, order__status='cart', **line).first()
+    )
+    if item:
+        return item, CartSummary(item.order.line_count, item.order.unit_count, item.order.total_price)
+    row = (
+        Order.objects.filter(customer=customer, status='cart').order_by('id')
+        .values_list('line_count', 'unit_count', 'total_price').first()
+    )
+    return None, CartSummary(*row) if row else EMPTY_SUMMARY
+
+
+def invalidate_cart_summary(user_id):
+    transaction.on_commit(lambda: cache.delete(_summary_key(user_id)))
+
+
+def order_user_id(order):
+    """User id behind order's customer, without a query for a cached customer or an expiring cart"""
+    owners = _expiring_owners.get() or {}
+    if order.customer_id in owners and not Order.customer.is_cached(order):
+        return owners[order.customer_id]
+    return order.customer.user_id
+
+
+def get_cart(customer, lock=False):
+    """Return the customer's open cart order or None"""
+    orders = Order.objects.filter(customer=customer, status='cart')
+    if lock:
+        orders = orders.select_for_update()
+    order = orders.order_by('id').first()
+    if order is not None:
+        # saves and deletes of the order then reach the signals without looking the customer up
+        order.customer = customer
+    return order
+
+
+def _adjust(order, total, lines=0, units=0):
+    Order.objects.filter(pk=order.pk).update(
+        total_price=F('total_price') + total,
+        line_count=F('line_count') + lines,
+        unit_count=F('unit_count') + units,
+        updated_date=timezone.now(),
+    )
+
+
+def _drop_if_empty(order):
+    # callers hold the cart row lock, so the count cannot change before the delete
+    if Order.objects.filter(pk=order.pk, line_count=0).exists():
+        order.delete()
+
+
+def add_to_cart(customer, product, quantity=1):
+    """Add quantity of product to the customer's cart, creating the cart if needed"""
+    with transaction.atomic():
+        order = get_cart(customer, lock=True)
+        if order is None:
+            try:
+                with transaction.atomic():
+                    order = Order.objects.create(customer=customer, status='cart', total_price=0)
+            except IntegrityError:
+                # a concurrent request opened the cart first, one cart per customer is enforced
+                order = get_cart(customer, lock=True)
+
+        lines = OrderProduct.objects.filter(order=order, product=product)
+        if lines.update(quantity=F('quantity') + quantity):
+            line_price = Subquery(lines.values('price')[:1])
+            _adjust(order, line_price * quantity, units=quantity)
+        else:
+            OrderProduct.objects.create(
+                order=order, product=product, quantity=quantity, price=product.price
+            )
+            _adjust(order, product.price * quantity, lines=1, units=quantity)
+        invalidate_cart_summary(customer.user_id)
+    return order
+
+
+def subtract_from_cart(customer, product):
+    """Take one unit of product out of the cart.
+
+    Returns the remaining quantity (0 when the line was removed) or None when
+    the product is not in the cart.
+    """
+    with transaction.atomic():
+        order = get_cart(customer, lock=True)
+        if order is None:
+            return None
+        line = OrderProduct.objects.filter(order=order, product=product).first()
+        if line is None:
+            return None
+
+        if line.quantity > 1:
+            OrderProduct.objects.filter(pk=line.pk).update(quantity=F('quantity') - 1)
+            remaining = line.quantity - 1
+            _adjust(order, -line.price, units=-1)
+        else:
+            OrderProduct.objects.filter(pk=line.pk).delete()
+            remaining = 0
+            _adjust(order, -line.price, lines=-1, units=-1)
+            _drop_if_empty(order)
+        invalidate_cart_summary(customer.user_id)
+    return remaining
+
+
+def remove_line(customer, item_id):
+    """Delete a cart line owned by the customer, returns False if it was not found"""
+    with transaction.atomic():
+        order = get_cart(customer, lock=True)
+        line = OrderProduct.objects.filter(id=item_id, order=order).first() if order else None
+        if line is None:
+            return False
+        OrderProduct.objects.filter(pk=line.pk).delete()
+        _adjust(order, -line.price * line.quantity, lines=-1, units=-line.quantity)
+        _drop_if_empty(order)
+        invalidate_cart_summary(customer.user_id)
+    return True
+
+
+def clear_cart(customer):
+    """Delete the customer's cart, returns False if there was none"""
+    with transaction.atomic():
+        order = get_cart(customer, lock=True)
+        if order is None:
+            return False
+        order.delete()
+    return True
+
+
+def checkout(customer):
+    """Reserve the stock of the customer's cart and place it as a pending order.
+
+    Returns the order, or None when there is nothing to check out.  Raises
+    inventory.OutOfStock, leaving the cart as it was, when a line cannot be filled.
+    """
+    with transaction.atomic():
+        # the cart row lock makes a double submit wait, then find no cart
+        order = get_cart(customer, lock=True)
+        if order is None or order.line_count == 0:
+            return None
+        reserve(order)
+        order.status = 'pending'
+        order.save()
+    return order
+
+
+@dataclass
+class ExpiryResult:
+    carts: int = 0
+    lines: int = 0
+
+    @property
+    def rows(self):
+        return self.carts + self.lines
+
+
+def _archive(out, ids):
+    lines = {}
+    for order_id, product_id, quantity, price in (
+        OrderProduct.objects.filter(order_id__in=ids).values_list('order_id', 'product_id', 'quantity', 'price')
+    ):
+        lines.setdefault(order_id, []).append({'product': product_id, 'quantity': quantity, 'price': str(price)})
+    for order_id, customer_id, created, updated, total in (
+        Order.objects.filter(pk__in=ids).order_by('id')
+        .values_list('id', 'customer_id', 'created_date', 'updated_date', 'total_price')
+    ):
+        out.write(json.dumps({
+            'id': order_id, 'customer': customer_id, 'created_date': created.isoformat(),
+            'updated_date': updated.isoformat(), 'total_price': str(total), 'lines': lines.get(order_id, []),
+        }) + '\n')
+
+
+def _expire_batch(idle, batch_size, archive):
+    """Delete up to batch_size idle carts in one short transaction, returns (carts, lines)"""
+    with transaction.atomic():
+        # carts a shopper is changing right now are left for the next run
+        rows = list(idle.select_for_update(skip_locked=True).order_by('id').values_list('id', 'customer_id')[:batch_size])
+        if not rows:
+            return 0, 0
+        ids = [order_id for order_id, _ in rows]
+        if archive:
+            _archive(archive, ids)
+        # the order delete signals take the carts out of the rollups and drop their cached
+        # summaries; one customer query and one rollup write per day serve the whole batch
+        owners = dict(Customer.objects.filter(pk__in={customer_id for _, customer_id in rows}).values_list('id', 'user_id'))
+        token = _expiring_owners.set(owners)
+        try:
+            with reports.batched_rollups():
+                _, deleted = Order.objects.filter(pk__in=ids).delete()
+        finally:
+            _expiring_owners.reset(token)
+    return deleted.get(Order._meta.label, 0), deleted.get(OrderProduct._meta.label, 0)
+
+
+def expire_carts(ttl=None, batch_size=EXPIRE_BATCH_SIZE, archive=None, progress=None):
+    """Delete carts not changed for ttl (a timedelta, CART_TTL_DAYS by default), a batch at a time.
+
+    Each batch is its own transaction, so locks are held only briefly however
+    many carts have piled up.  archive, if given, is a text file that gets one
+    JSON line per cart with its lines before they are deleted; progress, if
+    given, is called with the running ExpiryResult after every batch.
+    """
+    cutoff = timezone.now() - (ttl if ttl is not None else timedelta(days=CART_TTL_DAYS))
+    idle = Order.objects.filter(status='cart', updated_date__lt=cutoff)
+    result = ExpiryResult()
+    while True:
+        carts, lines = _expire_batch(idle, batch_size, archive)
+        if not carts:
+            return result
+        result.carts += carts
+        result.lines += lines
+        if progress:
+            progress(result)
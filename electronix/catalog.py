@@ -0,0 +1,161 @@
+import base64
+import binascii
+import json
+import time
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Q
+from django.db.models.functions import Substr
+
+from .models import Product, OrderProduct
+
+CATALOG_PAGE_SIZE = getattr(settings, 'CATALOG_PAGE_SIZE', 24)
+CATALOG_CACHE_TIMEOUT = getattr(settings, 'CATALOG_CACHE_TIMEOUT', 300)
+GENERATION_KEY = 'catalog:generation'
+
+# sort name -> (keyset field, descending); ties are broken by id
+SORTS = {
+    'newest': ('created_date', True),
+    'oldest': ('created_date', False),
+    'price_low': ('price', False),
+    'price_high': ('price', True),
+}
+DEFAULT_SORT = 'newest'
+
+_PARSERS = {
+    'created_date': datetime.fromisoformat,
+    'price': Decimal,
+}
+
+
+def _generation():
+    """Current catalog generation, moved whenever a product changes.
+
+    Generations are nanosecond timestamps, not counters, so one recreated
+    after the cache evicted it is newer than every key cached before.
+    """
+    return cache.get_or_set(GENERATION_KEY, time.time_ns, None)
+
+
+async def _ageneration():
+    return await cache.aget_or_set(GENERATION_KEY, time.time_ns, None)
+
+
+def _bump_generation():
+    cache.set(GENERATION_KEY, time.time_ns(), None)
+
+
+def invalidate_catalog():
+    """Drop every cached catalog page by moving to a new generation.
+
+    The move happens on commit, so a concurrent reader cannot cache the old
+    rows under the new generation.
+    """
+    transaction.on_commit(_bump_generation)
+
+
+def encode_cursor(field, product):
+    value = getattr(product, field)
+    value = value.isoformat() if isinstance(value, datetime) else str(value)
+    raw = json.dumps([value, product.pk]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(field, cursor):
+    """Return (value, pk) for a cursor, or None if it is missing or malformed"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        value, pk = json.loads(raw)
+        return _PARSERS[field](value), int(pk)
+    except (binascii.Error, ValueError, TypeError, InvalidOperation, UnicodeDecodeError):
+        return None
+
+
+def _page_queryset(sort, position):
+    field, descending = SORTS[sort]
+    products = (
+        # pages are cached under the generation the primary has moved to, so
+        # they are built from the primary, never from a lagging replica
+        Product.objects.using(DEFAULT_DB_ALIAS).filter(is_active=True)
+        .only('id', 'name', 'image', 'image_variants', 'price', 'created_date')
+        .annotate(summary=Substr('details', 1, 300))
+    )
+    if position:
+        value, pk = position
+        op = 'lt' if descending else 'gt'
+        products = products.filter(
+            Q(**{f'{field}__{op}': value}) | Q(**{field: value, f'id__{op}': pk})
+        )
+    prefix = '-' if descending else ''
+    return products.order_by(f'{prefix}{field}', f'{prefix}id')[:CATALOG_PAGE_SIZE + 1]
+
+
+def _page(sort, products):
+    next_cursor = None
+    if len(products) > CATALOG_PAGE_SIZE:
+        products = products[:CATALOG_PAGE_SIZE]
+        next_cursor = encode_cursor(SORTS[sort][0], products[-1])
+    return {'products': products, 'next_cursor': next_cursor}
+
+
+def _build_page(sort, position):
+    return _page(sort, list(_page_queryset(sort, position)))
+
+
+def _page_position(sort, cursor):
+    """Validate sort and cursor, returns (sort, cursor, position)"""
+    if sort not in SORTS:
+        sort = DEFAULT_SORT
+    position = decode_cursor(SORTS[sort][0], cursor)
+    return sort, cursor if position else None, position
+
+
+def _page_key(generation, sort, cursor):
+    return f"catalog:{generation}:{sort}:{cursor or 'first'}"
+
+
+def get_catalog_page(sort=DEFAULT_SORT, cursor=None):
+    """Return a cached page of active products and the cursor of the following page"""
+    sort, cursor, position = _page_position(sort, cursor)
+    key = _page_key(_generation(), sort, cursor)
+    page = cache.get(key)
+    if page is None:
+        page = _build_page(sort, position)
+        cache.set(key, page, CATALOG_CACHE_TIMEOUT)
+    return page
+
+
+async def aget_catalog_page(sort=DEFAULT_SORT, cursor=None):
+    """Async get_catalog_page for the ASGI views"""
+    sort, cursor, position = _page_position(sort, cursor)
+    key = _page_key(await _ageneration(), sort, cursor)
+    page = await cache.aget(key)
+    if page is None:
+        page = _page(sort, [product async for product in _page_queryset(sort, position)])
+        await cache.aset(key, page, CATALOG_CACHE_TIMEOUT)
+    return page
+
+
+def _cart_lines(user):
+    return OrderProduct.objects.filter(
+        order__customer__user=user, order__status='cart'
+    ).only('id', 'order_id', 'product_id', 'quantity', 'price')
+
+
+async def acart_lines(user):
+    """The user's cart lines keyed by product id, to hand to overlay_cart"""
+    return {item.product_id: item async for item in _cart_lines(user)}
+
+
+def overlay_cart(products, user, lines=None):
+    """Attach the user's cart line (or None) to each product"""
+    if lines is None:
+        lines = {item.product_id: item for item in _cart_lines(user)}
+    for product in products:
+        product.cart_item = lines.get(product.id)
@@ -0,0 +1,250 @@
+"""Streaming bulk import and export of the product catalog (CSV or JSON Lines).
+
+Rows are read, validated and written one chunk at a time, so memory stays flat
+however large the file is.  Bulk writes skip the model signals, so the catalog
+cache and the stored counters are refreshed once at the end instead.
+"""
+import csv
+import hashlib
+import json
+from dataclasses import dataclass
+from itertools import islice
+from pathlib import Path
+
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+
+from . import stats
+from .catalog import invalidate_catalog
+from .inventory import invalidate_stock
+from .models import Product
+
+FIELDS = ['sku', 'name', 'price', 'stock', 'is_active', 'details', 'image']
+REQUIRED_ON_CREATE = ('name', 'price', 'image')
+KEYS = ('sku', 'name')
+FORMATS = ('csv', 'jsonl')
+IMPORT_BATCH_SIZE = 2000
+# bulk_update's CASE WHEN grows with every row, its cost is quadratic in the batch
+UPDATE_BATCH_SIZE = 200
+EXPORT_CHUNK_SIZE = 2000
+
+# spreadsheet spellings the model's BooleanField would reject
+_BOOLEANS = {'true': True, 'yes': True, 'y': True, '1': True, 'false': False, 'no': False, 'n': False, '0': False}
+
+
+@dataclass
+class ImportResult:
+    created: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    invalid: int = 0
+
+    @property
+    def rows(self):
+        return self.created + self.updated + self.unchanged + self.invalid
+
+
+def guess_format(path):
+    suffix = Path(path).suffix.lower().lstrip('.')
+    return 'jsonl' if suffix in ('jsonl', 'ndjson') else 'csv'
+
+
+def read_rows(path, fmt):
+    """Yield (line number, row dict) lazily; undecodable JSON lines come back as ValidationError"""
+    with open(path, newline='', encoding='utf-8') as f:
+        if fmt == 'csv':
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+            return
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                yield line_number, ValidationError(f"not valid JSON: {exc}")
+                continue
+            if not isinstance(row, dict):
+                row = ValidationError("expected a JSON object")
+            yield line_number, row
+
+
+def clean_row(row, key):
+    """Validate the known columns of row with the model fields, no queries.
+
+    Missing or empty columns are left out, so an update keeps the stored value
+    and a new product gets the field default.
+    """
+    if isinstance(row, ValidationError):
+        raise row
+    cleaned, errors = {}, {}
+    for name in FIELDS:
+        value = row.get(name)
+        if isinstance(value, str) and name != 'details':
+            value = value.strip()
+        if value is None or value == '':
+            continue
+        if name == 'is_active' and isinstance(value, str):
+            value = _BOOLEANS.get(value.lower(), value)
+        if name == 'image':
+            cleaned[name] = str(value)
+            continue
+        try:
+            cleaned[name] = Product._meta.get_field(name).clean(value, None)
+        except ValidationError as exc:
+            errors[name] = exc.messages
+    if key not in cleaned and key not in errors:
+        errors[key] = ["This field is required."]
+    if errors:
+        raise ValidationError(errors)
+    return cleaned
+
+
+def store_image(images_dir, filename):
+    """Copy an image from images_dir into storage under a content-hashed name"""
+    root = Path(images_dir).resolve()
+    path = (root / filename).resolve()
+    if root not in path.parents or not path.is_file():
+        raise ValidationError({'image': [f"{filename} is not a file in {images_dir}"]})
+    data = path.read_bytes()
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    target = f"products/{path.stem}.{digest}{path.suffix.lower()}"
+    if not default_storage.exists(target):
+        target = default_storage.save(target, ContentFile(data))
+    return target
+
+
+def _describe(exc):
+    if hasattr(exc, 'error_dict'):
+        return '; '.join(f"{name}: {' '.join(messages)}" for name, messages in exc.message_dict.items())
+    return ' '.join(exc.messages)
+
+
+def _stored(product, name):
+    value = getattr(product, name)
+    return value.name if name == 'image' else value
+
+
+def _apply_chunk(chunk, key, images_dir, result, on_error):
+    rows = {}
+    for line_number, row in chunk:
+        try:
+            values = clean_row(row, key)
+            if images_dir and 'image' in values:
+                values['image'] = store_image(images_dir, values['image'])
+        except ValidationError as exc:
+            result.invalid += 1
+            on_error(line_number, _describe(exc))
+            continue
+        rows[values[key]] = (line_number, values)  # a later row with the same key wins
+
+    existing = {}
+    # names are not unique: the oldest product with the name is the one updated
+    for product in Product.objects.filter(**{f'{key}__in': list(rows)}).only('id', *FIELDS).order_by('-id'):
+        existing[getattr(product, key)] = product
+
+    new, changed, lines = [], {}, {}
+    for value, (line_number, values) in rows.items():
+        product = existing.get(value)
+        if product is None:
+            missing = [name for name in REQUIRED_ON_CREATE if name not in values]
+            if missing:
+                result.invalid += 1
+                on_error(line_number, f"new product needs {', '.join(missing)}")
+                continue
+            product = Product(**values)
+            new.append(product)
+            lines[id(product)] = line_number
+            continue
+        # only rewrite what differs, an unchanged name would also churn the search index
+        fields = tuple(sorted(name for name, field_value in values.items() if _stored(product, name) != field_value))
+        if not fields:
+            result.unchanged += 1
+            continue
+        for name in fields:
+            setattr(product, name, values[name])
+        # bulk_update writes one column set per call
+        changed.setdefault(fields, []).append(product)
+        lines[id(product)] = line_number
+
+    try:
+        with transaction.atomic():
+            _write(new, changed)
+    except IntegrityError:
+        # a sku already belongs to another product: redo the chunk row by row to report the offenders
+        with transaction.atomic():
+            new, changed = _write_each(new, changed, lines, result, on_error)
+    result.created += len(new)
+    result.updated += sum(len(products) for products in changed.values())
+    # bulk_update sends no signals, the cards would show the old availability
+    restocked = [product.pk for fields, products in changed.items() if 'stock' in fields for product in products]
+    if restocked:
+        invalidate_stock(restocked)
+
+
+def _write(new, changed):
+    Product.objects.bulk_create(new, batch_size=IMPORT_BATCH_SIZE)
+    for fields, products in changed.items():
+        Product.objects.bulk_update(products, fields, batch_size=UPDATE_BATCH_SIZE)
+
+
+def _write_each(new, changed, lines, result, on_error):
+    """Write every product in its own savepoint, returns the (new, changed) that were written"""
+    writes = [(product, {}) for product in new]
+    writes += [(product, {fields: [product]}) for fields, products in changed.items() for product in products]
+    written_new, written_changed = [], {}
+    for product, update in writes:
+        try:
+            with transaction.atomic():
+                _write([] if update else [product], update)
+        except IntegrityError as exc:
+            result.invalid += 1
+            on_error(lines[id(product)], f"conflicts with another product: {exc}")
+            continue
+        if update:
+            fields, = update
+            written_changed.setdefault(fields, []).append(product)
+        else:
+            written_new.append(product)
+    return written_new, written_changed
+
+
+def import_catalog(rows, key='sku', images_dir=None, batch_size=IMPORT_BATCH_SIZE,
+                   on_error=None, progress=None):
+    """Upsert products from (line number, row) pairs, keyed on key, one batch per transaction.
+
+    Invalid rows are skipped and passed to on_error(line, message); progress,
+    if given, is called with the running ImportResult after every batch.
+    """
+    if key not in KEYS:
+        raise ValueError(f"key must be one of {KEYS}")
+    result = ImportResult()
+    on_error = on_error or (lambda line, message: None)
+    rows = iter(rows)
+    try:
+        while chunk := list(islice(rows, batch_size)):
+            _apply_chunk(chunk, key, images_dir, result, on_error)
+            if progress:
+                progress(result)
+    finally:
+        invalidate_catalog()
+        stats.reconcile(['active_products'])
+    return result
+
+
+def export_catalog(out, fmt='csv', chunk_size=EXPORT_CHUNK_SIZE):
+    """Write every product to out, streamed from a server-side cursor, returns the row count"""
+    products = Product.objects.order_by('id').values_list(*FIELDS).iterator(chunk_size=chunk_size)
+    count = 0
+    if fmt == 'csv':
+        writer = csv.writer(out)
+        writer.writerow(FIELDS)
+        for count, row in enumerate(products, 1):
+            writer.writerow(['' if value is None else value for value in row])
+    else:
+        for count, row in enumerate(products, 1):
+            out.write(json.dumps(dict(zip(FIELDS, row)), default=str) + '\n')
+    return count
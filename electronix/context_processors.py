@@ -0,0 +1,17 @@
+from django.utils.functional import SimpleLazyObject
+
+from .cart import get_cart_summary
+from .fragments import FragmentVersions
+
+
+def cart_summary(request):
+    """Expose the cached cart summary as `cart_summary` for the navigation badge"""
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return {}
+    return {'cart_summary': SimpleLazyObject(lambda: get_cart_summary(user))}
+
+
+def fragment_versions(request):
+    """Expose fragment generations as `fragment_versions` for `{% cache %}` keys"""
+    return {'fragment_versions': FragmentVersions()}
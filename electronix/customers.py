@@ -0,0 +1,55 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils.functional import SimpleLazyObject
+
+from .models import Customer
+
+CUSTOMER_CACHE_TIMEOUT = getattr(settings, 'CUSTOMER_CACHE_TIMEOUT', 3600)
+
+
+def _customer_key(user_id):
+    return f"customer:{user_id}"
+
+
+def get_customer(user):
+    """The user's Customer row from cache, created only if signup missed it"""
+    key = _customer_key(user.pk)
+    customer = cache.get(key)
+    if customer is None:
+        # from the primary, a lagging replica may not have the row yet
+        customer = Customer.objects.using(DEFAULT_DB_ALIAS).filter(user=user).first()
+        if customer is None:
+            # accounts created before signup started making the row
+            customer, _ = Customer.objects.get_or_create(user=user)
+        customer._state.fields_cache.pop('user', None)  # the user is not cached with it
+        cache.set(key, customer, CUSTOMER_CACHE_TIMEOUT)
+    customer.user = user
+    return customer
+
+
+def invalidate_customer(user_id):
+    transaction.on_commit(lambda: cache.delete(_customer_key(user_id)))
+
+
+class CustomerMiddleware:
+    """Attach the signed-in user's customer to the request as `request.customer`.
+
+    Resolved lazily on first use, so requests that never touch it stay free.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        request.customer = SimpleLazyObject(lambda: _request_customer(request))
+        return self.get_response(request)
+
+
+def _request_customer(request):
+    return get_customer(request.user) if request.user.is_authenticated else None
@@ -0,0 +1,63 @@
+import hashlib
+import os
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.template.loader import get_template
+from django.utils.http import quote_etag
+
+from .assets import asset_version
+from .catalog import GENERATION_KEY as CATALOG_GENERATION_KEY
+
+# fragment family -> cache key of its generation; the generation is part of
+# every `{% cache %}` key of the family, so moving it retires them all at once.
+# Generations are nanosecond timestamps: one recreated after an eviction is
+# newer than every fragment cached before, where a counter would restart at 1.
+GENERATION_KEYS = {
+    'catalog': CATALOG_GENERATION_KEY,  # moved by catalog.invalidate_catalog
+    'founders': 'founders:generation',
+    'reviews': 'reviews:generation',
+}
+STATIC_PAGE_CACHE_TIMEOUT = getattr(settings, 'STATIC_PAGE_CACHE_TIMEOUT', 3600)
+
+
+def bump(name):
+    """Move a fragment family to a new generation once its model changes commit"""
+    key = GENERATION_KEYS[name]
+    transaction.on_commit(lambda: cache.set(key, time.time_ns(), None))
+
+
+class FragmentVersions:
+    """Generation of each fragment family, read from the cache on first use"""
+
+    def __init__(self, loaded=None):
+        self._loaded = dict(loaded or {})
+
+    def __getitem__(self, name):
+        if name not in self._loaded:
+            self._loaded[name] = cache.get_or_set(GENERATION_KEYS[name], time.time_ns, None)
+        return self._loaded[name]
+
+
+async def aload_versions(*names):
+    """FragmentVersions with names preloaded, so async views render without sync cache calls"""
+    return FragmentVersions({
+        name: await cache.aget_or_set(GENERATION_KEYS[name], time.time_ns, None) for name in names
+    })
+
+
+def static_page(template_name):
+    """Return (body, ETag, Last-Modified timestamp) of a page that is the same for every visitor"""
+    template = get_template(template_name)
+    modified = int(os.path.getmtime(template.origin.name))
+    # the body links hashed bundles, so a deploy with new static files needs new keys
+    key = f"static-page:{template_name}:{modified}:{asset_version()}"
+    page = cache.get(key)
+    if page is None:
+        # rendered without the request, so nothing per-visitor can end up in the cache
+        body = template.render().encode()
+        page = (body, quote_etag(hashlib.md5(body).hexdigest()), modified)
+        cache.set(key, page, STATIC_PAGE_CACHE_TIMEOUT)
+    return page
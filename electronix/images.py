@@ -0,0 +1,81 @@
+import hashlib
+import io
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+# target widths of the derivatives, only those narrower than the original are built
+IMAGE_WIDTHS = getattr(settings, 'IMAGE_WIDTHS', (320, 640, 960))
+# transparent uploads are flattened onto the card background for the JPEG fallback
+IMAGE_FLATTEN_COLOR = getattr(settings, 'IMAGE_FLATTEN_COLOR', '#0f0f0f')
+
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def _target_widths(width):
+    widths = [w for w in IMAGE_WIDTHS if w < width]
+    return widths or [width]
+
+
+def _encode(image, fmt):
+    pil_format, options = FORMATS[fmt]
+    if fmt == 'jpeg' and image.mode != 'RGB':
+        background = Image.new('RGB', image.size, IMAGE_FLATTEN_COLOR)
+        background.paste(image, mask=image.getchannel('A') if image.mode == 'RGBA' else None)
+        image = background
+    buffer = io.BytesIO()
+    image.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def build_variants(name, storage=default_storage):
+    """Write WebP and JPEG derivatives of a stored image next to it.
+
+    Returns the mapping stored in ``image_variants``: the source name and its
+    width plus, per format, ``{width: derivative name}``.  Derivative names
+    carry a hash of their content, so an unchanged file is never rewritten and
+    can be served with a far-future cache lifetime.
+    """
+    with storage.open(name, 'rb') as fh:
+        original = Image.open(fh)
+        original = ImageOps.exif_transpose(original)
+        original = original.convert('RGBA' if 'A' in original.getbands() or 'transparency' in original.info else 'RGB')
+
+    path = PurePosixPath(name)
+    variants = {'source': name, 'width': original.width}
+    for width in _target_widths(original.width):
+        height = max(1, round(original.height * width / original.width))
+        resized = original.resize((width, height), Image.LANCZOS) if width != original.width else original
+        for fmt in FORMATS:
+            data = _encode(resized, fmt)
+            digest = hashlib.sha256(data).hexdigest()[:12]
+            target = str(path.with_name(f"{path.stem}.{digest}.{width}w.{fmt}"))
+            if not storage.exists(target):
+                target = storage.save(target, ContentFile(data))
+            variants.setdefault(fmt, {})[str(width)] = target
+    return variants
+
+
+def refresh_variants(instance, field_name='image'):
+    """Rebuild the derivatives of instance's image if they are missing or stale"""
+    image = getattr(instance, field_name)
+    current = instance.image_variants or {}
+    if not image:
+        if current:
+            instance.image_variants = {}
+            instance.save(update_fields=['image_variants'])
+        return
+    if current.get('source') == image.name:
+        return
+    try:
+        instance.image_variants = build_variants(image.name, image.storage)
+    except (OSError, Image.DecompressionBombError):
+        # unreadable or missing upload, keep serving the original
+        return
+    instance.save(update_fields=['image_variants'])
@@ -0,0 +1,133 @@
+"""Stock reservation at checkout and the cached availability shown on product cards"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F, Q
+
+from .models import Order, OrderProduct, Product
+
+STOCK_CACHE_TIMEOUT = getattr(settings, 'STOCK_CACHE_TIMEOUT', 30)
+# cards say "only N left" at or below this level
+LOW_STOCK = getattr(settings, 'LOW_STOCK', 5)
+# checked out but not shipped yet: deleting such an order puts its stock back,
+# as does cancelling it
+RESERVED_STATUSES = ('pending', 'processing')
+
+
+class OutOfStock(Exception):
+    """The lines of an order that could not be filled, as Product rows with their current stock"""
+
+    def __init__(self, products):
+        super().__init__(', '.join(product.name for product in products))
+        self.products = products
+
+
+def _stock_key(product_id):
+    return f"stock:{product_id}"
+
+
+def invalidate_stock(product_ids):
+    keys = [_stock_key(product_id) for product_id in product_ids]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def _lines(order):
+    # taking rows in product order keeps overlapping checkouts from deadlocking
+    return list(
+        OrderProduct.objects.filter(order=order).order_by('product_id').values_list('product_id', 'quantity')
+    )
+
+
+def reserve(order):
+    """Take the stock of every line of order, all or nothing, and mark order.stock_reserved.
+
+    Each line is a conditional UPDATE ... WHERE stock >= quantity, so two
+    checkouts can never both take the last unit; if any line falls short the
+    whole transaction is rolled back and OutOfStock lists the short lines.
+    Products with untracked (NULL) stock always fill their line and stay NULL.
+    The caller saves order.
+    """
+    lines = _lines(order)
+    with transaction.atomic():
+        short = [
+            product_id for product_id, quantity in lines
+            if not Product.objects.filter(Q(stock__gte=quantity) | Q(stock__isnull=True), pk=product_id, is_active=True)
+            .update(stock=F('stock') - quantity)
+        ]
+        if short:
+            raise OutOfStock(list(Product.objects.filter(pk__in=short).order_by('id')))
+    order.stock_reserved = True
+    invalidate_stock(product_id for product_id, _ in lines)
+
+
+def release(order):
+    """Put the stock taken by order back on the shelf"""
+    lines = _lines(order)
+    for product_id, quantity in lines:
+        Product.objects.filter(pk=product_id).update(stock=F('stock') + quantity)
+    invalidate_stock(product_id for product_id, _ in lines)
+
+
+def order_deleting(order):
+    # orders placed before checkout reserved stock never took any
+    if order.stock_reserved and order.status in RESERVED_STATUSES:
+        release(order)
+
+
+def order_saving(order):
+    """Give back the stock of an order being cancelled, once however often it is saved"""
+    if order.status != 'cancelled' or not order.stock_reserved:
+        return
+    # the conditional update wins for exactly one of two concurrent cancellations
+    if Order.objects.filter(pk=order.pk, stock_reserved=True).update(stock_reserved=False):
+        release(order)
+    order.stock_reserved = False
+
+
+def untrack_stock(skus=None):
+    """Stop counting the stock of products at 0 (or only those with these skus), returns how many"""
+    products = Product.objects.filter(stock=0)
+    if skus is not None:
+        products = products.filter(sku__in=skus)
+    ids = list(products.values_list('id', flat=True))
+    Product.objects.filter(pk__in=ids).update(stock=None)
+    invalidate_stock(ids)
+    return len(ids)
+
+
+def _stock_rows(product_ids):
+    # read from the primary: the result is cached for every visitor
+    return Product.objects.using(DEFAULT_DB_ALIAS).filter(pk__in=product_ids).values_list('id', 'stock')
+
+
+def stock_levels(product_ids):
+    """{product id: units in stock or None if untracked}, from a snapshot at most STOCK_CACHE_TIMEOUT seconds old"""
+    keys = {_stock_key(product_id): product_id for product_id in product_ids}
+    levels = {keys[key]: stock for key, stock in cache.get_many(keys).items()}
+    missing = [product_id for product_id in keys.values() if product_id not in levels]
+    if missing:
+        fresh = dict(_stock_rows(missing))
+        cache.set_many({_stock_key(product_id): stock for product_id, stock in fresh.items()}, STOCK_CACHE_TIMEOUT)
+        levels.update(fresh)
+    return levels
+
+
+async def astock_levels(product_ids):
+    keys = {_stock_key(product_id): product_id for product_id in product_ids}
+    levels = {keys[key]: stock for key, stock in (await cache.aget_many(keys)).items()}
+    missing = [product_id for product_id in keys.values() if product_id not in levels]
+    if missing:
+        fresh = {product_id: stock async for product_id, stock in _stock_rows(missing)}
+        await cache.aset_many({_stock_key(product_id): stock for product_id, stock in fresh.items()}, STOCK_CACHE_TIMEOUT)
+        levels.update(fresh)
+    return levels
+
+
+def overlay_stock(products, levels=None):
+    """Attach in_stock and, when running low, stock_left to each product"""
+    if levels is None:
+        levels = stock_levels([product.id for product in products])
+    for product in products:
+        stock = levels.get(product.id, 0)
+        product.in_stock = stock is None or stock > 0
+        product.stock_left = stock if stock and stock <= LOW_STOCK else None
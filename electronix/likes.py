@@ -0,0 +1,168 @@
+import time
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Review, ReviewLike
+
+DIRTY_KEY = 'review-likes:dirty'
+LOCK_KEY = 'review-likes:lock'
+
+
+# backends whose entries every web worker and the flush command see alike, and
+# whose incr, decr and add are atomic (the file and database caches read, then write)
+SHARED_CACHES = ('RedisCache', 'PyMemcacheCache', 'PyLibMCCache')
+
+
+def _shared_cache():
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    return backend.rsplit('.', 1)[-1] in SHARED_CACHES
+
+
+def write_behind():
+    """Buffer like deltas in the cache for `manage.py flush_review_likes`.
+
+    Keeps a viral review from becoming a single hot row written on every click.
+    Without a shared, atomic cache (see check_write_behind_cache) likes update
+    the row directly.
+    """
+    return getattr(settings, 'REVIEW_LIKES_WRITE_BEHIND', False) and _shared_cache()
+
+
+def check_write_behind_cache(app_configs=None, **kwargs):
+    if getattr(settings, 'REVIEW_LIKES_WRITE_BEHIND', False) and not _shared_cache():
+        return [checks.Warning(
+            "REVIEW_LIKES_WRITE_BEHIND is ignored without Redis or memcached.",
+            hint="Set REDIS_URL: flush_review_likes runs in its own process and needs a "
+                 "cache it shares with the web workers, with atomic incr and add.",
+            id='electronix.W001',
+        )]
+    return []
+
+
+def _delta_key(review_id):
+    return f"review-likes:delta:{review_id}"
+
+
+class _DirtyLock:
+    """Short cache mutex guarding the set of reviews with buffered deltas"""
+
+    def __enter__(self):
+        deadline = time.monotonic() + 5
+        while not cache.add(LOCK_KEY, 1, 10):
+            if time.monotonic() > deadline:
+                raise TimeoutError("review like buffer is locked")
+            time.sleep(0.005)
+
+    def __exit__(self, *exc):
+        cache.delete(LOCK_KEY)
+
+
+def _buffer(review_id, delta):
+    key = _delta_key(review_id)
+    try:
+        cache.incr(key, delta)
+        return
+    except ValueError:
+        pass
+    # no timeout: a delta waits for the next flush however late it runs
+    if not cache.add(key, delta, None):
+        cache.incr(key, delta)
+        return
+    # first delta since the cache evicted the key: the flusher has to learn about it
+    with _DirtyLock():
+        dirty = cache.get(DIRTY_KEY) or set()
+        dirty.add(review_id)
+        cache.set(DIRTY_KEY, dirty, None)
+
+
+def _apply(review_id, delta):
+    if not delta:
+        return
+    if write_behind():
+        transaction.on_commit(lambda: _buffer(review_id, delta))
+    else:
+        Review.objects.filter(pk=review_id).update(likes=F('likes') + delta)
+
+
+def toggle_like(review_id, customer):
+    """Like or unlike a review for customer, returns True if it is now liked.
+
+    The counter moves by exactly one, and only when the like row was really
+    inserted or deleted, so concurrent clicks cannot drift it.
+    """
+    with transaction.atomic():
+        deleted, _ = ReviewLike.objects.filter(review_id=review_id, customer=customer).delete()
+        if deleted:
+            _apply(review_id, -1)
+            return False
+        try:
+            with transaction.atomic():
+                ReviewLike.objects.create(review_id=review_id, customer=customer)
+        except IntegrityError:
+            # a concurrent request liked it first and already counted it
+            return True
+        _apply(review_id, 1)
+        return True
+
+
+def pending_likes(review_id):
+    """Buffered delta not yet written to Review.likes"""
+    return cache.get(_delta_key(review_id), 0) if write_behind() else 0
+
+
+async def apending_likes(review_id):
+    return await cache.aget(_delta_key(review_id), 0) if write_behind() else 0
+
+
+def flush_buffered_likes():
+    """Apply buffered like deltas to Review rows, returns the number of reviews updated.
+
+    The cache cannot join the database transaction: a crash after the commit
+    and before the deltas are taken back out of the cache applies them twice
+    on the next flush.  `flush_review_likes --recount` repairs the counters.
+    """
+    dirty = cache.get(DIRTY_KEY) or set()
+    if not dirty:
+        return 0
+    keys = {review_id: _delta_key(review_id) for review_id in dirty}
+    deltas = cache.get_many(keys.values())
+
+    updated = 0
+    with transaction.atomic():
+        for review_id, key in keys.items():
+            delta = deltas.get(key)
+            if delta:
+                Review.objects.filter(pk=review_id).update(likes=F('likes') + delta)
+                updated += 1
+    for review_id, key in keys.items():
+        delta = deltas.get(key)
+        if delta:
+            # likes buffered since the read stay in the key for the next flush
+            try:
+                cache.decr(key, delta)
+            except ValueError:
+                pass
+
+    expired = {review_id for review_id, key in keys.items() if key not in deltas}
+    if expired:
+        with _DirtyLock():
+            dirty = cache.get(DIRTY_KEY) or set()
+            # re-check under the lock, a like may have recreated the key meanwhile
+            dirty -= {review_id for review_id in expired if cache.get(keys[review_id]) is None}
+            cache.set(DIRTY_KEY, dirty, None)
+    return updated
+
+
+def recount_likes():
+    """Rewrite every Review.likes from the ReviewLike rows, returns rows changed"""
+    counts = (
+        ReviewLike.objects.filter(review=OuterRef('pk'))
+        .order_by().values('review').annotate(total=Count('id')).values('total')
+    )
+    total = Coalesce(Subquery(counts), Value(0))
+    return Review.objects.annotate(actual=total).exclude(likes=F('actual')).update(likes=total)
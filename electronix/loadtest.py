@@ -0,0 +1,392 @@
+import asyncio
+import importlib
+import io
+import queue
+import random
+import statistics
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connections
+from django.test import Client, override_settings
+from django.urls import clear_url_caches, reverse
+
+from . import urls
+
+READ_VIEWS = ['laptops-list', 'about-us', 'product-detail', 'review_list', 'review_detail']
+
+
+@dataclass
+class LoadResult:
+    mode: str
+    concurrency: int
+    seconds: float
+    latencies: list = field(default_factory=list)
+    errors: int = 0
+
+    @property
+    def requests(self):
+        return len(self.latencies)
+
+    @property
+    def rps(self):
+        return self.requests / self.seconds if self.seconds else 0
+
+    def percentile(self, p):
+        return percentile(self.latencies, p)
+
+
+def percentile(latencies, p):
+    """pth percentile of latencies (seconds) in milliseconds"""
+    if len(latencies) < 2:
+        return latencies[0] * 1000 if latencies else 0
+    return statistics.quantiles(latencies, n=100, method='inclusive')[p - 1] * 1000
+
+
+@contextmanager
+def async_read_views(enabled=True):
+    """Rebuild the URLconf with ASYNC_VIEWS switched, as asgi.py does at startup"""
+    def reload_urls():
+        importlib.reload(urls)
+        importlib.reload(importlib.import_module(settings.ROOT_URLCONF))
+        clear_url_caches()
+
+    try:
+        with override_settings(ASYNC_VIEWS=enabled):
+            reload_urls()
+            yield
+    finally:
+        reload_urls()
+
+
+def read_paths(seed):
+    kwargs = {'product-detail': {'pk': seed.product.pk}, 'review_detail': {'pk': seed.review.pk}}
+    return [reverse(name, kwargs=kwargs.get(name)) for name in READ_VIEWS]
+
+
+def session_cookie(user):
+    client = Client()
+    client.force_login(user)
+    return f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}"
+
+
+def _wsgi_environ(path, cookie):
+    url = urlsplit(path)
+    return {
+        'REQUEST_METHOD': 'GET', 'SCRIPT_NAME': '', 'PATH_INFO': url.path, 'QUERY_STRING': url.query,
+        'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': 'localhost', 'HTTP_COOKIE': cookie, 'REMOTE_ADDR': '127.0.0.1',
+        'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr, 'wsgi.url_scheme': 'http',
+        'wsgi.version': (1, 0), 'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+    }
+
+
+def run_wsgi(paths, cookie, total, concurrency):
+    """Drive WSGIHandler from a pool of threads, like a threaded WSGI server"""
+    handler = WSGIHandler()
+    jobs = queue.Queue()
+    for i in range(total):
+        jobs.put(paths[i % len(paths)])
+    result = LoadResult('wsgi', concurrency, 0)
+    lock = threading.Lock()
+
+    def worker():
+        try:
+            while True:
+                try:
+                    path = jobs.get_nowait()
+                except queue.Empty:
+                    return
+                status = []
+                start = time.perf_counter()
+                body = handler(_wsgi_environ(path, cookie), lambda s, headers, exc=None: status.append(s))
+                try:
+                    b''.join(body)
+                finally:
+                    body.close()
+                elapsed = time.perf_counter() - start
+                with lock:
+                    result.latencies.append(elapsed)
+                    result.errors += not status[0].startswith('200')
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def _asgi_scope(path, cookie):
+    url = urlsplit(path)
+    return {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': url.path, 'raw_path': url.path.encode(), 'root_path': '',
+        'query_string': url.query.encode(), 'client': ('127.0.0.1', 50000), 'server': ('localhost', 80),
+        'headers': [(b'host', b'localhost'), (b'cookie', cookie.encode())],
+    }
+
+
+async def _asgi_request(handler, path, cookie):
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await asyncio.Future()  # the client never disconnects early
+
+    status = []
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+
+    await handler(_asgi_scope(path, cookie), receive, send)
+    return status[0]
+
+
+def asgi_middleware():
+    """MIDDLEWARE as an ASGI deployment runs it (see settings.SYNC_ONLY_MIDDLEWARE)"""
+    return [name for name in settings.MIDDLEWARE if name not in settings.SYNC_ONLY_MIDDLEWARE]
+
+
+async def _run_asgi(paths, cookie, total, concurrency):
+    handler = ASGIHandler()
+    jobs = asyncio.Queue()
+    for i in range(total):
+        jobs.put_nowait(paths[i % len(paths)])
+    result = LoadResult('asgi', concurrency, 0)
+
+    async def worker():
+        while not jobs.empty():
+            path = jobs.get_nowait()
+            start = time.perf_counter()
+            status = await _asgi_request(handler, path, cookie)
+            result.latencies.append(time.perf_counter() - start)
+            result.errors += status != 200
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def run_asgi(paths, cookie, total, concurrency):
+    """Drive ASGIHandler from concurrent tasks on one event loop, like an ASGI server"""
+    with override_settings(MIDDLEWARE=asgi_middleware()):
+        return asyncio.run(_run_asgi(paths, cookie, total, concurrency))
+
+
+def format_results(results):
+    lines = [f"{'server':<8} {'conc':>5} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9}"]
+    for row in results:
+        lines.append(
+            f"{row.mode:<8} {row.concurrency:>5} {row.requests:>9} {row.errors:>7} {row.rps:>9.1f} "
+            f"{row.percentile(50):>9.2f} {row.percentile(99):>9.2f}"
+        )
+    return "\n".join(lines)
+
+
+# --- Shopper scenarios ---
+# Each scenario is one visit's worth of requests; visit(url name, method, **url
+# kwargs) sends one and records it under the url name.  Redirects count as
+# successes, only 4xx/5xx responses are errors.
+
+def browse(visit, catalog, rng):
+    visit('laptops-list')
+    visit('product-detail', pk=rng.choice(catalog.products))
+
+
+def read_reviews(visit, catalog, rng):
+    visit('review_list')
+    review = rng.choice(catalog.reviews)
+    visit('review_detail', pk=review)
+    visit('toggle_review_like', 'post', review_id=review)
+
+
+def shop(visit, catalog, rng):
+    product = rng.choice(catalog.products)
+    visit('laptops-list')
+    visit('create-order', 'post', product_id=product)
+    visit('update_cart', 'post', product_id=product, action='add')
+    visit('electronics-cart')
+    visit('update_cart_in_cart', 'post', product_id=product, action='subtract')
+
+
+def buy(visit, catalog, rng):
+    visit('create-order', 'post', product_id=rng.choice(catalog.products))
+    visit('electronics-cart')
+    visit('checkout')
+    visit('checkout', 'post')
+
+
+# name -> (scenario, relative weight)
+SCENARIOS = {
+    'browse': (browse, 45),
+    'reviews': (read_reviews, 20),
+    'shop': (shop, 25),
+    'checkout': (buy, 10),
+}
+
+
+@dataclass
+class Catalog:
+    products: list
+    reviews: list
+
+
+@dataclass
+class UrlStats:
+    latencies: list = field(default_factory=list)
+    errors: int = 0
+
+
+@dataclass
+class ScenarioRun:
+    target: str
+    shoppers: int
+    seconds: float = 0
+    scenarios: Counter = field(default_factory=Counter)
+    urls: dict = field(default_factory=dict)
+
+    def summary(self):
+        """{url name: requests, errors, error rate, req/s, p50/p95/p99 ms}, plus 'all'"""
+        rows = dict(sorted(self.urls.items()))
+        rows['all'] = UrlStats(
+            [latency for stats in self.urls.values() for latency in stats.latencies],
+            sum(stats.errors for stats in self.urls.values()),
+        )
+        return {
+            name: {
+                'requests': len(stats.latencies),
+                'errors': stats.errors,
+                'error_rate': stats.errors / len(stats.latencies) if stats.latencies else 0,
+                'rps': len(stats.latencies) / self.seconds if self.seconds else 0,
+                'p50_ms': percentile(stats.latencies, 50),
+                'p95_ms': percentile(stats.latencies, 95),
+                'p99_ms': percentile(stats.latencies, 99),
+            }
+            for name, stats in rows.items()
+        }
+
+
+class ClientShopper:
+    """A signed-in shopper on the in-process test client"""
+
+    def __init__(self, user):
+        self.client = Client(raise_request_exception=False)
+        self.client.force_login(user)
+
+    def request(self, method, path):
+        return getattr(self.client, method)(path).status_code
+
+
+class HttpShopper:
+    """A shopper signed in to a running server through the login form"""
+
+    def __init__(self, base_url, username, password):
+        import requests
+
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+        login = reverse('account_login')
+        self.session.get(self.base_url + login)
+        if self.request('post', login, {'login': username, 'password': password}) != 302:
+            raise ValueError(f"could not log in as {username} at {self.base_url}")
+
+    def request(self, method, path, data=None):
+        kwargs = {'allow_redirects': False}
+        if method == 'post':
+            kwargs.update(data=data or {}, headers={
+                'X-CSRFToken': self.session.cookies.get(settings.CSRF_COOKIE_NAME, ''),
+                'Referer': self.base_url + path,
+            })
+        return getattr(self.session, method)(self.base_url + path, **kwargs).status_code
+
+
+def scenario_mix(count, weights=None, seed=0):
+    """The same weighted sequence of scenario names for every run with the same arguments"""
+    weights = weights or {name: weight for name, (_, weight) in SCENARIOS.items()}
+    rng = random.Random(seed)
+    return rng.choices(list(weights), weights=list(weights.values()), k=count)
+
+
+def run_scenarios(shoppers, catalog, mix, target='in-process', seed=0):
+    """Play the scenarios in mix, each shopper taking the next one from its own thread"""
+    jobs = queue.Queue()
+    for name in mix:
+        jobs.put(name)
+    run = ScenarioRun(target, len(shoppers))
+    lock = threading.Lock()
+
+    def worker(index, shopper):
+        rng = random.Random(seed * 1000 + index)
+
+        def visit(name, method='get', **kwargs):
+            path = reverse(name, kwargs=kwargs or None)
+            start = time.perf_counter()
+            try:
+                status = shopper.request(method, path)
+            except Exception:
+                status = 599  # connection errors count against the url too
+            elapsed = time.perf_counter() - start
+            with lock:
+                stats = run.urls.setdefault(name, UrlStats())
+                stats.latencies.append(elapsed)
+                stats.errors += status >= 400
+
+        try:
+            while True:
+                try:
+                    name = jobs.get_nowait()
+                except queue.Empty:
+                    return
+                SCENARIOS[name][0](visit, catalog, rng)
+                with lock:
+                    run.scenarios[name] += 1
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=worker, args=(i, shopper)) for i, shopper in enumerate(shoppers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    run.seconds = time.perf_counter() - start
+    return run
+
+
+def format_run(summary, baseline=None):
+    """Per-url table; with a baseline summary, p95 and req/s also show the change in percent"""
+    def change(name, key):
+        before = (baseline or {}).get(name, {}).get(key)
+        if not before:
+            return ''
+        return f" ({100 * (summary[name][key] - before) / before:+.0f}%)"
+
+    lines = [
+        f"{'url':<22} {'requests':>8} {'errors':>7} {'err %':>6} {'req/s':>17} "
+        f"{'p50 ms':>8} {'p95 ms':>17} {'p99 ms':>8}"
+    ]
+    for name, row in summary.items():
+        lines.append(
+            f"{name:<22} {row['requests']:>8} {row['errors']:>7} {100 * row['error_rate']:>6.1f} "
+            f"{row['rps']:>9.1f}{change(name, 'rps'):>8} {row['p50_ms']:>8.2f} "
+            f"{row['p95_ms']:>9.2f}{change(name, 'p95_ms'):>8} {row['p99_ms']:>8.2f}"
+        )
+    return "\n".join(lines)
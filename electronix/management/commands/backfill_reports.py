@@ -0,0 +1,26 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from electronix.reports import BACKFILL_CHUNK_DAYS, backfill
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily sales rollups from the order history, a chunk of days at a time"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat, help="First day (YYYY-MM-DD), defaults to the first order")
+        parser.add_argument('--end', type=date.fromisoformat, help="Last day (YYYY-MM-DD), defaults to today")
+        parser.add_argument('--chunk-days', type=int, default=BACKFILL_CHUNK_DAYS)
+
+    def handle(self, *args, **options):
+        def progress(start, end, counted):
+            if options['verbosity'] > 1:
+                self.stdout.write(f"{start} .. {end}: {counted} orders")
+
+        started = time.perf_counter()
+        counted = backfill(options['start'], options['end'], options['chunk_days'], progress)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt rollups over {counted} orders in {time.perf_counter() - started:.1f}s"
+        ))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from electronix.benchmark import seed_shop, throwaway_database
+from electronix.loadtest import (
+    async_read_views, format_results, read_paths, run_asgi, run_wsgi, session_cookie,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the read-heavy views on a throwaway database: sync views behind the WSGI "
+        "handler against async views behind the ASGI handler, in one process"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument('--reviews', type=int, default=3000)
+
+    def handle(self, *args, **options):
+        results = []
+        with throwaway_database():
+            seed = seed_shop(products=options['products'], reviews=options['reviews'])
+            paths, cookie = read_paths(seed), session_cookie(seed.shopper)
+            for concurrency in options['concurrency']:
+                with async_read_views(False):
+                    results.append(run_wsgi(paths, cookie, options['requests'], concurrency))
+                with async_read_views(True):
+                    results.append(run_asgi(paths, cookie, options['requests'], concurrency))
+
+        self.stdout.write(format_results(results))
+        for row in results:
+            if row.errors:
+                self.stderr.write(f"{row.mode} at concurrency {row.concurrency}: {row.errors} non-200 responses")
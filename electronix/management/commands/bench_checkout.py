@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from electronix.benchmark import checkout_race, throwaway_database
+
+
+class Command(BaseCommand):
+    help = "Race concurrent checkouts for scarce stock on a throwaway database and check nothing is oversold"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shoppers', type=int, default=200)
+        parser.add_argument('--stock', type=int, default=50)
+        parser.add_argument('--workers', type=int, default=16)
+
+    def handle(self, *args, **options):
+        with throwaway_database():
+            race = checkout_race(options['shoppers'], options['stock'], options['workers'])
+
+        self.stdout.write(
+            f"{race.shoppers} checkouts for {race.stock} units with {options['workers']} workers: "
+            f"{race.placed} placed, {race.rejected} rejected, {race.remaining} left "
+            f"in {race.seconds:.2f}s ({race.rate:.0f} checkouts/s)"
+        )
+        if not race.consistent:
+            raise CommandError("Stock was oversold or a rejected checkout kept its reservation")
+        self.stdout.write(self.style.SUCCESS("No stock oversold"))
@@ -0,0 +1,45 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from electronix.benchmark import seed_shop, throwaway_database
+from electronix.search import SEARCH_PAGE_SIZE, _ranked_ids, naive_search, search_terms
+
+QUERIES = ['asus rog', 'rtx 4070', 'oled', 'thinkpad carbon', 'ryzen 9 32gb', 'macbook pro m3']
+
+
+class Command(BaseCommand):
+    help = "Compare indexed product search with the icontains scan on a seeded throwaway database"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--query', action='append', dest='queries', help="Query to time (repeatable)")
+
+    def handle(self, *args, **options):
+        with throwaway_database():
+            self.stdout.write(f"Seeding {options['products']} products...")
+            seed_shop(products=options['products'], customers=1, reviews=0, orders=0, cart_lines=0)
+            rows = [self.time_query(query, options['repeat']) for query in options['queries'] or QUERIES]
+
+        self.stdout.write(f"{'query':<20} {'hits':>5} {'index ms':>10} {'icontains ms':>13} {'speedup':>8}")
+        for query, hits, indexed, naive in rows:
+            self.stdout.write(
+                f"{query:<20} {hits:>5} {indexed:>10.2f} {naive:>13.2f} {naive / indexed if indexed else 0:>7.1f}x"
+            )
+
+    def time_query(self, query, repeat):
+        terms = search_terms(query)
+
+        def timed(search):
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                hits = search(terms, SEARCH_PAGE_SIZE, 0)
+                timings.append((time.perf_counter() - start) * 1000)
+            return hits, statistics.median(timings)
+
+        hits, indexed = timed(_ranked_ids)
+        _, naive = timed(naive_search)
+        return query, len(hits), indexed, naive
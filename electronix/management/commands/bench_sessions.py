@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from electronix.benchmark import format_sessions, measure_sessions, seed_shop, throwaway_database
+
+
+class Command(BaseCommand):
+    help = "Count the session table queries per request on a throwaway database, database sessions against cached ones"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=500)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with throwaway_database():
+            seed = seed_shop(products=options['products'], customers=50, reviews=100, orders=100)
+            results = measure_sessions(seed, repeat=options['repeat'])
+
+        self.stdout.write(format_sessions(results))
+        rows = {(row.engine, row.name): row for row in results}
+        for name in dict.fromkeys(row.name for row in results):
+            saved = rows['db', name].session_queries - rows['cached_db', name].session_queries
+            self.stdout.write(f"{name}: {saved:.1f} session queries saved per request")
@@ -0,0 +1,41 @@
+import json
+from dataclasses import asdict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from electronix.benchmark import format_table, measure_views, seed_shop, throwaway_database
+
+
+class Command(BaseCommand):
+    help = "Seed a throwaway database and report query counts and latency for every named view"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument('--customers', type=int, default=500)
+        parser.add_argument('--reviews', type=int, default=3000)
+        parser.add_argument('--orders', type=int, default=2000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--json', dest='json_path', help="Also write the results to this file")
+
+    def handle(self, *args, **options):
+        with throwaway_database():
+            seed = seed_shop(
+                products=options['products'], customers=options['customers'],
+                reviews=options['reviews'], orders=options['orders'],
+            )
+            client = Client(raise_request_exception=False)
+            client.force_login(seed.shopper)
+            results = measure_views(client, seed, repeat=options['repeat'])
+
+        self.stdout.write(format_table(results))
+        if options['json_path']:
+            with open(options['json_path'], 'w') as fh:
+                json.dump([asdict(row) for row in results], fh, indent=2)
+
+        failed = [row.name for row in results if row.failed]
+        if failed:
+            raise CommandError(f"Server errors from: {', '.join(failed)}")
+        over = [row.name for row in results if row.over_budget]
+        if over:
+            raise CommandError(f"Query budget exceeded by: {', '.join(over)}")
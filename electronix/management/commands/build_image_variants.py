@@ -0,0 +1,62 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+from electronix import fragments
+from electronix.catalog import invalidate_catalog
+from electronix.images import build_variants
+from electronix.models import Product, FounderInfo
+
+
+class Command(BaseCommand):
+    help = "Build missing WebP/JPEG image derivatives for products and founders in parallel"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--force', action='store_true', help="Rebuild derivatives that look up to date")
+
+    def handle(self, *args, **options):
+        pending = []
+        for model in (Product, FounderInfo):
+            for obj in model.objects.exclude(image='').only('id', 'image', 'image_variants').iterator():
+                if options['force'] or (obj.image_variants or {}).get('source') != obj.image.name:
+                    pending.append(obj)
+        if not pending:
+            self.stdout.write("All image derivatives are up to date")
+            return
+
+        names = {obj.image.name for obj in pending}
+        results, failed = {}, []
+        start = time.perf_counter()
+        with ProcessPoolExecutor(
+            max_workers=options['workers'], initializer=django.setup,
+            mp_context=multiprocessing.get_context('spawn'),
+        ) as pool:
+            futures = {pool.submit(build_variants, name): name for name in names}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    results[name] = future.result()
+                except (OSError, Image.DecompressionBombError) as exc:
+                    failed.append(name)
+                    self.stderr.write(f"Skipping {name}: {exc}")
+
+        for model in (Product, FounderInfo):
+            changed = [obj for obj in pending if isinstance(obj, model) and obj.image.name in results]
+            for obj in changed:
+                obj.image_variants = results[obj.image.name]
+            model.objects.bulk_update(changed, ['image_variants'], batch_size=500)
+        # bulk_update sends no signals, so retire the cached cards and founder grid here
+        invalidate_catalog()
+        fragments.bump('founders')
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Built derivatives for {len(results)} images ({len(failed)} failed) "
+            f"in {elapsed:.1f}s, {len(results) / elapsed:.1f} images/s"
+        ))
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from electronix.recommendations import RELATED_PER_PRODUCT, build_related
+
+
+class Command(BaseCommand):
+    help = "Rebuild the related products table from co-purchases, falling back to similar prices"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--per-product', type=int, default=RELATED_PER_PRODUCT)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        written = build_related(k=options['per_product'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {written} related product rows in {time.perf_counter() - start:.1f}s"
+        ))
@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from electronix.catalog_io import FORMATS, IMPORT_BATCH_SIZE, KEYS, guess_format, import_catalog, read_rows
+
+MAX_REPORTED_ERRORS = 20
+
+
+class Command(BaseCommand):
+    help = "Create or update products from a CSV or JSON Lines file, streamed in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS, help="Defaults to the file extension")
+        parser.add_argument('--key', choices=KEYS, default='sku', help="Column matching rows to existing products")
+        parser.add_argument('--images', metavar='DIR', help="Directory the image column is relative to")
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or guess_format(path)
+        reported = 0
+
+        def on_error(line, message):
+            nonlocal reported
+            reported += 1
+            if reported <= MAX_REPORTED_ERRORS:
+                self.stderr.write(f"Line {line}: {message}")
+
+        start = time.perf_counter()
+
+        def progress(result):
+            if options['verbosity'] > 1:
+                elapsed = time.perf_counter() - start
+                self.stdout.write(f"{result.rows} rows, {result.rows / elapsed:.0f} rows/s")
+
+        try:
+            result = import_catalog(
+                read_rows(path, fmt), key=options['key'], images_dir=options['images'],
+                batch_size=options['batch_size'], on_error=on_error, progress=progress,
+            )
+        except OSError as exc:
+            raise CommandError(exc)
+
+        elapsed = time.perf_counter() - start
+        if reported > MAX_REPORTED_ERRORS:
+            self.stderr.write(f"... and {reported - MAX_REPORTED_ERRORS} more invalid rows")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result.rows} rows ({result.created} created, {result.updated} updated, "
+            f"{result.unchanged} unchanged, {result.invalid} invalid) in {elapsed:.1f}s, {result.rows / elapsed:.0f} rows/s"
+        ))
+        if result.created or result.updated:
+            self.stdout.write("Run `manage.py build_image_variants` to build derivatives of new images")
@@ -0,0 +1,39 @@
+import time
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from electronix.cart import CART_TTL_DAYS, EXPIRE_BATCH_SIZE, expire_carts
+
+
+class Command(BaseCommand):
+    help = "Delete carts left untouched for longer than the TTL, in short batches (run it daily from cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=float, default=CART_TTL_DAYS, help="Idle time before a cart expires")
+        parser.add_argument('--batch-size', type=int, default=EXPIRE_BATCH_SIZE)
+        parser.add_argument('--archive', metavar='FILE',
+                            help="Append each expired cart and its lines to FILE as JSON Lines first")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+
+        def progress(result):
+            if options['verbosity'] > 1:
+                elapsed = time.perf_counter() - start
+                self.stdout.write(f"{result.carts} carts, {result.rows / elapsed:.0f} rows/s")
+
+        try:
+            with open(options['archive'], 'a', encoding='utf-8') if options['archive'] else nullcontext() as archive:
+                result = expire_carts(
+                    timedelta(days=options['days']), batch_size=options['batch_size'],
+                    archive=archive, progress=progress,
+                )
+        except OSError as exc:
+            raise CommandError(exc)
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Expired {result.carts} carts and {result.lines} lines in {elapsed:.1f}s, {result.rows / elapsed:.0f} rows/s"
+        ))
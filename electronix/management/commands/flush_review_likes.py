@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from electronix.likes import flush_buffered_likes, recount_likes
+
+
+class Command(BaseCommand):
+    help = "Apply buffered review like deltas (REVIEW_LIKES_WRITE_BEHIND) to the database"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recount', action='store_true',
+                            help="Also rewrite every counter from the like rows (repairs an interrupted flush)")
+
+    def handle(self, *args, **options):
+        flushed = flush_buffered_likes()
+        self.stdout.write(f"Flushed buffered likes for {flushed} reviews")
+        if options['recount']:
+            self.stdout.write(f"Recount corrected {recount_likes()} reviews")
@@ -0,0 +1,143 @@
+import json
+import logging
+import subprocess
+from contextlib import contextmanager
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from electronix.benchmark import seed_shop, throwaway_database
+from electronix.loadtest import (
+    SCENARIOS, Catalog, ClientShopper, HttpShopper, format_run, run_scenarios, scenario_mix,
+)
+from electronix.models import Product, Review
+
+SEED_PASSWORD = 'benchmark'  # the password seed_shop gives its bench-N accounts
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+@contextmanager
+def _quiet_request_log():
+    # 5xx responses are counted in the report, not logged one traceback each
+    logger = logging.getLogger('django.request')
+    level = logger.level
+    logger.setLevel(logging.CRITICAL)
+    try:
+        yield
+    finally:
+        logger.setLevel(level)
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay weighted shopper scenarios (browse, reviews, shop, checkout) from a pool of "
+        "signed-in shoppers and report req/s, latency percentiles and errors per URL"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenarios', type=int, default=500, help="Scenarios to play in total")
+        parser.add_argument('--shoppers', type=int, default=8, help="Concurrent shoppers, one thread each")
+        parser.add_argument('--weights', nargs='+', metavar='NAME=WEIGHT',
+                            help=f"Scenario mix, defaults to {' '.join(f'{n}={w}' for n, (_, w) in SCENARIOS.items())}")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed of the scenario mix")
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument('--reviews', type=int, default=3000)
+        parser.add_argument('--url', help=(
+            "Base URL of a running server (e.g. http://127.0.0.1:8000) instead of the in-process "
+            "client; the server must use this project's configured database"
+        ))
+        parser.add_argument('--seed-database', action='store_true',
+                            help="With --url, seed the configured database first (it must have no products)")
+        parser.add_argument('--json', dest='json_path', help="Write the results to this file")
+        parser.add_argument('--baseline', help="Results of an earlier run to compare p95 and req/s against")
+
+    def handle(self, *args, **options):
+        weights = self.parse_weights(options['weights'])
+        mix = scenario_mix(options['scenarios'], weights, options['seed'])
+        baseline = self.load_baseline(options['baseline'])
+
+        if options['url']:
+            run = self.run_against_server(options, mix)
+        else:
+            with throwaway_database():
+                seed_shop(products=options['products'], customers=max(options['shoppers'], 50),
+                          reviews=options['reviews'], orders=options['products'])
+                shoppers = [ClientShopper(user) for user in self.accounts(options['shoppers'])]
+                with _quiet_request_log():
+                    run = run_scenarios(shoppers, self.catalog(), mix, seed=options['seed'])
+
+        summary = run.summary()
+        self.stdout.write(
+            f"{sum(run.scenarios.values())} scenarios ({', '.join(f'{n} {c}' for n, c in sorted(run.scenarios.items()))}) "
+            f"by {run.shoppers} shoppers against {run.target} in {run.seconds:.1f}s"
+        )
+        self.stdout.write(format_run(summary, baseline))
+        if options['json_path']:
+            with open(options['json_path'], 'w') as fh:
+                json.dump({
+                    'commit': _commit(),
+                    'finished': timezone.now().isoformat(),
+                    'target': run.target,
+                    'shoppers': run.shoppers,
+                    'seed': options['seed'],
+                    'seconds': run.seconds,
+                    'scenarios': dict(run.scenarios),
+                    'urls': summary,
+                }, fh, indent=2)
+
+    def parse_weights(self, pairs):
+        if not pairs:
+            return None
+        weights = {}
+        for pair in pairs:
+            name, _, weight = pair.partition('=')
+            if name not in SCENARIOS or not weight.isdigit():
+                raise CommandError(f"Bad weight {pair!r}, expected NAME=WEIGHT with NAME in {', '.join(SCENARIOS)}")
+            weights[name] = int(weight)
+        return weights
+
+    def load_baseline(self, path):
+        if not path:
+            return None
+        try:
+            with open(path) as fh:
+                return json.load(fh)['urls']
+        except (OSError, ValueError, KeyError) as exc:
+            raise CommandError(f"Cannot read baseline {path}: {exc}")
+
+    def accounts(self, count):
+        users = list(User.objects.filter(username__startswith='bench-').order_by('id')[:count])
+        if len(users) < count:
+            raise CommandError(f"Need {count} bench-N accounts, found {len(users)}; seed the database first")
+        return users
+
+    def catalog(self):
+        catalog = Catalog(
+            products=list(Product.objects.filter(is_active=True).values_list('id', flat=True)),
+            reviews=list(Review.objects.values_list('id', flat=True)),
+        )
+        if not catalog.products or not catalog.reviews:
+            raise CommandError("The database has no products or no reviews to visit")
+        return catalog
+
+    def run_against_server(self, options, mix):
+        if options['seed_database']:
+            if Product.objects.exists():
+                raise CommandError("--seed-database only seeds a database without products")
+            seed_shop(products=options['products'], customers=max(options['shoppers'], 50),
+                      reviews=options['reviews'], orders=options['products'])
+        try:
+            shoppers = [HttpShopper(options['url'], user.username, SEED_PASSWORD)
+                        for user in self.accounts(options['shoppers'])]
+        except ValueError as exc:
+            raise CommandError(exc)
+        return run_scenarios(shoppers, self.catalog(), mix, target=options['url'], seed=options['seed'])
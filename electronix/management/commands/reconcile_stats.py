@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from electronix.stats import reconcile
+
+
+class Command(BaseCommand):
+    help = "Recount the storefront counters and repair any drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Report drift without repairing it")
+
+    def handle(self, *args, **options):
+        drift = reconcile(repair=not options['dry_run'])
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("All counters match"))
+            return
+        for name, (stored, actual) in drift.items():
+            action = "would repair" if options['dry_run'] else "repaired"
+            self.stdout.write(self.style.WARNING(f"{name}: stored {stored}, actual {actual} ({action})"))
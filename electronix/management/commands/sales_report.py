@@ -0,0 +1,38 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from electronix.reports import sales_report
+
+
+class Command(BaseCommand):
+    help = "Print revenue per day, top sellers, basket size and the status funnel from the daily rollups"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help="Days back from --end")
+        parser.add_argument('--end', type=date.fromisoformat, help="Last day (YYYY-MM-DD), defaults to today")
+        parser.add_argument('--top', type=int, default=10)
+
+    def handle(self, *args, **options):
+        end = options['end'] or timezone.localdate()
+        report = sales_report(end - timedelta(days=options['days'] - 1), end, options['top'])
+        write = self.stdout.write
+
+        basket = report['basket']
+        write(f"Sales {report['start']} .. {report['end']}")
+        write(f"  revenue {basket['revenue']:.2f} over {basket['orders']} orders")
+        if basket['orders']:
+            write(f"  average basket {basket['average_value']:.2f}, {basket['average_units']:.1f} items")
+
+        write("\nFunnel")
+        for stage in report['funnel']['stages']:
+            write(f"  {stage['status']:<10} {stage['orders']:>8} {stage['percent']:>4}%")
+
+        write("\nTop sellers")
+        for row in report['top_sellers']:
+            write(f"  {row['units']:>6} units {row['revenue']:>12.2f}  {row['name']}")
+
+        write("\nRevenue by day")
+        for row in report['days']:
+            write(f"  {row['day']} {row['orders']:>6} orders {row['revenue']:>12.2f}")
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from electronix.inventory import untrack_stock
+
+
+class Command(BaseCommand):
+    help = (
+        "Stop counting the stock of products at 0, so they never sell out. "
+        "Run once if the shop never kept stock levels; a real 0 means sold out."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sku', action='append', dest='skus', help="Only this product (repeatable)")
+
+    def handle(self, *args, **options):
+        count = untrack_stock(options['skus'])
+        self.stdout.write(self.style.SUCCESS(f"{count} products no longer count stock"))
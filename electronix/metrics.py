@@ -0,0 +1,199 @@
+import bisect
+import json
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.template.backends.django import DjangoTemplates, Template
+
+# upper bounds (seconds / queries / bytes) of the histogram buckets, +Inf is implicit
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+METRICS = {
+    'request_duration_seconds': ("Total time spent in the view stack", SECONDS_BUCKETS),
+    'db_queries': ("SQL queries executed per request", QUERY_BUCKETS),
+    'db_duration_seconds': ("Time spent executing SQL per request", SECONDS_BUCKETS),
+    'template_duration_seconds': ("Time spent rendering templates per request", SECONDS_BUCKETS),
+    'response_size_bytes': ("Size of the response body", BYTES_BUCKETS),
+}
+
+_current = ContextVar('electronix_request_stats', default=None)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            yield bound, total
+
+
+class Registry:
+    """Thread-safe in-process store of histograms keyed by (metric, view)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+
+    def observe(self, metric, view, value):
+        with self._lock:
+            histogram = self._histograms.get((metric, view))
+            if histogram is None:
+                histogram = self._histograms[(metric, view)] = Histogram(METRICS[metric][1])
+            histogram.observe(value)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                key: (list(h.cumulative()), h.sum, h.count)
+                for key, h in sorted(self._histograms.items())
+            }
+
+    def to_json(self):
+        data = {}
+        for (metric, view), (buckets, total, count) in self.snapshot().items():
+            data.setdefault(view, {})[metric] = {
+                'count': count,
+                'sum': total,
+                'mean': total / count if count else 0,
+                'buckets': {str(bound): value for bound, value in buckets},
+            }
+        return json.dumps(data, indent=2)
+
+    def to_prometheus(self):
+        lines, described = [], set()
+        for (metric, view), (buckets, total, count) in self.snapshot().items():
+            name = f"electronix_{metric}"
+            if metric not in described:
+                described.add(metric)
+                lines.append(f"# HELP {name} {METRICS[metric][0]}")
+                lines.append(f"# TYPE {name} histogram")
+            for bound, value in buckets:
+                lines.append(f'{name}_bucket{{view="{view}",le="{bound}"}} {value}')
+            lines.append(f'{name}_sum{{view="{view}"}} {total}')
+            lines.append(f'{name}_count{{view="{view}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+class RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.template_depth = 0
+
+    def db_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_seconds += time.perf_counter() - start
+            self.queries += 1
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper installed on every connection, counts into the current request's stats"""
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats.db_wrapper(execute, sql, params, many, context)
+
+
+def install_query_recorder(connection):
+    # async views run their queries on a worker thread with its own connection,
+    # the request's stats follow them there through the context variable
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        stats = _current.get()
+        if stats is None:
+            return super().render(context, request)
+        # render_to_string inside a template tag would otherwise be counted twice
+        stats.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.template_depth -= 1
+            if not stats.template_depth:
+                stats.template_seconds += time.perf_counter() - start
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """Django template backend that reports render time to the metrics middleware"""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
+
+
+class PerformanceMiddleware:
+    """Record latency, SQL, template time and response size per resolved URL name"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.observe(request, response, stats, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.observe(request, response, stats, time.perf_counter() - start)
+        return response
+
+    def observe(self, request, response, stats, duration):
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name if match else None) or '<unresolved>'
+        registry.observe('request_duration_seconds', view, duration)
+        registry.observe('db_queries', view, stats.queries)
+        registry.observe('db_duration_seconds', view, stats.db_seconds)
+        registry.observe('template_duration_seconds', view, stats.template_seconds)
+        if not response.streaming:
+            registry.observe('response_size_bytes', view, len(response.content))
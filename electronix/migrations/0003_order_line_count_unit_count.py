@@ -0,0 +1,32 @@
+# Generated by Django 5.2.9 on 2026-10-18 12:57
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_counts(apps, schema_editor):
+    Order = apps.get_model('electronix', 'Order')
+    orders = Order.objects.annotate(lines=Count('order_items'), units=Sum('order_items__quantity'))
+    for order in orders.iterator(chunk_size=1000):
+        Order.objects.filter(pk=order.pk).update(line_count=order.lines, unit_count=order.units or 0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('electronix', '0002_alter_order_total_price_alter_product_name_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='line_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='unit_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.9 on 2026-10-18 13:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('electronix', '0003_order_line_count_unit_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='founderinfo',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
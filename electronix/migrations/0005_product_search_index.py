@@ -0,0 +1,77 @@
+from django.db import migrations
+
+# The search index lives outside the ORM: a weighted, generated tsvector column
+# with a GIN index on PostgreSQL and an external-content FTS5 table kept in sync
+# by triggers on SQLite.  Both are maintained by the database on every write.
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE electronix_product ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(details, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX electronix_product_search_idx ON electronix_product USING GIN (search_vector)",
+]
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS electronix_product_search_idx",
+    "ALTER TABLE electronix_product DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE electronix_product_fts USING fts5(
+        name, details, content='electronix_product', content_rowid='id',
+        tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER electronix_product_fts_ai AFTER INSERT ON electronix_product BEGIN
+        INSERT INTO electronix_product_fts(rowid, name, details)
+        VALUES (new.id, new.name, coalesce(new.details, ''));
+    END
+    """,
+    """
+    CREATE TRIGGER electronix_product_fts_ad AFTER DELETE ON electronix_product BEGIN
+        INSERT INTO electronix_product_fts(electronix_product_fts, rowid, name, details)
+        VALUES ('delete', old.id, old.name, coalesce(old.details, ''));
+    END
+    """,
+    """
+    CREATE TRIGGER electronix_product_fts_au AFTER UPDATE OF name, details ON electronix_product BEGIN
+        INSERT INTO electronix_product_fts(electronix_product_fts, rowid, name, details)
+        VALUES ('delete', old.id, old.name, coalesce(old.details, ''));
+        INSERT INTO electronix_product_fts(rowid, name, details)
+        VALUES (new.id, new.name, coalesce(new.details, ''));
+    END
+    """,
+    "INSERT INTO electronix_product_fts(electronix_product_fts) VALUES ('rebuild')",
+]
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS electronix_product_fts_ai",
+    "DROP TRIGGER IF EXISTS electronix_product_fts_ad",
+    "DROP TRIGGER IF EXISTS electronix_product_fts_au",
+    "DROP TABLE IF EXISTS electronix_product_fts",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('electronix', '0004_image_variants'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({'postgresql': POSTGRES_FORWARD, 'sqlite': SQLITE_FORWARD}),
+            _run({'postgresql': POSTGRES_BACKWARD, 'sqlite': SQLITE_BACKWARD}),
+            hints={'schema': True},
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.9 on 2026-10-18 13:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('electronix', '0005_product_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedProduct',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('source', models.CharField(choices=[('copurchase', 'Bought together'), ('price', 'Similar price')], max_length=20)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_links', to='electronix.product')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='electronix.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', '-score'], name='related_product_top_idx')],
+                'unique_together': {('product', 'related')},
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.9 on 2026-10-18 13:06
+
+from django.db import migrations, models
+
+
+def populate_stats(apps, schema_editor):
+    counts = {
+        'active_products': apps.get_model('electronix', 'Product').objects.filter(is_active=True),
+        'placed_orders': apps.get_model('electronix', 'Order').objects.filter(
+            status__in=['processing', 'shipped', 'completed']
+        ),
+        'approved_reviews': apps.get_model('electronix', 'Review').objects.filter(is_approved=True),
+    }
+    StoreStat = apps.get_model('electronix', 'StoreStat')
+    StoreStat.objects.bulk_create(
+        StoreStat(name=name, value=queryset.count()) for name, queryset in counts.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('electronix', '0006_related_product'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoreStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+                ('updated_date', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(populate_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+def populate_ratings(apps, schema_editor):
+    Review = apps.get_model('electronix', 'Review')
+    StoreStat = apps.get_model('electronix', 'StoreStat')
+    for stars in range(1, 6):
+        StoreStat.objects.update_or_create(
+            name=f'rating_{stars}',
+            defaults={'value': Review.objects.filter(is_approved=True, rating=stars).count()},
+        )
+
+
+def remove_ratings(apps, schema_editor):
+    apps.get_model('electronix', 'StoreStat').objects.filter(
+        name__in=[f'rating_{stars}' for stars in range(1, 6)]
+    ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('electronix', '0007_store_stat'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_ratings, remove_ratings),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.2.9 on 2026-10-18 13:11
+
+from django.db import migrations, models
+from django.db.models import Count, F, Min, Sum
+
+
+def merge_duplicates(apps, schema_editor):
+    """Fold extra carts and repeated order lines so the unique constraints can be added"""
+    Order = apps.get_model('electronix', 'Order')
+    OrderProduct = apps.get_model('electronix', 'OrderProduct')
+
+    customers = (
+        Order.objects.filter(status='cart').values('customer_id')
+        .annotate(carts=Count('id'), keep=Min('id')).filter(carts__gt=1)
+    )
+    touched = set()
+    for row in customers:
+        extra = Order.objects.filter(customer_id=row['customer_id'], status='cart').exclude(id=row['keep'])
+        OrderProduct.objects.filter(order__in=extra).update(order_id=row['keep'])
+        extra.delete()
+        touched.add(row['keep'])
+
+    lines = (
+        OrderProduct.objects.values('order_id', 'product_id')
+        .annotate(copies=Count('id'), keep=Min('id'), units=Sum('quantity')).filter(copies__gt=1)
+    )
+    for row in lines:
+        OrderProduct.objects.filter(id=row['keep']).update(quantity=row['units'])
+        OrderProduct.objects.filter(order_id=row['order_id'], product_id=row['product_id']).exclude(id=row['keep']).delete()
+        touched.add(row['order_id'])
+
+    for order in Order.objects.filter(id__in=touched):
+        totals = OrderProduct.objects.filter(order=order).aggregate(
+            total=Sum(F('quantity') * F('price'), output_field=models.DecimalField()),
+            lines=Count('id'),
+            units=Sum('quantity'),
+        )
+        order.total_price = totals['total'] or 0
+        order.line_count = totals['lines']
+        order.unit_count = totals['units'] or 0
+        order.save(update_fields=['total_price', 'line_count', 'unit_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('electronix', '0008_rating_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['customer', 'status'], name='order_customer_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-created_date', '-id'], name='product_active_newest_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['price', 'id'], name='product_active_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(condition=models.Q(('is_approved', True)), fields=['-created_date', '-id'], name='review_approved_newest_idx'),
+        ),
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='order',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'cart')), fields=('customer',), name='order_one_cart_per_customer'),
+        ),
+        migrations.AddConstraint(
+            model_name='orderproduct',
+            constraint=models.UniqueConstraint(fields=('order', 'product'), name='order_product_unique_line'),
+        ),
+    ]
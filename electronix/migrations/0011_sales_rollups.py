@@ -0,0 +1,65 @@
+# Generated by Django 5.2.9 on 2026-10-18 13:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F
+
+
+def date_placed_orders(apps, schema_editor):
+    """Orders placed before placed_date existed are reported under their creation day"""
+    Order = apps.get_model('electronix', 'Order')
+    Order.objects.exclude(status='cart').update(placed_date=F('created_date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('electronix', '0010_product_sku'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyProductSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('orders', models.IntegerField(default=0)),
+                ('units', models.BigIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('status', models.CharField(choices=[('cart', 'Cart'), ('pending', 'Pending'), ('processing', 'Processing'), ('shipped', 'Shipped'), ('completed', 'Completed')], max_length=20)),
+                ('orders', models.IntegerField(default=0)),
+                ('units', models.BigIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='placed_date',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(date_placed_orders, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['placed_date'], name='order_placed_idx'),
+        ),
+        migrations.AddField(
+            model_name='dailyproductsales',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='electronix.product'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailysales',
+            constraint=models.UniqueConstraint(fields=('day', 'status'), name='daily_sales_unique_day'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyproductsales',
+            constraint=models.UniqueConstraint(fields=('day', 'product'), name='daily_product_sales_unique_day'),
+        ),
+    ]
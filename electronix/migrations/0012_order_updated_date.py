@@ -0,0 +1,30 @@
+# Generated by Django 5.2.9 on 2026-10-18 13:52
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def date_existing_orders(apps, schema_editor):
+    """Existing orders were last changed no later than they were placed, or created"""
+    Order = apps.get_model('electronix', 'Order')
+    Order.objects.update(updated_date=Coalesce('placed_date', 'created_date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('electronix', '0011_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='updated_date',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(date_existing_orders, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'updated_date'], name='order_status_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.9 on 2026-10-18 14:31
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+search_index = import_module('electronix.migrations.0005_product_search_index')
+
+
+def untrack_baseline_stock(apps, schema_editor):
+    # nothing maintained stock before this migration, a 0 is the column default
+    # and not a sold-out product
+    Product = apps.get_model('electronix', 'Product')
+    Product.objects.filter(stock=0).update(stock=None)
+
+
+def zero_untracked_stock(apps, schema_editor):
+    Product = apps.get_model('electronix', 'Product')
+    Product.objects.filter(stock__isnull=True).update(stock=0)
+
+
+def restore_search_triggers(apps, schema_editor):
+    # altering the column rebuilds the table on SQLite, which drops its triggers
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in search_index.SQLITE_FORWARD:
+            if 'CREATE TRIGGER' in statement:
+                schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('electronix', '0012_order_updated_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='stock_reserved',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        # when unapplied, recreates the search triggers after the column is altered back
+        migrations.RunPython(migrations.RunPython.noop, restore_search_triggers, hints={'schema': True}),
+        migrations.AlterField(
+            model_name='product',
+            name='stock',
+            field=models.PositiveIntegerField(blank=True, default=None, null=True),
+        ),
+        migrations.RunPython(restore_search_triggers, migrations.RunPython.noop, hints={'schema': True}),
+        # existing levels stay counted, the default zeros stop being counted
+        migrations.RunPython(untrack_baseline_stock, zero_untracked_stock),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-18 14:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('electronix', '0013_untracked_stock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailysales',
+            name='started',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -1,18 +1,34 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
-from django.db.models import Sum, F
+from django.db.models import Sum, F, Count, Q
 
 class Product(models.Model):
     # max_length=500 allows for very long laptop tech spec strings
     name = models.CharField(max_length=500)
+    # stock keeping unit, the upsert key of `manage.py catalog_import`
+    sku = models.CharField(max_length=64, blank=True, null=True)
     image = models.ImageField(upload_to='products/')
+    # resized WebP/JPEG derivatives of image, maintained by electronix.images
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     price = models.DecimalField(max_digits=12, decimal_places=2)
     created_date = models.DateTimeField(auto_now_add=True)
     details = models.TextField(blank=True, null=True)
-    stock = models.PositiveIntegerField(default=0)
+    # None: stock is not counted for this product and it never sells out
+    stock = models.PositiveIntegerField(blank=True, null=True, default=None)
     is_active = models.BooleanField(default=True)
 
+    class Meta:
+        indexes = [
+            # catalog keysets over the active products only
+            models.Index(fields=['-created_date', '-id'], condition=Q(is_active=True), name='product_active_newest_idx'),
+            models.Index(fields=['price', 'id'], condition=Q(is_active=True), name='product_active_price_idx'),
+        ]
+        constraints = [
+            # partial, so adding it never rebuilds the table (and the search triggers) on SQLite
+            models.UniqueConstraint(fields=['sku'], condition=Q(sku__isnull=False), name='product_unique_sku'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -35,29 +51,55 @@ class Order(models.Model):
         ('processing', 'Processing'),
         ('shipped', 'Shipped'),
         ('completed', 'Completed'),
+        # checked out, then called off: its reserved stock goes back on the shelf
+        ('cancelled', 'Cancelled'),
     ]
 
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE)
     created_date = models.DateTimeField(auto_now_add=True)
+    # set when the order leaves the cart, the day its sales are reported under
+    placed_date = models.DateTimeField(blank=True, null=True, editable=False)
+    # last change to the order or its lines, carts idle past CART_TTL_DAYS are expired
+    updated_date = models.DateTimeField(auto_now=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='cart')
     total_price = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    # denormalized by the cart service so badges never aggregate order items
+    line_count = models.PositiveIntegerField(default=0)
+    unit_count = models.PositiveIntegerField(default=0)
+    # set by checkout once the lines took their stock; only such orders give it back
+    stock_reserved = models.BooleanField(default=False, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['customer', 'status'], name='order_customer_status_idx'),
+            models.Index(fields=['placed_date'], name='order_placed_idx'),
+            models.Index(fields=['status', 'updated_date'], name='order_status_updated_idx'),
+        ]
+        constraints = [
+            # also the index behind every cart lookup
+            models.UniqueConstraint(fields=['customer'], condition=Q(status='cart'), name='order_one_cart_per_customer'),
+        ]
 
     def __str__(self):
         return f"Order #{self.id} - {self.customer.user.username}"
     
     def update_total(self):
-        """Calculate and update total price from order items"""
-        total = self.order_items.aggregate(
-            total=Sum(F('quantity') * F('price'), output_field=models.DecimalField())
-        )['total'] or 0
-        self.total_price = total
+        """Recalculate total price and item counts from order items"""
+        totals = self.order_items.aggregate(
+            total=Sum(F('quantity') * F('price'), output_field=models.DecimalField()),
+            lines=Count('id'),
+            units=Sum('quantity'),
+        )
+        self.total_price = totals['total'] or 0
+        self.line_count = totals['lines']
+        self.unit_count = totals['units'] or 0
         self.save()
-        return total
+        return self.total_price
     
     @property
     def item_count(self):
         """Total number of items in order"""
-        return sum(item.quantity for item in self.order_items.all())
+        return self.unit_count
 
 
 class OrderProduct(models.Model):
@@ -65,6 +107,9 @@ class OrderProduct(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1, validators=[MinValueValidator(1)])
     price = models.DecimalField(max_digits=12, decimal_places=2)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['order', 'product'], name='order_product_unique_line')]
     
     def __str__(self):
         return f"{self.product.name} ({self.quantity})"
@@ -83,16 +128,83 @@ class Review(models.Model):
     created_date = models.DateTimeField(auto_now_add=True)
     is_approved = models.BooleanField(default=True)
     likes = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_date', '-id'], condition=Q(is_approved=True), name='review_approved_newest_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} by {self.customer.user.username}"
 
 
+class RelatedProduct(models.Model):
+    """Precomputed recommendation edge, rebuilt by `manage.py build_related_products`"""
+    SOURCE_CHOICES = [
+        ('copurchase', 'Bought together'),
+        ('price', 'Similar price'),
+    ]
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='related_links')
+    related = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES)
+
+    class Meta:
+        unique_together = ['product', 'related']
+        indexes = [models.Index(fields=['product', '-score'], name='related_product_top_idx')]
+
+    def __str__(self):
+        return f"{self.product_id} -> {self.related_id} ({self.score:.2f})"
+
+
+class StoreStat(models.Model):
+    """Denormalized storefront counter, kept current by electronix.stats"""
+    name = models.CharField(max_length=50, unique=True)
+    value = models.BigIntegerField(default=0)
+    updated_date = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
+
+
+class DailySales(models.Model):
+    """Orders, units and revenue per day and status, kept current by electronix.reports"""
+    day = models.DateField()
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    orders = models.IntegerField(default=0)
+    units = models.BigIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    # on the 'cart' row: orders created that day, never taken back when a cart is deleted
+    started = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['day', 'status'], name='daily_sales_unique_day')]
+
+    def __str__(self):
+        return f"{self.day} {self.status}: {self.orders} orders"
+
+
+class DailyProductSales(models.Model):
+    """Units and revenue of a product per day over checked-out orders, kept current by electronix.reports"""
+    day = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    orders = models.IntegerField(default=0)
+    units = models.BigIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['day', 'product'], name='daily_product_sales_unique_day')]
+
+    def __str__(self):
+        return f"{self.day} {self.product_id}: {self.units} units"
+
+
 class FounderInfo(models.Model):
     name = models.CharField(max_length=200)
     position = models.CharField(max_length=100)
     bio = models.TextField()
     image = models.ImageField(upload_to='founders/')
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     email = models.EmailField(blank=True, null=True)
     linkedin = models.URLField(blank=True, null=True)
     twitter = models.URLField(blank=True, null=True)
@@ -0,0 +1,127 @@
+import random
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count, F, Max, Min
+
+from .models import Product, OrderProduct, RelatedProduct
+
+RELATED_PER_PRODUCT = 8
+ID_RANGE_KEY = 'related:id-range'
+
+
+def co_purchase_counts():
+    """Yield (product_id, other_id, orders bought together) for every placed order"""
+    pairs = (
+        OrderProduct.objects.exclude(order__status='cart')
+        .values('product_id', other_id=F('order__order_items__product_id'))
+        .exclude(other_id=F('product_id'))
+        .annotate(together=Count('order_id', distinct=True))
+        .order_by()
+    )
+    for row in pairs.iterator(chunk_size=5000):
+        yield row['product_id'], row['other_id'], row['together']
+
+
+def _price_neighbours(prices, index, k):
+    """Indexes of the k products closest in price to prices[index]"""
+    left, right, picked = index - 1, index + 1, []
+    target = prices[index][0]
+    while len(picked) < k and (left >= 0 or right < len(prices)):
+        take_left = right >= len(prices) or (
+            left >= 0 and target - prices[left][0] <= prices[right][0] - target
+        )
+        if take_left:
+            picked.append(left)
+            left -= 1
+        else:
+            picked.append(right)
+            right += 1
+    return picked
+
+
+def build_related(k=RELATED_PER_PRODUCT):
+    """Replace the related product table, returns the number of rows written"""
+    active = dict(Product.objects.filter(is_active=True).values_list('id', 'price'))
+
+    bought_with = defaultdict(list)
+    for product_id, other_id, together in co_purchase_counts():
+        if product_id in active and other_id in active:
+            bought_with[product_id].append((together, other_id))
+
+    prices = sorted((price, pk) for pk, price in active.items())
+    position = {pk: i for i, (_, pk) in enumerate(prices)}
+
+    rows = []
+    for product_id, price in active.items():
+        top = sorted(bought_with.get(product_id, []), reverse=True)[:k]
+        chosen = {other_id for _, other_id in top}
+        rows.extend(
+            RelatedProduct(product_id=product_id, related_id=other_id, score=together, source='copurchase')
+            for together, other_id in top
+        )
+        if len(chosen) < k:
+            # similarity below 1 keeps price neighbours behind any co-purchase
+            for index in _price_neighbours(prices, position[product_id], k):
+                other_price, other_id = prices[index]
+                if len(chosen) >= k:
+                    break
+                if other_id in chosen:
+                    continue
+                chosen.add(other_id)
+                distance = abs(other_price - price) / max(price, other_price, 1)
+                rows.append(RelatedProduct(
+                    product_id=product_id, related_id=other_id,
+                    score=float(1 - distance) * 0.99, source='price',
+                ))
+
+    with transaction.atomic():
+        RelatedProduct.objects.all().delete()
+        RelatedProduct.objects.bulk_create(rows, batch_size=2000)
+    cache.delete(ID_RANGE_KEY)
+    return len(rows)
+
+
+def _random_products(exclude_id, limit):
+    """Cheap random pick for cold products: an id range scan from a random start"""
+    id_range = cache.get(ID_RANGE_KEY)
+    if id_range is None:
+        bounds = Product.objects.using(DEFAULT_DB_ALIAS).filter(is_active=True).aggregate(low=Min('id'), high=Max('id'))
+        id_range = (bounds['low'], bounds['high'])
+        cache.set(ID_RANGE_KEY, id_range, 3600)
+    if id_range[0] is None:
+        return []
+    start = random.randint(*id_range)
+    products = Product.objects.filter(is_active=True).exclude(id=exclude_id)
+    picked = list(products.filter(id__gte=start).order_by('id')[:limit])
+    if len(picked) < limit:
+        picked += list(products.filter(id__lt=start).order_by('id')[:limit - len(picked)])
+    return picked
+
+
+def _top_links(product, limit):
+    return (
+        RelatedProduct.objects.filter(product=product, related__is_active=True)
+        .select_related('related')
+        .order_by('-score')[:limit]
+    )
+
+
+def related_products(product, limit=4):
+    """Top related products from the precomputed table, random ones when cold"""
+    related = [link.related for link in _top_links(product, limit)]
+    if len(related) < limit:
+        seen = {p.id for p in related}
+        related += [p for p in _random_products(product.id, limit) if p.id not in seen][:limit - len(related)]
+    return related
+
+
+async def arelated_products(product, limit=4):
+    related = [link.related async for link in _top_links(product, limit)]
+    if len(related) < limit:
+        seen = {p.id for p in related}
+        fallback = await sync_to_async(_random_products)(product.id, limit)
+        related += [p for p in fallback if p.id not in seen][:limit - len(related)]
+    return related
@@ -0,0 +1,305 @@
+"""Sales reporting from daily rollups.
+
+DailySales and DailyProductSales are adjusted by the order signals as orders
+are created, checked out, moved between statuses or deleted, so reports only
+ever read a few rows per day.  `manage.py backfill_reports` rebuilds them from
+Order/OrderProduct, a chunk of days at a time, for history and after bulk
+edits that bypass the signals.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, time, timedelta
+from types import SimpleNamespace
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, F, Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailyProductSales, DailySales, Order, OrderProduct
+
+# statuses that count as sales; a cancelled order reached checkout but sold nothing
+NOT_SOLD = ('cart', 'cancelled')
+CHECKED_OUT = tuple(status for status, _ in Order.STATUS_CHOICES if status not in NOT_SOLD)
+FUNNEL = ('cart', 'pending', 'completed')
+TRACKED_FIELDS = {'status', 'created_date', 'placed_date', 'unit_count', 'total_price'}
+BACKFILL_CHUNK_DAYS = 31
+
+# {(model, keys): summed deltas} while inside batched_rollups()
+_pending = ContextVar('pending_rollups', default=None)
+
+
+def _day(order):
+    # open carts are reported under the day they were started
+    if order.status == 'cart' or order.placed_date is None:
+        return timezone.localdate(order.created_date)
+    return timezone.localdate(order.placed_date)
+
+
+def _contribution(order):
+    """(day, status, units, revenue) that order adds to DailySales"""
+    if order.status == 'cart':
+        return (_day(order), 'cart', 0, 0)
+    return (_day(order), order.status, order.unit_count, order.total_price)
+
+
+def _written(order, update_fields=None):
+    """Tracked fields a save of order writes: loaded ones, limited to update_fields"""
+    fields = TRACKED_FIELDS - order.get_deferred_fields()
+    return fields if update_fields is None else fields & set(update_fields)
+
+
+def stored_fields(order, update_fields=None):
+    """Fields order_saving needs from the stored row: all tracked ones once a save writes any"""
+    return TRACKED_FIELDS if order.pk is not None and _written(order, update_fields) else set()
+
+
+def order_saving(order, stored, update_fields=None):
+    """Remember the tracked fields of the stored row, read before order overwrites it.
+
+    The row is read by the Order pre_save signal, in the query stats makes
+    anyway, instead of a snapshot of every order the admin, reports and cart load.
+    """
+    needed = stored_fields(order, update_fields)
+    order._stored = {name: getattr(stored, name) for name in needed} if stored and needed else None
+
+
+def mark_placed(order):
+    if order.status != 'cart' and order.placed_date is None:
+        order.placed_date = timezone.now()
+
+
+def _add(model, keys, **deltas):
+    pending = _pending.get()
+    if pending is None:
+        _write(model, keys, **deltas)
+        return
+    summed = pending.setdefault((model, tuple(sorted(keys.items()))), {})
+    for name, delta in deltas.items():
+        summed[name] = summed.get(name, 0) + delta
+
+
+@contextmanager
+def batched_rollups():
+    """Sum the rollup adjustments made inside the block and write each row once as it ends"""
+    pending = {}
+    token = _pending.set(pending)
+    try:
+        yield
+    finally:
+        _pending.reset(token)
+    for (model, keys), deltas in pending.items():
+        if any(deltas.values()):
+            _write(model, dict(keys), **deltas)
+
+
+def _write(model, keys, **deltas):
+    changes = {name: F(name) + delta for name, delta in deltas.items()}
+    if model.objects.filter(**keys).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**keys, **deltas)
+    except IntegrityError:
+        # a concurrent writer created the row first
+        model.objects.filter(**keys).update(**changes)
+
+
+def _add_order(contribution, sign):
+    day, status, units, revenue = contribution
+    _add(DailySales, {'day': day, 'status': status}, orders=sign, units=sign * units, revenue=sign * revenue)
+
+
+def _add_started(order):
+    """Count order into the carts started on its creation day, deletes never take it back out"""
+    _add(DailySales, {'day': timezone.localdate(order.created_date), 'status': 'cart'}, started=1)
+
+
+def _add_lines(day, order, sign):
+    for product_id, quantity, price in OrderProduct.objects.filter(order=order).values_list('product_id', 'quantity', 'price'):
+        _add(
+            DailyProductSales, {'day': day, 'product_id': product_id},
+            orders=sign, units=sign * quantity, revenue=sign * quantity * price,
+        )
+
+
+def _sales_day(contribution):
+    """Day the order's lines are counted under in DailyProductSales, None for carts and cancellations"""
+    return contribution[0] if contribution and contribution[1] not in NOT_SOLD else None
+
+
+def order_saved(order, created, update_fields=None):
+    stored = order.__dict__.pop('_stored', None)
+    if stored is None and not created:
+        return  # no tracked field written
+    if created:
+        before, after = None, _contribution(order)
+        _add_started(order)
+    else:
+        # fields the save left alone keep their stored values
+        before = _contribution(SimpleNamespace(**stored))
+        after = _contribution(SimpleNamespace(**{
+            **stored, **{name: getattr(order, name) for name in _written(order, update_fields)},
+        }))
+    if before != after:
+        if before:
+            _add_order(before, -1)
+        _add_order(after, 1)
+        if _sales_day(before) != _sales_day(after):
+            if _sales_day(before):
+                _add_lines(_sales_day(before), order, -1)
+            if _sales_day(after):
+                _add_lines(_sales_day(after), order, 1)
+
+
+def order_deleting(order):
+    # runs before the cascade removes the lines; deletes load the rows they
+    # remove, so order holds the stored values unless they were deferred
+    if TRACKED_FIELDS & order.get_deferred_fields():
+        return  # left for backfill_reports
+    before = _contribution(order)
+    _add_order(before, -1)
+    if _sales_day(before):
+        _add_lines(_sales_day(before), order, -1)
+
+
+def _bounds(start, end):
+    tz = timezone.get_current_timezone()
+    return datetime.combine(start, time.min, tz), datetime.combine(end + timedelta(days=1), time.min, tz)
+
+
+def rebuild(start, end):
+    """Recompute the rollups of days start..end from the order tables, returns the orders counted"""
+    lower, upper = _bounds(start, end)
+    placed = Order.objects.exclude(status='cart').filter(placed_date__gte=lower, placed_date__lt=upper)
+    carts = Order.objects.filter(status='cart', created_date__gte=lower, created_date__lt=upper)
+    created = Order.objects.filter(created_date__gte=lower, created_date__lt=upper)
+    sales = [
+        DailySales(day=row['day'], status=row['status'], orders=row['orders'],
+                   units=row['units'] or 0, revenue=row['revenue'] or 0)
+        for row in placed.annotate(day=TruncDate('placed_date')).values('day', 'status').annotate(
+            orders=Count('id'), units=Sum('unit_count'), revenue=Sum('total_price'),
+        ).order_by()
+    ]
+    open_carts = dict(
+        carts.annotate(day=TruncDate('created_date')).values_list('day').annotate(orders=Count('id')).order_by()
+    )
+    # deleted carts are gone from the order table, so a rebuild never lowers the started counts
+    started = dict(DailySales.objects.filter(day__range=(start, end), status='cart').values_list('day', 'started'))
+    for day, orders in created.annotate(day=TruncDate('created_date')).values_list('day').annotate(
+        orders=Count('id'),
+    ).order_by():
+        started[day] = max(started.get(day, 0), orders)
+    sales += [
+        DailySales(day=day, status='cart', orders=open_carts.get(day, 0), started=started.get(day, 0))
+        for day in sorted(open_carts.keys() | started.keys())
+    ]
+    lines = (
+        OrderProduct.objects.exclude(order__status__in=NOT_SOLD)
+        .filter(order__placed_date__gte=lower, order__placed_date__lt=upper)
+        .annotate(day=TruncDate('order__placed_date')).values('day', 'product_id')
+        .annotate(
+            orders=Count('id'), units=Sum('quantity'),
+            revenue=Sum(F('quantity') * F('price'), output_field=DecimalField()),
+        ).order_by()
+    )
+    products = [DailyProductSales(**row) for row in lines]
+
+    with transaction.atomic():
+        DailySales.objects.filter(day__range=(start, end)).delete()
+        DailyProductSales.objects.filter(day__range=(start, end)).delete()
+        DailySales.objects.bulk_create(sales, batch_size=1000)
+        DailyProductSales.objects.bulk_create(products, batch_size=1000)
+    return sum(row.orders for row in sales)
+
+
+def backfill(start=None, end=None, chunk_days=BACKFILL_CHUNK_DAYS, progress=None):
+    """Rebuild the rollups chunk by chunk, from the first order (or start) to today (or end).
+
+    progress, if given, is called with (chunk start, chunk end, orders counted).
+    Returns the total number of orders counted.
+    """
+    if start is None:
+        first = Order.objects.aggregate(first=Min('created_date'))['first']
+        if first is None:
+            return 0
+        start = timezone.localdate(first)
+    end = end or timezone.localdate()
+    total = 0
+    while start <= end:
+        chunk_end = min(start + timedelta(days=chunk_days - 1), end)
+        counted = rebuild(start, chunk_end)
+        total += counted
+        if progress:
+            progress(start, chunk_end, counted)
+        start = chunk_end + timedelta(days=1)
+    return total
+
+
+def revenue_by_day(start, end):
+    """Checked-out orders, units and revenue for every day with sales, oldest first"""
+    return list(
+        DailySales.objects.filter(day__range=(start, end), status__in=CHECKED_OUT)
+        .values('day').annotate(orders=Sum('orders'), units=Sum('units'), revenue=Sum('revenue'))
+        .order_by('day')
+    )
+
+
+def product_sales(start, end, order_by='-revenue', limit=None):
+    """Orders, units and revenue per product, best first; order_by='-units' gives the top sellers"""
+    rows = (
+        DailyProductSales.objects.filter(day__range=(start, end))
+        .values('product_id', name=F('product__name'))
+        .annotate(orders=Sum('orders'), units=Sum('units'), revenue=Sum('revenue'))
+        .filter(orders__gt=0)  # rows left at zero by cancellations and deletes
+        .order_by(order_by, 'product_id')
+    )
+    return list(rows[:limit] if limit else rows)
+
+
+def basket_summary(start, end):
+    """Average value and size of a checked-out order"""
+    totals = DailySales.objects.filter(day__range=(start, end), status__in=CHECKED_OUT).aggregate(
+        orders=Sum('orders'), units=Sum('units'), revenue=Sum('revenue'),
+    )
+    orders = totals['orders'] or 0
+    return {
+        'orders': orders,
+        'revenue': totals['revenue'] or 0,
+        'average_value': totals['revenue'] / orders if orders else None,
+        'average_units': totals['units'] / orders if orders else None,
+    }
+
+
+def status_funnel(start, end):
+    """Orders per status plus how many started carts reached checkout and completion"""
+    rows = DailySales.objects.filter(day__range=(start, end))
+    by_status = dict.fromkeys((status for status, _ in Order.STATUS_CHOICES), 0)
+    by_status.update(rows.values_list('status').annotate(orders=Sum('orders')).order_by())
+    # every order was a cart once; expired and deleted carts stay in the started count
+    started = rows.filter(status='cart').aggregate(started=Sum('started'))['started'] or 0
+    reached = {
+        'cart': started,
+        'pending': sum(by_status[status] for status in CHECKED_OUT) + by_status['cancelled'],
+        'completed': by_status['completed'],
+    }
+    return {
+        'by_status': by_status,
+        'stages': [
+            {'status': status, 'orders': reached[status],
+             'percent': round(100 * reached[status] / started) if started else 0}
+            for status in FUNNEL
+        ],
+    }
+
+
+def sales_report(start, end, top=10):
+    return {
+        'start': start,
+        'end': end,
+        'days': revenue_by_day(start, end),
+        'top_sellers': product_sales(start, end, order_by='-units', limit=top),
+        'top_revenue': product_sales(start, end, limit=top),
+        'basket': basket_summary(start, end),
+        'funnel': status_funnel(start, end),
+    }
@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.db.models import Q
+
+from .catalog import decode_cursor, encode_cursor
+from .models import Review
+
+REVIEW_PAGE_SIZE = getattr(settings, 'REVIEW_PAGE_SIZE', 10)
+
+
+def _page_queryset(cursor, per_page):
+    reviews = Review.objects.filter(is_approved=True).select_related('customer__user')
+    position = decode_cursor('created_date', cursor)
+    if position:
+        created_date, pk = position
+        reviews = reviews.filter(Q(created_date__lt=created_date) | Q(created_date=created_date, id__lt=pk))
+    return reviews.order_by('-created_date', '-id')[:per_page + 1]
+
+
+def _page(reviews, per_page):
+    next_cursor = None
+    if len(reviews) > per_page:
+        reviews = reviews[:per_page]
+        next_cursor = encode_cursor('created_date', reviews[-1])
+    return {'reviews': reviews, 'next_cursor': next_cursor}
+
+
+def get_review_page(cursor=None, per_page=REVIEW_PAGE_SIZE):
+    """Return one page of approved reviews, newest first, and the cursor of the following page
+
+    Pages are keyed on (created_date, id) rather than an offset, so a deep page
+    costs the same single query as the first one and no COUNT(*) is needed.
+    """
+    return _page(list(_page_queryset(cursor, per_page)), per_page)
+
+
+async def aget_review_page(cursor=None, per_page=REVIEW_PAGE_SIZE):
+    return _page([review async for review in _page_queryset(cursor, per_page)], per_page)
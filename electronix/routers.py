@@ -0,0 +1,115 @@
+"""Read replica routing for the read-only storefront pages.
+
+ReplicaMiddleware marks requests for the views in REPLICA_VIEWS, and while
+such a request runs ReplicaRouter sends its reads to settings.READ_REPLICA.
+Writes, and every read outside those views, stay on the primary.  A request
+that writes pins the shopper to the primary for REPLICA_STICKY_SECONDS (by
+cookie), so a cart change shows up on the next page even when the replica lags.
+
+Whatever these views cache for every visitor (catalog pages, counters, stock
+levels, customers, the founder grid) is read from the primary with
+.using(DEFAULT_DB_ALIAS): the invalidation already happened there, so a lagging
+replica's rows would be cached under the new keys for the whole timeout.
+"""
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# url names of the views whose reads may lag the primary by a few seconds
+REPLICA_VIEWS = frozenset(getattr(settings, 'REPLICA_VIEWS', {
+    'laptops-list', 'product-detail', 'review_list', 'about-us',
+}))
+REPLICA_STICKY_SECONDS = getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+STICKY_COOKIE = 'primary_reads'
+
+
+class RequestRouting:
+    def __init__(self, pinned):
+        self.pinned = pinned  # wrote within the last REPLICA_STICKY_SECONDS
+        self.replica = False  # the resolved view may read from the replica
+        self.wrote = False
+
+
+_current = ContextVar('replica_routing', default=None)
+
+
+def replica_alias():
+    """Alias the current request may read from, None for the primary.
+
+    Once the request has written (select_for_update counts), its later reads
+    go to the primary too, so they see their own transaction.
+    """
+    alias = getattr(settings, 'READ_REPLICA', None)
+    routing = _current.get()
+    if not alias or routing is None or not routing.replica or routing.pinned or routing.wrote:
+        return None
+    return alias
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return replica_alias()
+
+    def db_for_write(self, model, **hints):
+        routing = _current.get()
+        if routing is not None:
+            routing.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replica holds the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # data migrations write through the primary and reach a replica by
+        # replication; tables (and RunPython steps hinted schema=True) are
+        # still created on a stand-in such as the tests' replica database
+        if db != DEFAULT_DB_ALIAS and model_name is None and not hints.get('schema'):
+            return False
+        return None
+
+
+class ReplicaMiddleware:
+    """Route the reads of REPLICA_VIEWS to the replica and keep writers on the primary"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        routing = RequestRouting(STICKY_COOKIE in request.COOKIES)
+        token = _current.set(routing)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.pin(response, routing)
+
+    async def __acall__(self, request):
+        routing = RequestRouting(STICKY_COOKIE in request.COOKIES)
+        token = _current.set(routing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.pin(response, routing)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        routing = _current.get()
+        if routing is not None:
+            routing.replica = request.resolver_match.url_name in REPLICA_VIEWS
+
+    def pin(self, response, routing):
+        if routing.wrote and getattr(settings, 'READ_REPLICA', None):
+            response.set_cookie(
+                STICKY_COOKIE, '1', max_age=REPLICA_STICKY_SECONDS, httponly=True, samesite='Lax',
+                secure=settings.SESSION_COOKIE_SECURE,
+            )
+        return response
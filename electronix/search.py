@@ -0,0 +1,79 @@
+import re
+from functools import reduce
+from operator import and_
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.functions import Substr
+
+from .models import Product
+
+SEARCH_PAGE_SIZE = 24
+MAX_TERMS = 8
+
+_TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+SQLITE_SEARCH = """
+    SELECT p.id FROM electronix_product_fts
+    JOIN electronix_product p ON p.id = electronix_product_fts.rowid
+    WHERE electronix_product_fts MATCH %s AND p.is_active
+    ORDER BY bm25(electronix_product_fts, 10.0, 1.0), p.id DESC
+    LIMIT %s OFFSET %s
+"""
+
+POSTGRES_SEARCH = """
+    SELECT id FROM electronix_product, to_tsquery('english', %s) query
+    WHERE is_active AND search_vector @@ query
+    ORDER BY ts_rank_cd(search_vector, query) DESC, id DESC
+    LIMIT %s OFFSET %s
+"""
+
+
+def search_terms(query):
+    """Split free text into at most MAX_TERMS lowercase word terms"""
+    return [term.lower() for term in _TERM_RE.findall(query or '')][:MAX_TERMS]
+
+
+def _ranked_ids(terms, limit, offset):
+    if connection.vendor == 'sqlite':
+        # quoted prefix terms, implicitly AND-ed; quoting keeps FTS5 operators inert
+        match = ' '.join(f'"{term}"*' for term in terms)
+        sql, params = SQLITE_SEARCH, [match, limit, offset]
+    elif connection.vendor == 'postgresql':
+        sql, params = POSTGRES_SEARCH, [' & '.join(f'{term}:*' for term in terms), limit, offset]
+    else:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def naive_search(terms, limit, offset=0):
+    """Unindexed icontains scan, the fallback for other backends and the benchmark baseline"""
+    products = Product.objects.filter(is_active=True)
+    if terms:
+        products = products.filter(reduce(and_, (
+            Q(name__icontains=term) | Q(details__icontains=term) for term in terms
+        )))
+    return list(products.order_by('-created_date', '-id').values_list('id', flat=True)[offset:offset + limit])
+
+
+def search_products(query, page=1, per_page=SEARCH_PAGE_SIZE):
+    """Return (products, has_next) for one page of ranked search results"""
+    terms = search_terms(query)
+    if not terms:
+        return [], False
+    offset = (max(page, 1) - 1) * per_page
+    ids = _ranked_ids(terms, per_page + 1, offset)
+    if ids is None:
+        ids = naive_search(terms, per_page + 1, offset)
+
+    has_next = len(ids) > per_page
+    ids = ids[:per_page]
+    products = (
+        Product.objects.filter(id__in=ids)
+        .only('id', 'name', 'image', 'image_variants', 'price', 'created_date')
+        .annotate(summary=Substr('details', 1, 300))
+        .in_bulk()
+    )
+    return [products[pk] for pk in ids if pk in products], has_next
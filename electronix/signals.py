@@ -0,0 +1,100 @@
+from allauth.account.signals import user_signed_up
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .cart import invalidate_cart_summary, order_user_id
+from .catalog import invalidate_catalog
+from .customers import invalidate_customer
+from .images import refresh_variants
+from .inventory import invalidate_stock
+from .models import Product, Customer, Order, FounderInfo, Review
+from . import fragments, inventory, metrics, reports, stats
+
+
+@receiver([post_save, post_delete], sender=Product)
+def product_changed(sender, instance, **kwargs):
+    invalidate_catalog()
+    invalidate_stock([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=FounderInfo)
+def founder_changed(sender, **kwargs):
+    fragments.bump('founders')
+
+
+@receiver([post_save, post_delete], sender=Review)
+def review_changed(sender, **kwargs):
+    fragments.bump('reviews')
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=FounderInfo)
+def image_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields and 'image' not in update_fields:
+        return
+    refresh_variants(instance)
+
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    metrics.install_query_recorder(connection)
+
+
+@receiver(user_signed_up)
+def signed_up(sender, request, user, **kwargs):
+    # create the customer now so shopping never has to write it
+    Customer.objects.get_or_create(user=user)
+
+
+@receiver([post_save, post_delete], sender=Customer)
+def customer_changed(sender, instance, **kwargs):
+    invalidate_customer(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=Order)
+def order_changed(sender, instance, **kwargs):
+    # checkout, admin edits and cart deletion all go through the model layer; the
+    # cart code hands its orders the customer or their user ids, so only admin deletes look it up.
+    # The summary is dropped on commit, so a concurrent reader cannot cache the old row again.
+    invalidate_cart_summary(order_user_id(instance))
+
+
+@receiver(pre_save, sender=Product)
+@receiver(pre_save, sender=Review)
+def counted_saving(sender, instance, using, update_fields=None, **kwargs):
+    stats.instance_saving(instance, using, update_fields)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Order)
+@receiver(post_save, sender=Review)
+def counted_saved(sender, instance, created, **kwargs):
+    stats.instance_saved(instance, created)
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Order)
+@receiver(post_delete, sender=Review)
+def counted_deleted(sender, instance, **kwargs):
+    stats.instance_deleted(instance)
+
+
+@receiver(pre_save, sender=Order)
+def order_placing(sender, instance, using, update_fields=None, **kwargs):
+    reports.mark_placed(instance)
+    # one read of the stored row serves the counters and the rollups
+    stored = stats.instance_saving(instance, using, update_fields, reports.stored_fields(instance, update_fields))
+    reports.order_saving(instance, stored, update_fields)
+    inventory.order_saving(instance)
+
+
+@receiver(post_save, sender=Order)
+def order_reported(sender, instance, created, update_fields=None, **kwargs):
+    reports.order_saved(instance, created, update_fields)
+
+
+@receiver(pre_delete, sender=Order)
+def order_deleting(sender, instance, **kwargs):
+    reports.order_deleting(instance)
+    inventory.order_deleting(instance)
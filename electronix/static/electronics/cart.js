@@ -0,0 +1,152 @@
+// Cart buttons without a page reload.
+//
+// Forms marked with data-cart-api post to the JSON cart API instead of their
+// regular action and the page is patched from the response: the changed line,
+// the badge and the totals.  Without JavaScript the forms post as before and
+// the server redirects back to a freshly rendered page.
+(function () {
+    'use strict';
+
+    function csrfToken(form) {
+        var field = form.querySelector('input[name="csrfmiddlewaretoken"]');
+        if (field) {
+            return field.value;
+        }
+        var match = document.cookie.match(/(?:^|;\s*)csrftoken=([^;]+)/);
+        return match ? decodeURIComponent(match[1]) : '';
+    }
+
+    function money(value) {
+        return '$' + value;
+    }
+
+    function setText(root, selector, text) {
+        root.querySelectorAll(selector).forEach(function (node) {
+            node.textContent = text;
+        });
+    }
+
+    function updateBadge(cart) {
+        var button = document.querySelector('.cart-button');
+        if (!button) {
+            return;
+        }
+        var badge = button.querySelector('.cart-badge');
+        if (!cart.lines) {
+            if (badge) {
+                badge.remove();
+            }
+            return;
+        }
+        if (!badge) {
+            badge = document.createElement('span');
+            badge.className = 'cart-badge';
+            button.appendChild(badge);
+        }
+        badge.textContent = cart.lines;
+    }
+
+    function apiForm(url, action, label, className, token) {
+        var form = document.createElement('form');
+        form.method = 'POST';
+        form.action = url;
+        form.setAttribute('data-cart-api', url);
+        form.setAttribute('data-cart-action', action);
+        form.setAttribute('data-cart-built', '');
+        var input = document.createElement('input');
+        input.type = 'hidden';
+        input.name = 'csrfmiddlewaretoken';
+        input.value = token;
+        var button = document.createElement('button');
+        button.type = 'submit';
+        button.className = className;
+        button.textContent = label;
+        form.appendChild(input);
+        form.appendChild(button);
+        return form;
+    }
+
+    // product card: swap between "Add to cart" and the quantity controls
+    function updateCard(controls, line, token) {
+        var quantity = controls.querySelector('.quantity');
+        if (line && quantity) {
+            quantity.textContent = line.quantity;
+            return;
+        }
+        controls.replaceChildren();
+        if (!line) {
+            controls.appendChild(apiForm(controls.dataset.add, 'add', 'Add to cart', 'add-to-cart-btn', token));
+            return;
+        }
+        var row = document.createElement('div');
+        row.className = 'quantity-controls';
+        quantity = document.createElement('span');
+        quantity.className = 'quantity';
+        quantity.textContent = line.quantity;
+        row.appendChild(apiForm(controls.dataset.subtract, 'subtract', '−', 'qty-btn', token));
+        row.appendChild(quantity);
+        row.appendChild(apiForm(controls.dataset.add, 'add', '+', 'qty-btn', token));
+        var link = document.createElement('a');
+        link.href = controls.dataset.cart;
+        link.className = 'go-to-cart-btn';
+        link.textContent = 'Go to cart';
+        controls.appendChild(row);
+        controls.appendChild(link);
+    }
+
+    // cart page: one line and the order summary
+    function updateCartPage(item, data) {
+        if (!data.cart.lines) {
+            window.location.reload();  // the empty cart is rendered by the server
+            return;
+        }
+        if (!data.line) {
+            item.remove();
+        } else {
+            setText(item, '.quantity', data.line.quantity);
+            setText(item, '.subtotal', money(data.line.subtotal));
+        }
+        var units = data.cart.units;
+        setText(document, '[data-cart-units]', units + ' item' + (units === 1 ? '' : 's'));
+        setText(document, '[data-cart-total]', money(data.cart.total));
+    }
+
+    document.addEventListener('submit', function (event) {
+        var form = event.target.closest('form[data-cart-api]');
+        if (!form || !window.fetch) {
+            return;
+        }
+        event.preventDefault();
+        var token = csrfToken(form);
+        var buttons = form.querySelectorAll('button');
+        buttons.forEach(function (button) { button.disabled = true; });
+        fetch(form.getAttribute('data-cart-api'), {
+            method: 'POST',
+            headers: {'X-CSRFToken': token, 'Accept': 'application/json'},
+            credentials: 'same-origin',
+        }).then(function (response) {
+            if (!response.ok) {
+                throw new Error(response.status);
+            }
+            return response.json();
+        }).then(function (data) {
+            updateBadge(data.cart);
+            var controls = form.closest('[data-cart-controls]');
+            var item = form.closest('[data-cart-item]');
+            if (controls) {
+                updateCard(controls, data.line, token);
+            } else if (item || form.getAttribute('data-cart-action') === 'clear') {
+                updateCartPage(item, data);
+            }
+        }).catch(function () {
+            if (form.hasAttribute('data-cart-built')) {
+                window.location.reload();
+                return;
+            }
+            form.removeAttribute('data-cart-api');
+            form.submit();  // let the regular view render the page and its messages
+        }).finally(function () {
+            buttons.forEach(function (button) { button.disabled = false; });
+        });
+    });
+}());
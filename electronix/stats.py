@@ -0,0 +1,140 @@
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F
+
+from .models import Product, Order, Review, StoreStat
+
+STATS_CACHE_KEY = 'storefront-stats'
+STATS_CACHE_TIMEOUT = getattr(settings, 'STATS_CACHE_TIMEOUT', 60)
+PLACED_STATUSES = ('processing', 'shipped', 'completed')
+
+RATINGS = range(1, 6)
+
+# counter name -> (model, fields the rule reads, rule for a single instance, queryset filter)
+COUNTERS = {
+    'active_products': (Product, {'is_active'}, lambda p: p.is_active, {'is_active': True}),
+    'placed_orders': (Order, {'status'}, lambda o: o.status in PLACED_STATUSES, {'status__in': PLACED_STATUSES}),
+    'approved_reviews': (Review, {'is_approved'}, lambda r: r.is_approved, {'is_approved': True}),
+    # star histogram of approved reviews, the review feed's rating summary
+    **{
+        f'rating_{stars}': (
+            Review, {'is_approved', 'rating'},
+            lambda r, stars=stars: r.is_approved and r.rating == stars,
+            {'is_approved': True, 'rating': stars},
+        )
+        for stars in RATINGS
+    },
+}
+
+
+def _counters_for(model):
+    return [(name, fields, rule) for name, (m, fields, rule, _) in COUNTERS.items() if m is model]
+
+
+def _tracked(instance, update_fields=None):
+    """Counters a save or delete of instance can move: their fields are loaded (and being written)"""
+    deferred = instance.get_deferred_fields()
+    return [
+        (name, fields, rule) for name, fields, rule in _counters_for(type(instance))
+        if not fields & deferred and (update_fields is None or fields & set(update_fields))
+    ]
+
+
+def instance_saving(instance, using, update_fields=None, also_read=()):
+    """Remember which counters the stored row contributes to, before instance overwrites it.
+
+    One query per save of an existing row, instead of a snapshot of every row
+    the product and review pages load.  The same query reads the fields in
+    also_read for the caller; returns the row read, None when none was.
+    """
+    counters = _tracked(instance, update_fields) if instance.pk is not None else []
+    fields = set().union(also_read, *(fields for _, fields, _ in counters))
+    row = fields and type(instance)._base_manager.using(using).filter(pk=instance.pk).values(*fields).first()
+    stored = SimpleNamespace(**row) if row else None
+    instance._counted = {name: rule(stored) for name, _, rule in counters} if stored else {}
+    return stored
+
+
+def _bump(name, delta):
+    if not StoreStat.objects.filter(name=name).update(value=F('value') + delta):
+        reconcile([name])
+    transaction.on_commit(lambda: cache.delete(STATS_CACHE_KEY))
+
+
+def instance_saved(instance, created):
+    before = {} if created else instance.__dict__.pop('_counted', {})
+    for name, fields, rule in _counters_for(type(instance)):
+        if not created and name not in before:
+            continue  # not written, or deferred when loaded and left for reconciliation
+        delta = int(rule(instance)) - int(before.get(name, False))
+        if delta:
+            _bump(name, delta)
+
+
+def instance_deleted(instance):
+    # deletes load the rows they remove, so instance holds the stored values
+    for name, _, rule in _tracked(instance):
+        if rule(instance):
+            _bump(name, -1)
+
+
+def reconcile(names=None, repair=True):
+    """Recount counters from the source tables, returns {name: (stored, actual)} for drifted ones"""
+    drift = {}
+    stored = dict(StoreStat.objects.values_list('name', 'value'))
+    for name in names or COUNTERS:
+        model, _, _, filters = COUNTERS[name]
+        actual = model.objects.filter(**filters).count()
+        if stored.get(name) != actual:
+            drift[name] = (stored.get(name), actual)
+            if repair:
+                StoreStat.objects.update_or_create(name=name, defaults={'value': actual})
+    if drift and repair:
+        cache.delete(STATS_CACHE_KEY)
+    return drift
+
+
+def _stats_rows():
+    # read from the primary: the result is cached for every visitor
+    return StoreStat.objects.using(DEFAULT_DB_ALIAS).filter(name__in=COUNTERS).values_list('name', 'value')
+
+
+def get_storefront_stats():
+    """Counters for the about page, from cache or one query over StoreStat"""
+    stats = cache.get(STATS_CACHE_KEY)
+    if stats is None:
+        stats = dict.fromkeys(COUNTERS, 0)
+        stats.update(_stats_rows())
+        cache.set(STATS_CACHE_KEY, stats, STATS_CACHE_TIMEOUT)
+    return stats
+
+
+async def aget_storefront_stats():
+    stats = await cache.aget(STATS_CACHE_KEY)
+    if stats is None:
+        stats = dict.fromkeys(COUNTERS, 0)
+        stats.update([row async for row in _stats_rows()])
+        await cache.aset(STATS_CACHE_KEY, stats, STATS_CACHE_TIMEOUT)
+    return stats
+
+
+def rating_summary(counters):
+    """Review count, average rating and 1-5 star histogram from the stored counters"""
+    histogram = {stars: counters[f'rating_{stars}'] for stars in RATINGS}
+    count = sum(histogram.values())
+    average = sum(stars * n for stars, n in histogram.items()) / count if count else None
+    return {
+        'count': count,
+        'average': average,
+        'histogram': [
+            {'stars': stars, 'count': n, 'percent': round(100 * n / count) if count else 0}
+            for stars, n in sorted(histogram.items(), reverse=True)
+        ],
+    }
+
+
+def get_rating_summary():
+    return rating_summary(get_storefront_stats())
@@ -0,0 +1,27 @@
+from django import template
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+from ..assets import ASSET_BUNDLES, bundle_path, manifest_loaded
+
+register = template.Library()
+
+
+@register.simple_tag
+def css_bundle(name):
+    """Link CSS bundle name: the hashed bundle once collectstatic has run,
+    its individual source files until then.
+
+    The bundle is hashed whatever DEBUG is (the manifest storage only hashes
+    without DEBUG unless forced).  A manifest that lacks the bundle raises
+    ValueError, like any other missing manifest entry, rather than quietly
+    linking the sources.
+    """
+    if name not in ASSET_BUNDLES:
+        raise template.TemplateSyntaxError(f"Unknown CSS bundle {name!r}")
+    if manifest_loaded():
+        return format_html('<link rel="stylesheet" href="{}">', staticfiles_storage.url(bundle_path(name), force=True))
+    return format_html_join(
+        '\n', '<link rel="stylesheet" href="{}">', ((static(source),) for source in ASSET_BUNDLES[name])
+    )
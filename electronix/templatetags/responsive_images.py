@@ -0,0 +1,39 @@
+from django import template
+from django.utils.html import format_html
+
+register = template.Library()
+
+DEFAULT_SIZES = '(max-width: 600px) 100vw, 320px'
+
+
+def _srcset(storage, widths):
+    return ', '.join(
+        f"{storage.url(name)} {width}w"
+        for width, name in sorted(widths.items(), key=lambda item: int(item[0]))
+    )
+
+
+@register.simple_tag
+def picture(obj, alt='', sizes=DEFAULT_SIZES, field='image'):
+    """Render obj's image as a <picture> with WebP and JPEG srcsets.
+
+    Falls back to a plain <img> of the original upload until the derivatives
+    have been built.
+    """
+    image = getattr(obj, field)
+    if not image:
+        return ''
+    variants = getattr(obj, f'{field}_variants', None) or {}
+    if variants.get('source') != image.name or 'jpeg' not in variants:
+        return format_html('<img src="{}" alt="{}" loading="lazy" decoding="async">', image.url, alt)
+
+    storage = image.storage
+    jpeg = variants['jpeg']
+    webp = variants.get('webp')
+    source = format_html(
+        '<source type="image/webp" srcset="{}" sizes="{}">', _srcset(storage, webp), sizes
+    ) if webp else ''
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" alt="{}" loading="lazy" decoding="async"></picture>',
+        source, storage.url(jpeg[max(jpeg, key=int)]), _srcset(storage, jpeg), sizes, alt,
+    )
@@ -1,3 +1,1427 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management import call_command
+from django.db import connection
+from django.template import Context, Template
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import urlencode
+
+from . import (
+    assets, async_views, benchmark, cart, catalog, catalog_io, customers, fragments, inventory, likes, loadtest,
+    metrics, recommendations, reports, reviews, routers, search, stats,
+)
+from .models import (
+    Product, Customer, DailyProductSales, DailySales, FounderInfo, Order, OrderProduct, RelatedProduct, Review, ReviewLike, StoreStat,
+)
+from PIL import Image
+
+
+def make_products(count, price=Decimal('999.00'), stock=10):
+    return [
+        Product.objects.create(
+            name=f"Laptop {i}", image='products/test-laptop.png', price=price + i,
+            details="Fast laptop with a bright display " * 50, stock=stock,
+        )
+        for i in range(count)
+    ]
+
+
+class CatalogTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('shopper', password='pass12345')
+        self.customer = Customer.objects.create(user=self.user)
+
+    def test_keyset_pages_cover_catalog_once(self):
+        products = make_products(catalog.CATALOG_PAGE_SIZE * 2 + 3)
+        seen, cursor = [], None
+        while True:
+            page = catalog.get_catalog_page('newest', cursor)
+            seen.extend(p.id for p in page['products'])
+            cursor = page['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(seen, sorted((p.id for p in products), reverse=True))
+
+    def test_price_sort_and_bad_cursor(self):
+        make_products(3)
+        page = catalog.get_catalog_page('price_low', 'not-a-cursor')
+        prices = [p.price for p in page['products']]
+        self.assertEqual(prices, sorted(prices))
+
+    def test_page_is_cached_until_product_changes(self):
+        product = make_products(1)[0]
+        catalog.get_catalog_page()
+        with self.assertNumQueries(0):
+            catalog.get_catalog_page()
+
+        product.name = "Renamed"
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+            # not until the save commits
+            with self.assertNumQueries(0):
+                catalog.get_catalog_page()
+        self.assertEqual(catalog.get_catalog_page()['products'][0].name, "Renamed")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product.delete()
+        self.assertEqual(catalog.get_catalog_page()['products'], [])
+
+    def test_laptops_overlays_cart(self):
+        in_cart, other = make_products(2)
+        cart.add_to_cart(self.customer, in_cart, quantity=3)
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('laptops-list'))
+        products = {p.id: p for p in response.context['products']}
+        self.assertEqual(products[in_cart.id].cart_item.quantity, 3)
+        self.assertIsNone(products[other.id].cart_item)
+        self.assertEqual(response.context['cart_summary'].lines, 1)
+
+
+class CartServiceTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('shopper', password='pass12345')
+        self.customer = Customer.objects.create(user=self.user)
+        self.laptop, self.tablet = make_products(2, price=Decimal('100.00'))
+
+    def test_total_follows_every_mutation(self):
+        order = cart.add_to_cart(self.customer, self.laptop)
+        cart.add_to_cart(self.customer, self.laptop)
+        cart.add_to_cart(self.customer, self.tablet, quantity=3)
+        order.refresh_from_db()
+        self.assertEqual(order.total_price, Decimal('503.00'))
+
+        self.assertEqual(cart.subtract_from_cart(self.customer, self.laptop), 1)
+        line = OrderProduct.objects.get(order=order, product=self.tablet)
+        self.assertTrue(cart.remove_line(self.customer, line.id))
+        order.refresh_from_db()
+        self.assertEqual(order.total_price, Decimal('100.00'))
+        self.assertEqual(order.total_price, order.update_total())
+
+    def test_last_unit_drops_empty_cart(self):
+        cart.add_to_cart(self.customer, self.laptop)
+        self.assertEqual(cart.subtract_from_cart(self.customer, self.laptop), 0)
+        self.assertIsNone(cart.subtract_from_cart(self.customer, self.laptop))
+        self.assertFalse(Order.objects.filter(customer=self.customer).exists())
+
+    def test_repeat_add_is_constant_query_count(self):
+        cart.add_to_cart(self.customer, self.laptop)
+        # savepoint, cart lookup, line UPDATE, total UPDATE, release
+        with self.assertNumQueries(5):
+            cart.add_to_cart(self.customer, self.laptop)
+
+
+class CartApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('shopper', password='pass12345')
+        self.customer = Customer.objects.create(user=self.user)
+        self.laptop, self.tablet = make_products(2, price=Decimal('100.00'))
+        self.client.force_login(self.user)
+
+    def post(self, name, *args):
+        return self.client.post(reverse(name, args=args)).json()
+
+    def test_clicks_return_line_and_totals(self):
+        self.assertEqual(self.post('cart_api_add', self.laptop.id), {
+            'line': {'id': OrderProduct.objects.get().id, 'product': self.laptop.id, 'quantity': 1, 'subtotal': '100.00'},
+            'cart': {'lines': 1, 'units': 1, 'total': '100.00'},
+        })
+        self.post('cart_api_add', self.tablet.id)
+        data = self.post('cart_api_add', self.tablet.id)
+        self.assertEqual((data['line']['quantity'], data['line']['subtotal']), (2, '202.00'))
+        self.assertEqual(data['cart'], {'lines': 2, 'units': 3, 'total': '302.00'})
+
+        data = self.post('cart_api_subtract', self.laptop.id)
+        self.assertIsNone(data['line'])
+        self.assertEqual(data['cart'], {'lines': 1, 'units': 2, 'total': '202.00'})
+
+        line = OrderProduct.objects.get()
+        self.assertEqual(self.post('cart_api_remove', line.id), {
+            'line': None, 'cart': {'lines': 0, 'units': 0, 'total': '0.00'},
+        })
+        self.assertFalse(Order.objects.exists())
+
+    def test_summary_and_clear(self):
+        cart.add_to_cart(self.customer, self.laptop, quantity=2)
+        self.assertEqual(self.client.get(reverse('cart_api_summary')).json()['cart'],
+                         {'lines': 1, 'units': 2, 'total': '200.00'})
+        self.assertEqual(self.post('cart_api_clear')['cart']['lines'], 0)
+        self.assertFalse(Order.objects.exists())
+
+    def test_errors_are_json(self):
+        self.assertEqual(self.client.post(reverse('cart_api_subtract', args=[self.laptop.id])).status_code, 404)
+        self.assertEqual(self.client.post(reverse('cart_api_remove', args=[999])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('cart_api_add', args=[self.laptop.id])).status_code, 405)
+        self.client.logout()
+        response = self.client.post(reverse('cart_api_add', args=[self.laptop.id]))
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('error', response.json())
+
+    def test_forms_keep_their_fallback_action(self):
+        cart.add_to_cart(self.customer, self.laptop)
+        response = self.client.get(reverse('laptops-list'))
+        self.assertContains(response, f'action="{reverse("update_cart", args=[self.laptop.id, "add"])}" '
+                                      f'data-cart-api="{reverse("cart_api_add", args=[self.laptop.id])}"')
+        self.assertContains(response, f'action="{reverse("create-order", args=[self.tablet.id])}" '
+                                      f'data-cart-api="{reverse("cart_api_add", args=[self.tablet.id])}"')
+        self.assertContains(self.client.get(reverse('electronics-cart')), 'data-cart-api', count=4)
+
+
+class CartSummaryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('shopper', password='pass12345')
+        self.customer = Customer.objects.create(user=self.user)
+        self.laptop = make_products(1, price=Decimal('100.00'))[0]
+
+    def test_summary_is_cached_and_refreshed_on_cart_writes(self):
+        self.assertEqual(cart.get_cart_summary(self.user), cart.EMPTY_SUMMARY)
+        with self.captureOnCommitCallbacks(execute=True):
+            cart.add_to_cart(self.customer, self.laptop, quantity=2)
+        self.assertEqual(cart.get_cart_summary(self.user), (1, 2, Decimal('200.00')))
+        with self.assertNumQueries(0):
+            cart.get_cart_summary(self.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            order = cart.get_cart(self.customer)
+            order.status = 'pending'
+            order.save()
+        self.assertEqual(cart.get_cart_summary(self.user), cart.EMPTY_SUMMARY)
+
+    def test_summary_is_dropped_on_commit_without_a_customer_lookup(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            cart.add_to_cart(self.customer, self.laptop)
+        cart.get_cart_summary(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks() as callbacks:
+                cart.clear_cart(self.customer)
+            # a reader before the commit still gets the cached summary, never the uncommitted row
+            self.assertEqual(cart.get_cart_summary(self.user).lines, 1)
+        self.assertFalse([q for q in queries if '"electronix_customer"' in q['sql']])
+        for callback in callbacks:
+            callback()
+        self.assertEqual(cart.get_cart_summary(self.user), cart.EMPTY_SUMMARY)
+
+    def test_cart_header_uses_denormalized_counts(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            cart.add_to_cart(self.customer, self.laptop, quantity=3)
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('electronics-cart'))
+        self.assertEqual(response.context['total_items'], 3)
+        self.assertEqual(response.context['cart_summary'].units, 3)
+
+
+class InventoryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('shopper', password='pass12345')
+        self.customer = Customer.objects.create(user=self.user)
+        self.laptop, self.tablet = make_products(2, price=Decimal('100.00'), stock=3)
+
+    def test_checkout_takes_stock_all_or_nothing(self):
+        cart.add_to_cart(self.customer, self.laptop, quantity=2)
+        cart.add_to_cart(self.customer, self.tablet, quantity=4)
+        with self.assertRaisesMessage(inventory.OutOfStock, "Laptop 1"):
+            cart.checkout(self.customer)
+        self.laptop.refresh_from_db()
+        self.assertEqual(self.laptop.stock, 3)
+        self.assertTrue(Order.objects.filter(customer=self.customer, status='cart').exists())
+
+        cart.subtract_from_cart(self.customer, self.tablet)
+        order = cart.checkout(self.customer)
+        self.assertEqual(order.status, 'pending')
+        self.assertEqual(
+            dict(Product.objects.values_list('id', 'stock')), {self.laptop.id: 1, self.tablet.id: 0},
+        )
+
+    def test_deleting_unshipped_order_releases_stock(self):
+        cart.add_to_cart(self.customer, self.laptop, quantity=2)
+        order = cart.checkout(self.customer)
+        Order.objects.get(pk=order.pk).delete()
+        self.laptop.refresh_from_db()
+        self.assertEqual(self.laptop.stock, 3)
+
+    def test_untracked_stock_never_sells_out(self):
+        Product.objects.filter(pk=self.laptop.pk).update(stock=None)
+        cart.add_to_cart(self.customer, self.laptop, quantity=50)
+        order = cart.checkout(self.customer)
+        self.assertTrue(Order.objects.get(pk=order.pk).stock_reserved)
+        self.laptop.refresh_from_db()
+        self.assertIsNone(self.laptop.stock)
+        inventory.overlay_stock([self.laptop], {self.laptop.id: None})
+        self.assertEqual((self.laptop.in_stock, self.laptop.stock_left), (True, None))
+
+    def test_orders_that_never_reserved_release_nothing(self):
+        order = Order.objects.create(customer=self.customer, status='pending')
+        OrderProduct.objects.create(order=order, product=self.laptop, quantity=2, price=self.laptop.price)
+        order.delete()
+        self.laptop.refresh_from_db()
+        self.assertEqual(self.laptop.stock, 3)
+
+    def test_cancelling_releases_stock_once(self):
+        cart.add_to_cart(self.customer, self.laptop, quantity=2)
+        order = cart.checkout(self.customer)
+        stale = Order.objects.get(pk=order.pk)
+        order.status = 'cancelled'
+        order.save()
+        report = reports.sales_report(timezone.localdate(), timezone.localdate())
+        self.assertEqual((report['basket']['orders'], report['top_sellers']), (0, []))
+
+        stale.status = 'cancelled'
+        inventory.order_saving(stale)  # a second cancellation finds the stock already given back
+        order.delete()
+        self.laptop.refresh_from_db()
+        self.assertEqual(self.laptop.stock, 3)
+
+    def test_zero_stock_stays_counted_until_untracked(self):
+        Product.objects.filter(pk=self.laptop.pk).update(stock=0, sku='LAP-1')
+        Product.objects.filter(pk=self.tablet.pk).update(stock=0)
+        call_command('untrack_stock', sku=['LAP-1'], stdout=io.StringIO())
+        self.assertEqual(
+            dict(Product.objects.values_list('id', 'stock')), {self.laptop.id: None, self.tablet.id: 0},
+        )
+
+    def test_cards_follow_stock_after_checkout(self):
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(reverse('laptops-list'))
+        self.assertContains(response, "Only 3 left", count=2)
+
+        cart.add_to_cart(self.customer, self.tablet, quantity=3)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(reverse('checkout'))
+        self.assertRedirects(response, reverse('order_success'), fetch_redirect_response=False)
+        response = client.get(reverse('laptops-list'))
+        self.assertContains(response, "Out of stock")
+        self.assertContains(response, "Sold out")
+
+    def test_short_checkout_goes_back_to_cart(self):
+        client = Client()
+        client.force_login(self.user)
+        cart.add_to_cart(self.customer, self.laptop, quantity=5)
+        response = client.post(reverse('checkout'))
+        self.assertRedirects(response, reverse('electronics-cart'), fetch_redirect_response=False)
+        self.assertFalse(Order.objects.exclude(status='cart').exists())
+
+
+class CartExpiryTests(TestCase):
+    def setUp(self):
+        self.products = make_products(2, price=Decimal('100.00'))
+        self.old = timezone.now() - timedelta(days=40)
+
+    def cart_for(self, name, idle_since=None):
+        customer = Customer.objects.create(user=User.objects.create_user(name))
+        for product in self.products:
+            order = cart.add_to_cart(customer, product)
+        if idle_since:
+            Order.objects.filter(pk=order.pk).update(updated_date=idle_since)
+        return order
+
+    def test_cart_changes_move_updated_date(self):
+        order = self.cart_for('shopper', idle_since=self.old)
+        cart.add_to_cart(order.customer, self.products[0])
+        order.refresh_from_db()
+        self.assertGreater(order.updated_date, self.old)
+
+    def test_expires_idle_carts_in_batches(self):
+        idle = [self.cart_for(f'idle-{i}', idle_since=self.old) for i in range(5)]
+        fresh = self.cart_for('fresh')
+        placed = self.cart_for('placed', idle_since=self.old)
+        placed.status = 'pending'
+        placed.save()
+        Order.objects.filter(pk=placed.pk).update(updated_date=self.old)
+
+        archive = io.StringIO()
+        batches = []
+        with self.captureOnCommitCallbacks(execute=True):
+            result = cart.expire_carts(timedelta(days=30), batch_size=2, archive=archive,
+                                       progress=lambda result: batches.append(result.carts))
+        self.assertEqual((result.carts, result.lines), (5, 10))
+        self.assertEqual(batches, [2, 4, 5])
+        self.assertEqual(set(Order.objects.values_list('id', flat=True)), {fresh.id, placed.id})
+        self.assertEqual(OrderProduct.objects.count(), 4)
+
+        archived = [json.loads(line) for line in archive.getvalue().splitlines()]
+        self.assertEqual([row['id'] for row in archived], [order.id for order in idle])
+        self.assertEqual(len(archived[0]['lines']), 2)
+
+        # the rollups match a rebuild from what is left
+        kept = list(DailySales.objects.values_list('day', 'status', 'orders').filter(orders__gt=0).order_by('day', 'status'))
+        reports.backfill()
+        self.assertEqual(kept, list(DailySales.objects.values_list('day', 'status', 'orders').order_by('day', 'status')))
+        self.assertEqual(cart.expire_carts(timedelta(days=30)).carts, 0)
+
+
+    def test_expiry_queries_do_not_grow_with_the_batch(self):
+        def expire(count):
+            for i in range(count):
+                self.cart_for(f'idle-{count}-{i}', idle_since=self.old)
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(cart.expire_carts(timedelta(days=30), batch_size=10).carts, count)
+            return len(queries)
+
+        self.assertEqual(expire(2), expire(6))
+
+
+class ConcurrencyTests(TransactionTestCase):
+    workers = 8
+    clicks = 25
+
+    def test_concurrent_adds_lose_no_increments(self):
+        user = User.objects.create_user('shopper', password='pass12345')
+        customer = Customer.objects.create(user=user)
+        product = make_products(1, price=Decimal('10.00'))[0]
+        cart.add_to_cart(customer, product)
+
+        def click(_):
+            try:
+                cart.add_to_cart(customer, product)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(self.workers) as pool:
+            list(pool.map(click, range(self.workers * self.clicks)))
+
+        line = OrderProduct.objects.get(order__customer=customer, product=product)
+        expected = 1 + self.workers * self.clicks
+        self.assertEqual(line.quantity, expected)
+        self.assertEqual(line.order.total_price, product.price * expected)
+        self.assertEqual(line.order.unit_count, expected)
+
+    def test_concurrent_like_toggles_keep_exact_count(self):
+        owner = Customer.objects.create(user=User.objects.create_user('owner'))
+        review = Review.objects.create(customer=owner, title="Great", content="Great", rating=5)
+        fans = [Customer.objects.create(user=User.objects.create_user(f'fan-{i}')) for i in range(40)]
+        # three toggles per fan, a fourth for the first ten
+        clicks = [fan for fan in fans for _ in range(3)] + fans[:10]
+
+        def click(fan):
+            try:
+                likes.toggle_like(review.id, fan)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(self.workers) as pool:
+            list(pool.map(click, clicks))
+
+        review.refresh_from_db()
+        self.assertEqual(review.likes, ReviewLike.objects.filter(review=review).count())
+
+    def test_concurrent_checkouts_never_oversell(self):
+        race = benchmark.checkout_race(shoppers=30, stock=10, workers=self.workers)
+        self.assertEqual(race.placed, 10)
+        self.assertTrue(race.consistent)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.zephyrus = Product.objects.create(
+            name="Asus ROG Zephyrus G14", image='products/test-laptop.png', price=1,
+            details="Compact gaming laptop with an OLED display",
+        )
+        self.swift = Product.objects.create(
+            name="Acer Swift Go", image='products/test-laptop.png', price=1,
+            details="Thin and light, pairs well with an Asus ROG monitor",
+        )
+
+    def test_results_are_ranked_by_name_weight(self):
+        products, has_next = search.search_products("asus rog")
+        self.assertEqual([p.id for p in products], [self.zephyrus.id, self.swift.id])
+        self.assertFalse(has_next)
+
+    def test_index_follows_saves_and_deletes(self):
+        self.swift.name = "Acer Swift OLED Edition"
+        self.swift.save()
+        self.assertIn(self.swift, search.search_products("edition")[0])
+
+        self.zephyrus.delete()
+        self.assertEqual(search.search_products("zephyrus")[0], [])
+
+    def test_prefix_match_and_operator_input(self):
+        self.assertEqual(search.search_products("zeph")[0], [self.zephyrus])
+        self.assertEqual(search.search_products('"rog* -(:')[0], [self.zephyrus, self.swift])
+        self.assertEqual(search.search_products("   "), ([], False))
+
+    def test_pages_and_inactive_products(self):
+        self.swift.is_active = False
+        self.swift.save()
+        products, has_next = search.search_products("asus", per_page=1)
+        self.assertEqual(products, [self.zephyrus])
+        self.assertFalse(has_next)
+
+    def test_search_view(self):
+        user = User.objects.create_user('shopper', password='pass12345')
+        self.client.force_login(user)
+        response = self.client.get(reverse('product-search'), {'q': 'swift'})
+        self.assertEqual(list(response.context['products']), [self.swift])
+        self.assertContains(response, 'Acer Swift Go')
+
+
+class RecommendationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.products = make_products(6, price=Decimal('100.00'))
+        customer = Customer.objects.create(user=User.objects.create_user('shopper'))
+        laptop, mouse, bag = self.products[:3]
+        for basket in ([laptop, mouse], [laptop, mouse, bag], [laptop, bag], [laptop, mouse]):
+            order = Order.objects.create(customer=customer, status='completed')
+            for product in basket:
+                OrderProduct.objects.create(order=order, product=product, price=product.price)
+        # carts are not purchases
+        order = Order.objects.create(customer=customer, status='cart')
+        OrderProduct.objects.create(order=order, product=laptop, price=laptop.price)
+        OrderProduct.objects.create(order=order, product=self.products[5], price=laptop.price)
+
+    def test_co_purchases_rank_before_price_neighbours(self):
+        recommendations.build_related(k=3)
+        laptop, mouse, bag = self.products[:3]
+        links = list(RelatedProduct.objects.filter(product=laptop).order_by('-score'))
+        self.assertEqual([(l.related_id, l.source) for l in links[:2]], [(mouse.id, 'copurchase'), (bag.id, 'copurchase')])
+        self.assertEqual(links[0].score, 3)
+        self.assertEqual(links[2].source, 'price')
+        self.assertEqual(links[2].related_id, self.products[3].id)
+
+    def test_detail_lookup_is_one_query(self):
+        recommendations.build_related()
+        with self.assertNumQueries(1):
+            related = recommendations.related_products(self.products[0])
+        self.assertEqual(len(related), 4)
+        self.assertNotIn(self.products[0], related)
+
+    def test_cold_product_gets_random_fallback(self):
+        related = recommendations.related_products(self.products[4])
+        self.assertEqual(len(related), 4)
+        self.assertNotIn(self.products[4], related)
+        self.assertEqual(len(set(related)), 4)
+
+
+class CustomerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_signup_creates_the_customer(self):
+        response = self.client.post(reverse('account_signup'), {
+            'username': 'newcomer', 'email': 'newcomer@example.com',
+            'password1': 'a-long-passphrase-42', 'password2': 'a-long-passphrase-42',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(Customer.objects.filter(user__username='newcomer').exists())
+
+    def test_customer_is_resolved_once_and_cached(self):
+        user = User.objects.create_user('shopper')
+        Customer.objects.create(user=user)
+        with self.assertNumQueries(1):
+            first = customers.get_customer(user)
+            self.assertEqual(customers.get_customer(user).pk, first.pk)
+        self.assertIs(first.user, user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.phone = '555-0100'
+            first.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(customers.get_customer(user).phone, '555-0100')
+
+    def test_cart_views_never_write_the_customer(self):
+        user = User.objects.create_user('shopper')
+        Customer.objects.create(user=user)
+        self.client.force_login(user)
+        product = make_products(1)[0]
+        with CaptureQueriesContext(connection) as captured:
+            self.client.post(reverse('update_cart', args=[product.pk, 'add']))
+            self.client.get(reverse('electronics-cart'))
+        touched = [q['sql'] for q in captured if 'electronix_customer' in q['sql'].split(' WHERE')[0]]
+        self.assertEqual(len(touched), 1)  # one cached lookup serves both requests
+        self.assertTrue(touched[0].startswith('SELECT'))
+
+
+class ReviewLikeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.customers = [
+            Customer.objects.create(user=User.objects.create_user(f'fan-{i}')) for i in range(3)
+        ]
+        self.review = Review.objects.create(customer=self.customers[0], title="Great", content="Great", rating=5)
+
+    def likes(self):
+        self.review.refresh_from_db()
+        return self.review.likes
+
+    def test_toggle_moves_counter_by_one(self):
+        self.assertTrue(likes.toggle_like(self.review.id, self.customers[1]))
+        self.assertTrue(likes.toggle_like(self.review.id, self.customers[2]))
+        self.assertEqual(self.likes(), 2)
+        self.assertFalse(likes.toggle_like(self.review.id, self.customers[1]))
+        self.assertEqual(self.likes(), 1)
+
+    @override_settings(REVIEW_LIKES_WRITE_BEHIND=True)
+    @mock.patch('electronix.likes.SHARED_CACHES', ('LocMemCache',))  # atomic within this one process
+    def test_write_behind_buffers_until_flush(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for customer in self.customers:
+                likes.toggle_like(self.review.id, customer)
+        with self.captureOnCommitCallbacks(execute=True):
+            likes.toggle_like(self.review.id, self.customers[0])
+        self.assertEqual(self.likes(), 0)
+        self.assertEqual(likes.pending_likes(self.review.id), 2)
+
+        self.assertEqual(likes.flush_buffered_likes(), 1)
+        self.assertEqual(self.likes(), 2)
+        self.assertEqual(likes.pending_likes(self.review.id), 0)
+        self.assertEqual(likes.flush_buffered_likes(), 0)
+
+    def test_write_behind_needs_a_shared_atomic_cache(self):
+        file_cache = {'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': tempfile.gettempdir(),
+        }}
+        redis_cache = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache'}}
+        with override_settings(REVIEW_LIKES_WRITE_BEHIND=True):
+            self.assertEqual([error.id for error in likes.check_write_behind_cache()], ['electronix.W001'])
+            with override_settings(CACHES=file_cache):
+                self.assertEqual([error.id for error in likes.check_write_behind_cache()], ['electronix.W001'])
+                self.assertFalse(likes.write_behind())
+            with override_settings(CACHES=redis_cache):
+                self.assertEqual(likes.check_write_behind_cache(), [])
+                self.assertTrue(likes.write_behind())
+            # rejected: the like goes straight to the row
+            with self.captureOnCommitCallbacks(execute=True):
+                likes.toggle_like(self.review.id, self.customers[1])
+            self.assertEqual(self.likes(), 1)
+        self.assertEqual(likes.check_write_behind_cache(), [])
+
+    def test_recount_repairs_counter(self):
+        ReviewLike.objects.create(review=self.review, customer=self.customers[1])
+        Review.objects.filter(pk=self.review.pk).update(likes=7)
+        self.assertEqual(likes.recount_likes(), 1)
+        self.assertEqual(self.likes(), 1)
+
+
+class StoreStatTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.customer = Customer.objects.create(user=User.objects.create_user('shopper'))
+
+    def counter(self, name):
+        return StoreStat.objects.get(name=name).value
+
+    def test_counters_follow_model_writes(self):
+        product = make_products(1)[0]
+        self.assertEqual(self.counter('active_products'), 1)
+        product.is_active = False
+        product.save()
+        self.assertEqual(self.counter('active_products'), 0)
+
+        order = Order.objects.create(customer=self.customer, status='cart')
+        order.status = 'processing'
+        order.save()
+        order.status = 'shipped'
+        order.save()
+        self.assertEqual(self.counter('placed_orders'), 1)
+
+        review = Review.objects.create(customer=self.customer, title="Great", content="Great", rating=5)
+        self.assertEqual(self.counter('approved_reviews'), 1)
+        Review.objects.get(pk=review.pk).delete()
+        Order.objects.filter(pk=order.pk).delete()
+        self.assertEqual(self.counter('approved_reviews'), 0)
+        self.assertEqual(self.counter('placed_orders'), 0)
+
+    def test_counters_read_the_stored_row_on_save(self):
+        product = make_products(1)[0]
+        stale = Product.objects.get(pk=product.pk)
+        self.assertNotIn('_counted', vars(stale))  # loading a row costs nothing
+        product.is_active = False
+        product.save()
+        stale.is_active = False
+        stale.save()  # already inactive in the table, not counted out twice
+        with self.assertNumQueries(1):
+            stale.save(update_fields=['price'])  # the counted field is not written, no lookup
+        self.assertEqual(self.counter('active_products'), 0)
+
+    def test_reconcile_repairs_drift(self):
+        make_products(3)
+        Product.objects.filter(pk__in=Product.objects.values('pk')[:2]).update(is_active=False)
+        self.assertEqual(stats.reconcile(repair=False), {'active_products': (3, 1)})
+        stats.reconcile()
+        self.assertEqual(self.counter('active_products'), 1)
+        self.assertEqual(stats.reconcile(), {})
+
+    def test_about_page_skips_big_tables(self):
+        make_products(2)
+        self.client.get(reverse('about-us'))
+        with self.assertNumQueries(0):  # founders come from the fragment cache
+            response = self.client.get(reverse('about-us'))
+        self.assertEqual(response.context['total_products'], 2)
+
+
+class ReviewFeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.customer = Customer.objects.create(user=User.objects.create_user('critic'))
+
+    def make_reviews(self, ratings):
+        created = Review.objects.bulk_create(
+            Review(customer=self.customer, title=f"Review {i}", content="Solid", rating=rating)
+            for i, rating in enumerate(ratings)
+        )
+        # every review shares one timestamp, so only the id breaks ties
+        Review.objects.update(created_date=created[0].created_date)
+        return created
+
+    def test_keyset_pages_walk_the_feed_once(self):
+        self.make_reviews([4] * 25)
+        seen, cursor = [], None
+        while True:
+            with self.assertNumQueries(1):
+                page = reviews.get_review_page(cursor, per_page=10)
+                names = [review.customer.user.username for review in page['reviews']]
+            self.assertEqual(set(names), {'critic'})
+            seen += [review.id for review in page['reviews']]
+            cursor = page['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(seen, sorted(Review.objects.values_list('id', flat=True), reverse=True))
+
+    def test_rating_summary_follows_create_and_approve(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.make_reviews([5, 5, 4])
+            Review.objects.create(customer=self.customer, title="Meh", content="Meh", rating=2)
+            hidden = Review.objects.create(
+                customer=self.customer, title="Bad", content="Bad", rating=1, is_approved=False
+            )
+        stats.reconcile()  # bulk_create skips signals
+        summary = stats.get_rating_summary()
+        self.assertEqual(summary['count'], 4)
+        self.assertEqual(summary['average'], 4.0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            hidden.is_approved = True
+            hidden.save()
+        summary = stats.get_rating_summary()
+        self.assertEqual(summary['count'], 5)
+        self.assertEqual([row['count'] for row in summary['histogram']], [2, 1, 0, 1, 1])
+
+    def test_review_list_uses_cursor_links(self):
+        self.make_reviews([3] * 12)
+        self.client.get(reverse('review_list'))
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('review_list'))
+        self.assertEqual(len(response.context['reviews']), 10)
+        response = self.client.get(reverse('review_list') + response.context['next_url'])
+        self.assertEqual(len(response.context['reviews']), 2)
+        self.assertIsNone(response.context['next_url'])
+
+
+class FragmentCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.product = make_products(1)[0]
+
+    def shopper(self, name, in_cart):
+        user = User.objects.create_user(name)
+        customer = Customer.objects.create(user=user)
+        if in_cart:
+            cart.add_to_cart(customer, self.product, quantity=in_cart)
+        client = Client()
+        client.force_login(user)
+        return client
+
+    def test_product_cards_are_shared_but_cart_controls_are_not(self):
+        first, second = self.shopper('first', 0), self.shopper('second', 3)
+        self.assertContains(first.get(reverse('laptops-list')), "Add to cart")
+
+        # a write that skips signals leaves the cached card in place
+        Product.objects.filter(pk=self.product.pk).update(name="Renamed laptop")
+        response = second.get(reverse('laptops-list'))
+        self.assertContains(response, "Laptop 0")
+        self.assertContains(response, '<span class="quantity">3</span>', html=True)
+        self.assertNotContains(response, "Add to cart")
+
+        self.product.refresh_from_db()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+        self.assertContains(second.get(reverse('laptops-list')), "Renamed laptop")
+
+    def test_founder_grid_follows_founder_changes(self):
+        founder = FounderInfo.objects.create(name="Ada", position="CEO", bio="Builds laptops", image='')
+        self.assertContains(self.client.get(reverse('about-us')), "Ada")
+        founder.name = "Grace"
+        with self.captureOnCommitCallbacks(execute=True):
+            founder.save()
+        self.assertContains(self.client.get(reverse('about-us')), "Grace")
+
+    def test_evicted_generation_never_comes_back(self):
+        self.assertContains(self.client.get(reverse('about-us')), "founder")
+        FounderInfo.objects.create(name="Ada", position="CEO", bio="Builds laptops", image='')
+        # the generation is evicted before the bump gets to run
+        cache.delete(fragments.GENERATION_KEYS['founders'])
+        self.assertContains(self.client.get(reverse('about-us')), "Ada")
+
+    def test_static_pages_revalidate(self):
+        response = self.client.get(reverse('terms'))
+        self.assertEqual(response.status_code, 200)
+        etag, modified = response['ETag'], response['Last-Modified']
+        self.assertEqual(self.client.get(reverse('terms'), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(reverse('terms'), HTTP_IF_MODIFIED_SINCE=modified).status_code, 304)
+        self.assertNotEqual(self.client.get(reverse('privacy'))['ETag'], etag)
+
+    def test_static_pages_follow_a_new_manifest(self):
+        for digest in ('0123456789ab', 'ba9876543210'):  # two deploys, the cache outlives the first
+            manifest = {'electronics/account.bundle.css': f'electronics/account.bundle.{digest}.css'}
+            with mock.patch.object(staticfiles_storage, 'hashed_files', manifest), \
+                    mock.patch.object(staticfiles_storage, 'manifest_hash', digest):
+                self.assertContains(self.client.get(reverse('terms')), f'account.bundle.{digest}.css')
+
+
+class ImageVariantTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        overrider = override_settings(MEDIA_ROOT=media_root)
+        overrider.enable()
+        self.addCleanup(overrider.disable)
+
+    def upload(self, size=(1200, 800), mode='RGBA'):
+        buffer = io.BytesIO()
+        Image.new(mode, size, (200, 30, 30, 128) if mode == 'RGBA' else (200, 30, 30)).save(buffer, 'PNG')
+        return SimpleUploadedFile('laptop.png', buffer.getvalue(), content_type='image/png')
+
+    def test_save_builds_hashed_derivatives(self):
+        product = Product.objects.create(name="Laptop", image=self.upload(), price=Decimal('10.00'))
+        product.refresh_from_db()
+        variants = product.image_variants
+        self.assertEqual(variants['source'], product.image.name)
+        self.assertEqual(sorted(variants['webp'], key=int), ['320', '640', '960'])
+        name = variants['jpeg']['320']
+        self.assertRegex(name, r'^products/laptop\.[0-9a-f]{12}\.320w\.jpeg$')
+        with product.image.storage.open(name) as fh:
+            self.assertEqual(Image.open(fh).size, (320, 213))
+
+    def test_small_image_keeps_its_width(self):
+        product = Product.objects.create(name="Laptop", image=self.upload((200, 100), 'RGB'), price=1)
+        product.refresh_from_db()
+        self.assertEqual(list(product.image_variants['webp']), ['200'])
+
+    def test_picture_tag(self):
+        product = Product.objects.create(name="Laptop", image=self.upload(), price=1)
+        product.refresh_from_db()
+        html = Template("{% load responsive_images %}{% picture product alt=name %}").render(
+            Context({'product': product, 'name': 'A & B'})
+        )
+        self.assertIn('<source type="image/webp" srcset="/media/products/laptop.', html)
+        self.assertIn(' 960w"', html)
+        self.assertIn('alt="A &amp; B"', html)
+
+        product.image_variants = {}
+        html = Template("{% load responsive_images %}{% picture product %}").render(Context({'product': product}))
+        self.assertIn(f'<img src="{product.image.url}"', html)
+
+
+class CatalogImportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.workdir)
+        overrider = override_settings(MEDIA_ROOT=os.path.join(self.workdir, 'media'))
+        overrider.enable()
+        self.addCleanup(overrider.disable)
+
+    def write(self, name, text):
+        path = os.path.join(self.workdir, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return path
+
+    def run_command(self, *args):
+        out, err = io.StringIO(), io.StringIO()
+        call_command(*args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_csv_import_then_jsonl_upsert(self):
+        os.mkdir(os.path.join(self.workdir, 'images'))
+        Image.new('RGB', (40, 30)).save(os.path.join(self.workdir, 'images', 'zen.png'))
+        path = self.write('catalog.csv', (
+            "sku,name,price,stock,is_active,details,image\n"
+            "ZB-14,Zenbook 14,1099.00,5,true,OLED ultrabook,zen.png\n"
+            "TP-X1,ThinkPad X1,1499.00,2,false,,zen.png\n"
+            "BAD-1,Broken,not-a-price,1,true,,zen.png\n"
+            "NO-IMG,Missing image,10.00,1,true,,\n"
+        ))
+        out, err = self.run_command('catalog_import', path, '--images', os.path.join(self.workdir, 'images'))
+        self.assertIn("2 created, 0 updated, 0 unchanged, 2 invalid", out)
+        self.assertIn("Line 4: price:", err)
+        self.assertIn("Line 5: new product needs image", err)
+
+        zenbook = Product.objects.get(sku='ZB-14')
+        self.assertRegex(zenbook.image.name, r'^products/zen\.[0-9a-f]{12}\.png$')
+        self.assertFalse(Product.objects.get(sku='TP-X1').is_active)
+        self.assertEqual(stats.get_storefront_stats()['active_products'], 1)
+        # bulk inserts still reach the search index
+        self.assertEqual([p.sku for p in search.search_products('zenbook')[0]], ['ZB-14'])
+
+        path = self.write('update.jsonl', (
+            '{"sku": "ZB-14", "price": "999.00"}\n'
+            '{"sku": "TP-X1", "is_active": true, "stock": 7}\n'
+            'not json\n'
+        ))
+        out, err = self.run_command('catalog_import', path, '--batch-size', '1')
+        self.assertIn("0 created, 2 updated, 0 unchanged, 1 invalid", out)
+        zenbook.refresh_from_db()
+        self.assertEqual((zenbook.price, zenbook.stock, zenbook.name), (Decimal('999.00'), 5, "Zenbook 14"))
+        self.assertEqual(Product.objects.get(sku='TP-X1').stock, 7)
+        self.assertEqual(stats.get_storefront_stats()['active_products'], 2)
+
+    def test_name_key_updates_products_without_sku(self):
+        product, = make_products(1)
+        self.assertEqual(inventory.stock_levels([product.id]), {product.id: 10})
+        path = self.write('rename.jsonl', f'{{"name": "{product.name}", "sku": "LT-0", "stock": 3}}\n')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.run_command('catalog_import', path, '--key', 'name')
+        product.refresh_from_db()
+        self.assertEqual((product.sku, product.stock), ('LT-0', 3))
+        self.assertEqual(inventory.stock_levels([product.id]), {product.id: 3})
+        self.assertEqual(Product.objects.count(), 1)
+
+    def test_duplicate_sku_is_reported_not_fatal(self):
+        laptop, other = make_products(2)
+        Product.objects.filter(pk=laptop.pk).update(sku='LT-0')
+        path = self.write('clash.jsonl', (
+            f'{{"name": "{other.name}", "sku": "LT-0"}}\n'
+            '{"name": "Fresh", "sku": "LT-0", "price": "10.00", "image": "products/x.png"}\n'
+            '{"name": "Tablet", "sku": "TB-1", "price": "10.00", "image": "products/x.png"}\n'
+            f'{{"name": "{laptop.name}", "stock": 4}}\n'
+        ))
+        out, err = self.run_command('catalog_import', path, '--key', 'name')
+        self.assertIn("1 created, 1 updated, 0 unchanged, 2 invalid", out)
+        self.assertIn("Line 1: conflicts with another product", err)
+        self.assertIn("Line 2: conflicts with another product", err)
+        self.assertEqual(Product.objects.get(sku='LT-0').stock, 4)
+        self.assertTrue(Product.objects.filter(sku='TB-1').exists())
+
+    def test_export_round_trips(self):
+        make_products(3)
+        out, err = self.run_command('catalog_export', '--chunk-size', '2')
+        self.assertIn("Exported 3 products", err)
+        path = self.write('export.csv', out)
+        out, _ = self.run_command('catalog_import', path, '--key', 'name')
+        self.assertIn("0 created, 0 updated, 3 unchanged, 0 invalid", out)
+
+        buffer = io.StringIO()
+        self.assertEqual(catalog_io.export_catalog(buffer, 'jsonl'), 3)
+        first = json.loads(buffer.getvalue().splitlines()[0])
+        self.assertEqual(first['price'], '999.00')
+
+
+class ReportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('shopper', password='pass12345')
+        self.customer = Customer.objects.create(user=self.user)
+        self.client.force_login(self.user)
+        self.products = make_products(3)
+        self.today = timezone.localdate()
+
+    def rollups(self):
+        sales = {
+            (row.day, row.status): (row.orders, row.units, row.revenue)
+            for row in DailySales.objects.exclude(orders=0)
+        }
+        products = {
+            (row.day, row.product_id): (row.orders, row.units, row.revenue)
+            for row in DailyProductSales.objects.exclude(orders=0)
+        }
+        return sales, products
+
+    def place_order(self, *quantities):
+        for product, quantity in zip(self.products, quantities):
+            if quantity:
+                cart.add_to_cart(self.customer, product, quantity)
+        self.client.post(reverse('checkout'))
+        return Order.objects.filter(customer=self.customer).latest('id')
+
+    def test_rollups_follow_the_order_lifecycle(self):
+        cart.add_to_cart(self.customer, self.products[0], 2)
+        self.assertEqual(self.rollups()[0], {(self.today, 'cart'): (1, 0, 0)})
+
+        self.client.post(reverse('checkout'))
+        order = Order.objects.get(customer=self.customer)
+        self.assertIsNotNone(order.placed_date)
+        sales, products = self.rollups()
+        self.assertEqual(sales, {(self.today, 'pending'): (1, 2, Decimal('1998.00'))})
+        self.assertEqual(products, {(self.today, self.products[0].id): (1, 2, Decimal('1998.00'))})
+
+        order.status = 'completed'
+        order.save()
+        sales, products = self.rollups()
+        self.assertEqual(sales, {(self.today, 'completed'): (1, 2, Decimal('1998.00'))})
+        self.assertEqual(len(products), 1)
+
+        order.delete()
+        self.assertEqual(self.rollups(), ({}, {}))
+
+    def test_save_reads_the_stored_row_once(self):
+        order = self.place_order(1)
+        order.status = 'completed'
+        with CaptureQueriesContext(connection) as queries:
+            order.save()
+        reads = [q['sql'] for q in queries if q['sql'].startswith('SELECT') and 'FROM "electronix_order" ' in q['sql']]
+        self.assertEqual(len(reads), 1)
+        self.assertEqual(self.rollups()[0], {(self.today, 'completed'): (1, 1, Decimal('999.00'))})
+        self.assertEqual(stats.get_storefront_stats()['placed_orders'], 1)
+
+    def test_stale_instance_moves_the_stored_row(self):
+        order = self.place_order(1)
+        stale = Order.objects.get(pk=order.pk)
+        order.status = 'completed'
+        order.save()
+        stale.status = 'cancelled'
+        stale.save()
+        self.assertEqual(self.rollups(), ({(self.today, 'cancelled'): (1, 1, Decimal('999.00'))}, {}))
+
+    def test_backfill_matches_incremental_rollups(self):
+        first = self.place_order(1, 2)
+        first.status = 'completed'
+        first.save()
+        self.place_order(0, 1, 3)
+        cart.add_to_cart(self.customer, self.products[2])
+        incremental = self.rollups()
+
+        DailySales.objects.all().delete()
+        DailyProductSales.objects.all().delete()
+        self.assertEqual(reports.backfill(chunk_days=1), 3)
+        self.assertEqual(self.rollups(), incremental)
+
+    def test_expired_carts_stay_started(self):
+        self.place_order(1)
+        idle = cart.add_to_cart(Customer.objects.create(user=User.objects.create_user('idle')), self.products[0])
+        Order.objects.filter(pk=idle.pk).update(updated_date=timezone.now() - timedelta(days=40))
+
+        def stages():
+            funnel = reports.status_funnel(self.today, self.today)
+            return [(stage['orders'], stage['percent']) for stage in funnel['stages']]
+
+        self.assertEqual(stages(), [(2, 100), (1, 50), (0, 0)])
+        self.assertEqual(cart.expire_carts(timedelta(days=30)).carts, 1)
+        self.assertEqual(stages(), [(2, 100), (1, 50), (0, 0)])
+        reports.backfill()
+        self.assertEqual(stages(), [(2, 100), (1, 50), (0, 0)])
+
+    def test_report_reads_only_the_rollups(self):
+        self.place_order(1, 2).delete()
+        order = self.place_order(2, 1)
+        order.status = 'completed'
+        order.save()
+        cart.add_to_cart(self.customer, self.products[2])
+
+        report = reports.sales_report(self.today - timedelta(days=6), self.today)
+        self.assertEqual(report['top_sellers'][0]['name'], self.products[0].name)
+        self.assertEqual(report['basket']['orders'], 1)
+        self.assertEqual(report['basket']['average_units'], 3)
+        self.assertEqual(
+            [(stage['status'], stage['orders']) for stage in report['funnel']['stages']],
+            [('cart', 3), ('pending', 1), ('completed', 1)],  # the deleted order was started too
+        )
+
+        self.assertEqual(self.client.get(reverse('sales_report')).status_code, 302)
+        self.user.is_staff = True
+        self.user.save()
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(reverse('sales_report'), {'start': 'bogus'})
+        self.assertContains(response, self.products[0].name)
+        self.assertFalse([q for q in captured if 'electronix_order' in q['sql']])
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.registry.reset()
+        self.user = User.objects.create_user('shopper', password='pass12345')
+        make_products(3)
+
+    def test_middleware_records_per_view_histograms(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('laptops-list'))
+        snapshot = metrics.registry.snapshot()
+
+        buckets, queries, count = snapshot[('db_queries', 'laptops-list')]
+        self.assertEqual(count, 1)
+        self.assertGreater(queries, 0)
+        self.assertGreater(snapshot[('template_duration_seconds', 'laptops-list')][1], 0)
+        self.assertGreater(snapshot[('response_size_bytes', 'laptops-list')][1], 0)
+
+    def test_export_formats(self):
+        self.client.get(reverse('about-us'))
+        self.client.force_login(User.objects.create_user('ops', is_staff=True))
+        text = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('# TYPE electronix_request_duration_seconds histogram', text)
+        self.assertIn('electronix_db_queries_count{view="about-us"} 1', text)
+
+        data = self.client.get(reverse('metrics'), {'format': 'json'}).json()
+        self.assertEqual(data['about-us']['request_duration_seconds']['count'], 1)
+
+    def test_export_is_not_public(self):
+        # behind a local reverse proxy every request comes from loopback
+        self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='127.0.0.1').status_code, 404)
+        self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer ').status_code, 404)
+
+    @override_settings(METRICS_TOKEN='s3cret')
+    def test_export_to_scraper_with_token(self):
+        self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer s3cret').status_code, 200)
+        self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer guess').status_code, 404)
+
+
+class AsyncViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seed = benchmark.seed_shop(products=40, customers=10, reviews=30, orders=10, cart_lines=3)
+
+    def setUp(self):
+        cache.clear()
+        metrics.registry.reset()
+
+    def use_async_views(self):
+        switch = loadtest.async_read_views()
+        switch.__enter__()
+        self.addCleanup(switch.__exit__, None, None, None)
+
+    def test_async_views_match_their_sync_twins(self):
+        paths = loadtest.read_paths(self.seed)
+        self.client.force_login(self.seed.shopper)
+        sync_responses = [self.client.get(path) for path in paths]
+
+        self.use_async_views()
+        async_to_sync(self.async_client.aforce_login)(self.seed.shopper)
+        for path, sync_response in zip(paths, sync_responses):
+            with self.subTest(path=path):
+                response = async_to_sync(self.async_client.get)(path)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.resolver_match.func.__module__, async_views.__name__)
+                for key in ('products', 'product', 'reviews', 'review', 'total_products', 'rating_summary', 'has_liked'):
+                    if key in sync_response.context:
+                        self.assertEqual(response.context[key], sync_response.context[key])
+
+    async def test_cart_overlay_and_badge(self):
+        self.use_async_views()
+        await self.async_client.aforce_login(self.seed.shopper)
+        response = await self.async_client.get(reverse('laptops-list'), {'sort': 'oldest'})
+        in_cart = [product for product in response.context['products'] if product.cart_item]
+        self.assertEqual(len(in_cart), 3)
+        self.assertEqual(response.context['cart_summary'].lines, 3)
+
+    def test_no_middleware_is_adapted_under_asgi(self):
+        # an adapted middleware puts every request's whole chain back on a thread;
+        # Django only logs the adaptation with DEBUG on
+        with override_settings(DEBUG=True, MIDDLEWARE=loadtest.asgi_middleware()):
+            with self.assertNoLogs('django.request', level='DEBUG'):
+                ASGIHandler()
+
+    async def test_fragments_are_read_off_the_event_loop(self):
+        self.use_async_views()
+        await self.async_client.aforce_login(self.seed.shopper)
+        on_loop, get = [], LocMemCache.get
+
+        def recording_get(cache, key, *args, **kwargs):
+            try:
+                asyncio.get_running_loop()
+                on_loop.append(key)
+            except RuntimeError:
+                pass
+            return get(cache, key, *args, **kwargs)
+
+        with mock.patch.object(LocMemCache, 'get', recording_get):
+            for name in ('laptops-list', 'review_list', 'about-us'):
+                await self.async_client.get(reverse(name))
+        self.assertEqual(on_loop, [])
+
+    async def test_metrics_count_queries_run_off_the_event_loop(self):
+        self.use_async_views()
+        await self.async_client.get(reverse('about-us'))
+        buckets, queries, count = metrics.registry.snapshot()[('db_queries', 'about-us')]
+        self.assertEqual(count, 1)
+        self.assertGreater(queries, 0)
+
+
+class IndexPlanTests(TestCase):
+    HOT_TABLES = re.compile(r'FROM "electronix_(product|order|orderproduct|review)"')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seed = benchmark.seed_shop(products=60, customers=20, reviews=40, orders=20, cart_lines=5)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.seed.shopper)
+
+    def plan(self, sql, params=None):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # tiny test tables would otherwise always be scanned
+                cursor.execute("SET LOCAL enable_seqscan = off")
+                cursor.execute("EXPLAIN " + sql, params)
+            else:
+                cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+            return "\n".join(str(row[-1]) for row in cursor.fetchall())
+
+    def assertIndexedPlan(self, sql):
+        plan = self.plan(sql)
+        if connection.vendor == 'postgresql':
+            self.assertNotIn("Seq Scan", plan, sql)
+        else:
+            for line in plan.splitlines():
+                if re.match(r'SCAN \w+', line):
+                    self.assertIn(" INDEX ", line, f"{sql}\n{plan}")
+            self.assertNotIn("TEMP B-TREE FOR ORDER BY", plan, sql)
+
+    def test_hot_view_queries_use_indexes(self):
+        product = self.seed.product
+        page = catalog.get_catalog_page('newest')
+        urls = [
+            reverse('laptops-list'),
+            reverse('laptops-list') + '?' + urlencode({'cursor': page['next_cursor']}),
+            reverse('laptops-list') + '?sort=price_high',
+            reverse('electronics-cart'),
+            reverse('review_list'),
+            reverse('review_list') + '?' + urlencode({'cursor': reviews.get_review_page()['next_cursor']}),
+        ]
+        with CaptureQueriesContext(connection) as captured:
+            for url in urls:
+                cache.clear()
+                self.client.get(url)
+            self.client.post(reverse('update_cart', args=[product.pk, 'add']))
+        checked = [q['sql'] for q in captured if q['sql'].startswith('SELECT') and self.HOT_TABLES.search(q['sql'])]
+        self.assertGreater(len(checked), 8)
+        for sql in checked:
+            with self.subTest(sql=sql):
+                self.assertIndexedPlan(sql)
+
+    @skipUnless(connection.vendor == 'postgresql', "the GIN index and EXPLAIN format are PostgreSQL's")
+    def test_postgresql_uses_partial_and_gin_indexes(self):
+        active = Product.objects.filter(is_active=True).values('id')
+        cases = {
+            'product_active_newest_idx': active.order_by('-created_date', '-id')[:20].query.sql_with_params(),
+            'product_active_price_idx': active.order_by('price', 'id')[:20].query.sql_with_params(),
+            'review_approved_newest_idx': (
+                Review.objects.filter(is_approved=True).order_by('-created_date', '-id').values('id')[:20]
+                .query.sql_with_params()
+            ),
+            'electronix_product_search_idx': (search.POSTGRES_SEARCH, ['laptop:*', 20, 0]),
+        }
+        for index, (sql, params) in cases.items():
+            with self.subTest(index=index):
+                self.assertIn(index, self.plan(sql, params))
+
+
+@override_settings(READ_REPLICA='replica')
+class ReplicaRoutingTests(TestCase):
+    # the replica test database is a separate file that is never written by replication
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('shopper', password='pass12345')
+        self.customer = Customer.objects.create(user=self.user)
+        self.laptop = make_products(1)[0]
+        # copy what the replica would have received, without the model signals
+        User.objects.using('replica').bulk_create([self.user])
+        Customer.objects.using('replica').bulk_create([Customer(id=self.customer.id, user_id=self.user.id)])
+        Product.objects.using('replica').bulk_create([
+            Product(id=self.laptop.id, name=self.laptop.name, image=self.laptop.image, price=self.laptop.price, stock=10),
+            Product(name="Replica only", image='products/test-laptop.png', price=Decimal('10.00'), stock=10),
+        ])
+        self.client.force_login(self.user)
+
+    def test_reads_outside_marked_views_use_the_primary(self):
+        self.assertEqual(Product.objects.all().db, 'default')
+        self.assertIsNone(routers.ReplicaRouter().db_for_read(Product))
+
+    def test_catalog_reads_replica_until_a_write_pins_the_primary(self):
+        response = self.client.get(reverse('laptops-list'))
+        # the cached page is filled from the primary, the rest reads the replica
+        self.assertNotContains(response, "Replica only")
+        self.assertNotIn(routers.STICKY_COOKIE, response.cookies)
+
+        response = self.client.post(reverse('cart_api_add', args=[self.laptop.id]))
+        self.assertIn(routers.STICKY_COOKIE, response.cookies)
+        # the cart line only exists on the primary
+        self.assertContains(self.client.get(reverse('laptops-list')), '<span class="quantity">1</span>', html=True)
+
+        del self.client.cookies[routers.STICKY_COOKIE]
+        self.assertNotContains(self.client.get(reverse('laptops-list')), '<span class="quantity">')
+        # pages that are not marked always read the primary
+        self.assertContains(self.client.get(reverse('electronics-cart')), self.laptop.name)
+
+    def test_async_views_read_the_replica(self):
+        cart.add_to_cart(self.customer, self.laptop)
+        switch = loadtest.async_read_views()
+        switch.__enter__()
+        self.addCleanup(switch.__exit__, None, None, None)
+        async_to_sync(self.async_client.aforce_login)(self.user)
+        response = async_to_sync(self.async_client.get)(reverse('laptops-list'))
+        self.assertEqual(response.resolver_match.func.__module__, async_views.__name__)
+        # the cart line only exists on the primary
+        self.assertNotContains(response, '<span class="quantity">')
+
+    def test_shared_caches_are_filled_from_the_primary(self):
+        Product.objects.using('replica').filter(pk=self.laptop.pk).update(stock=0, name="Stale laptop")
+        StoreStat.objects.using('replica').update_or_create(name='active_products', defaults={'value': 99})
+        for name in ('laptops-list', 'about-us'):
+            self.client.get(reverse(name))
+        self.assertEqual(inventory.stock_levels([self.laptop.id]), {self.laptop.id: 10})
+        self.assertNotEqual(stats.get_storefront_stats()['active_products'], 99)
+        self.assertNotContains(self.client.get(reverse('laptops-list')), "Stale laptop")
+
+    @override_settings(READ_REPLICA=None)
+    def test_no_replica_configured(self):
+        self.assertNotContains(self.client.get(reverse('laptops-list')), "Replica only")
+        response = self.client.post(reverse('cart_api_add', args=[self.laptop.id]))
+        self.assertNotIn(routers.STICKY_COOKIE, response.cookies)
+
+
+class AdminChangelistTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        benchmark.seed_shop(products=30, customers=30, reviews=30, orders=30, cart_lines=5)
+        cls.admin = User.objects.create_superuser('boss', 'boss@example.com', 'pw')
+
+    def changelist_queries(self, model, per_page):
+        client = Client()
+        client.force_login(self.admin)
+        url = reverse(f'admin:electronix_{model._meta.model_name}_changelist')
+        with mock.patch.object(admin.site._registry[model], 'list_per_page', per_page):
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['cl'].result_list), per_page)
+        return len(queries)
+
+    def test_changelists_do_not_query_per_row(self):
+        for model in (Customer, Order, OrderProduct, Review, ReviewLike):
+            with self.subTest(model=model.__name__):
+                self.assertEqual(self.changelist_queries(model, 2), self.changelist_queries(model, 20))
+
+
+class LoadTestScenarioTests(TransactionTestCase):
+    def test_weighted_scenarios_report_every_url(self):
+        benchmark.seed_shop(products=30, customers=4, reviews=20, orders=10)
+        catalog = loadtest.Catalog(
+            products=list(Product.objects.values_list('id', flat=True)),
+            reviews=list(Review.objects.values_list('id', flat=True)),
+        )
+        mix = loadtest.scenario_mix(40, seed=3)
+        self.assertEqual(mix, loadtest.scenario_mix(40, seed=3))
+        self.assertEqual(set(mix), set(loadtest.SCENARIOS))
+
+        shoppers = [loadtest.ClientShopper(user) for user in User.objects.filter(username__startswith='bench-')]
+        run = loadtest.run_scenarios(shoppers, catalog, mix)
+
+        self.assertEqual(run.scenarios, Counter(mix))
+        summary = run.summary()
+        self.assertEqual(summary['all']['requests'], sum(row['requests'] for name, row in summary.items() if name != 'all'))
+        self.assertEqual(summary['checkout']['requests'], 2 * run.scenarios['checkout'])
+        self.assertEqual(summary['all']['errors'], 0, loadtest.format_run(summary))
+        self.assertIn("laptops-list", loadtest.format_run(summary, baseline=summary))
+
+
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seed = benchmark.seed_shop(products=80, customers=40, reviews=60, orders=40, cart_lines=15)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_every_named_url_declares_a_budget(self):
+        names = {name for name, _, _ in benchmark.view_cases(self.seed)}
+        self.assertEqual(names - set(benchmark.QUERY_BUDGETS), set())
+
+    def test_views_stay_within_query_budget(self):
+        client = Client(raise_request_exception=False)
+        client.force_login(self.seed.shopper)
+        results = benchmark.measure_views(client, self.seed, repeat=1)
+        over = [row for row in results if row.over_budget or row.failed]
+        self.assertFalse(over, "\n" + benchmark.format_table(over))
+
+    def test_product_page_budget_covers_the_wrapped_fallback(self):
+        client = Client()
+        client.force_login(self.seed.shopper)
+        path = reverse('product-detail', args=[self.seed.product.pk])
+        client.get(path)
+        cache.delete(recommendations.ID_RANGE_KEY)
+        # the random start lands past the last id, so the pick scans again from the bottom
+        with mock.patch('random.randint', side_effect=lambda low, high: high + 1):
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(client.get(path).status_code, 200)
+        self.assertLessEqual(len(queries), benchmark.QUERY_BUDGETS['product-detail'])
+
+    def test_cached_sessions_skip_the_session_table(self):
+        results = benchmark.measure_sessions(self.seed, repeat=2)
+        self.assertEqual({row.name for row in results if row.engine == 'db' and row.session_queries}, {
+            'laptops-list', 'electronics-cart', 'update_cart',
+        })
+        self.assertFalse([row for row in results if row.engine == 'cached_db' and row.session_queries])
+
+    def test_flash_messages_live_in_a_cookie(self):
+        client = Client()
+        client.force_login(self.seed.shopper)
+        response = client.post(reverse('update_cart', args=[self.seed.cart_line.product_id, 'add']))
+        self.assertIn('messages', response.cookies)
+        self.assertContains(client.get(reverse('laptops-list')), "Added")
+
+
+class AssetPipelineTests(TestCase):
+    def render_bundle(self, name):
+        return Template("{% load assets %}{% css_bundle name %}").render(Context({'name': name}))
+
+    def test_minify_keeps_strings_and_urls(self):
+        css = "/* header */\na > b ,\n c {\n  content: 'x  ;  y';\n  background: url( a b.png );\n}\n"
+        self.assertEqual(assets.minify_css(css), "a>b,c{content: 'x  ;  y';background: url( a b.png )}")
+
+    def test_sources_are_linked_until_collectstatic(self):
+        html = self.render_bundle('storefront')
+        self.assertEqual(html.count('<link'), 2)
+        self.assertIn('/static/electronics/sixth.css', html)
+
+    def test_bundle_missing_from_manifest_raises(self):
+        with mock.patch.object(staticfiles_storage, 'hashed_files', {'electronics/sixth.css': 'electronics/sixth.0123456789ab.css'}):
+            with self.assertRaisesMessage(ValueError, 'storefront.bundle.css'):
+                self.render_bundle('storefront')
+
+    def test_collectstatic_builds_hashed_compressed_bundle(self):
+        static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, static_root, ignore_errors=True)
+        # DEBUG as shipped: the bundle is linked and hashed all the same
+        with override_settings(STATIC_ROOT=static_root, DEBUG=True):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            self.assertTrue(assets.bundle_is_built('storefront'))
+            html = self.render_bundle('storefront')
+
+        self.assertEqual(html.count('<link'), 1)
+        url = re.search(r'href="/static/(electronics/storefront\.bundle\.[0-9a-f]{12}\.css)"', html).group(1)
+        with open(f"{static_root}/{url}", encoding='utf-8') as f:
+            bundle = f.read()
+        self.assertNotIn('/*', bundle)
+        self.assertIn('.account-menu', bundle)
+        for suffix in ('.gz', '.br'):
+            self.assertTrue(os.path.exists(f"{static_root}/{url}{suffix}"), suffix)
@@ -1,9 +1,10 @@
-from django.urls import path
+from django.urls import path, re_path
 from django.conf import settings
 from django.conf.urls.static import static
+from django.views.static import serve
 from django.views.generic import TemplateView
-from . import views
-from .views import SubmitReviewView, ListReviewsView, ReviewDetailView, ReviewThanksView
+from . import async_views, views
+from .views import SubmitReviewView, ReviewThanksView
 
 from django.contrib.auth.decorators import login_required
 from allauth.socialaccount.views import ConnectionsView
@@ -24,14 +25,18 @@ from allauth.account.views import (
 )
 
 from allauth.socialaccount.views import ConnectionsView
+# ASGI deployments serve the read-heavy pages from native async views
+read_views = async_views if settings.ASYNC_VIEWS else views
+
 urlpatterns = [
 
     path("", views.main, name="main-page"),
-    path("laptops/", views.laptops, name="laptops-list"),
-    path("about-us/", views.about_us, name="about-us"),
+    path("laptops/", read_views.laptops, name="laptops-list"),
+    path("search/", views.product_search, name="product-search"),
+    path("about-us/", read_views.about_us, name="about-us"),
 
 
-    path("product/<int:pk>/", views.product_detail, name="product-detail"),
+    path("product/<int:pk>/", read_views.product_detail, name="product-detail"),
 
 
     path("cart/", views.cart, name="electronics-cart"),
@@ -44,14 +49,19 @@ urlpatterns = [
     ),
     path("remove-from-cart/<int:item_id>/", views.remove_from_cart, name="remove_from_cart"),
     path("cart/clear/", views.clear_cart, name="clear_cart"),
+    path("api/cart/", views.cart_api_summary, name="cart_api_summary"),
+    path("api/cart/add/<int:product_id>/", views.cart_api_add, name="cart_api_add"),
+    path("api/cart/subtract/<int:product_id>/", views.cart_api_subtract, name="cart_api_subtract"),
+    path("api/cart/remove/<int:item_id>/", views.cart_api_remove, name="cart_api_remove"),
+    path("api/cart/clear/", views.cart_api_clear, name="cart_api_clear"),
     path("checkout/", views.checkout, name="checkout"),
     path("order-success/", views.order_success, name="order_success"),
 
 
     path("feedback/", SubmitReviewView.as_view(), name="submit_review"),
     path("feedback/thanks/", ReviewThanksView.as_view(), name="review_thanks"),
-    path("reviews/", ListReviewsView.as_view(), name="review_list"),
-    path("reviews/<int:pk>/", ReviewDetailView.as_view(), name="review_detail"),
+    path("reviews/", read_views.ListReviewsView.as_view(), name="review_list"),
+    path("reviews/<int:pk>/", read_views.ReviewDetailView.as_view(), name="review_detail"),
     path(
         "reviews/<int:review_id>/like/",
         views.toggle_review_like,
@@ -61,11 +71,13 @@ urlpatterns = [
 
     path(
         "contact-support/",
-        TemplateView.as_view(template_name="electronics/contact_support.html"),
+        TemplateView.as_view(template_name="contact_support.html"),
         name="contact_support",
     ),
 
 
+    path("metrics/", views.metrics_export, name="metrics"),
+    path("reports/sales/", views.sales_report, name="sales_report"),
     path("debug-google/", views.debug_google_url, name="debug_google"),
     path("forgotpass/", views.forgotpass, name="forgotpass"),
 
@@ -86,13 +98,13 @@ urlpatterns = [
     path("accounts/password/reset/key/<uidb36>/<key>/", PasswordResetFromKeyView.as_view(), name="account_reset_password_from_key"),
     path("accounts/password/reset/key/done/", PasswordResetFromKeyDoneView.as_view(), name="account_reset_password_from_key_done"),
    
-path('policy/', TemplateView.as_view(template_name='privacy.html'), name='policy'),
+path('policy/', views.StaticPageView.as_view(template_name='privacy.html'), name='policy'),
     
 
 
 path("account/connections/", views.socialaccount_connections, name="socialaccount_connections"),
-    path('terms/', TemplateView.as_view(template_name='terms.html'), name='terms'),
-    path('privacy/', TemplateView.as_view(template_name='privacy.html'), name='privacy'),
+    path('terms/', views.StaticPageView.as_view(template_name='terms.html'), name='terms'),
+    path('privacy/', views.StaticPageView.as_view(template_name='privacy.html'), name='privacy'),
 
 
 ]
@@ -100,3 +112,8 @@ path("account/connections/", views.socialaccount_connections, name="socialaccoun
 
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+elif settings.SERVE_MEDIA:
+    # static() does nothing without DEBUG, and nothing else serves media/ yet
+    urlpatterns += [
+        re_path(rf'^{settings.MEDIA_URL.lstrip("/")}(?P<path>.*)$', serve, {'document_root': settings.MEDIA_ROOT}),
+    ]
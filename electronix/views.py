@@ -1,17 +1,36 @@
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
 from django.shortcuts import render, get_object_or_404, redirect
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.urls import reverse_lazy
-from allauth.account.views import LoginView, SignupView
-from .models import Product, Customer, Order, OrderProduct, Review, FounderInfo, ReviewLike
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.crypto import constant_time_compare
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.utils.http import http_date, urlencode
+from allauth.account.views import SignupView
+from .models import Product, Review, FounderInfo, ReviewLike
+from .customers import get_customer
+from .catalog import DEFAULT_SORT, SORTS, get_catalog_page, overlay_cart
+from . import cart as cart_service, metrics, reports
+from .recommendations import related_products
+from .likes import pending_likes, toggle_like
+from .fragments import static_page
+from .inventory import OutOfStock, overlay_stock
+from .reviews import get_review_page
+from .search import search_products
+from .stats import get_rating_summary, get_storefront_stats
 from django.contrib import messages
 from django.views.generic import ListView, DetailView, CreateView, TemplateView
-from django.views import View
-from django.http import HttpResponseRedirect, HttpResponse
+from django.http import HttpResponse, Http404, JsonResponse
+from django.views.decorators.http import require_GET, require_POST
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django import forms
-from allauth.socialaccount.models import SocialAccount
 from django.contrib.auth.models import User
-from django.http import HttpResponse
 
 # --- Forms ---
 class ReviewForm(forms.ModelForm):
@@ -29,52 +48,72 @@ class ReviewForm(forms.ModelForm):
             'rating': 'Rating'
         }
 
-# --- Helper function ---
-def get_or_create_customer(user):
-    """Helper function to get or create customer for user"""
-    customer, created = Customer.objects.get_or_create(user=user)
-    return customer
-
 # --- Basic Views ---
 def main(request):
     return render(request, "electronics/first.html")
 
+class StaticPageView(TemplateView):
+    """TemplateView for pages that are the same for every visitor, cached whole and revalidated with 304s"""
+    def get(self, request, *args, **kwargs):
+        body, etag, modified = static_page(self.template_name)
+        response = get_conditional_response(request, etag=etag, last_modified=modified)
+        if response is None:
+            response = HttpResponse(body)
+        response.headers['ETag'] = etag
+        response.headers['Last-Modified'] = http_date(modified)
+        patch_cache_control(response, public=True, max_age=300)
+        return response
+
 def forgotpass(request):
-    return render(request, "electronics/forgotpass.html")
+    # old link, the password reset lives in allauth now
+    return redirect('account_reset_password')
 
 @login_required(login_url='account_login')
 def laptops(request):
-    products = Product.objects.filter(is_active=True).order_by('-created_date')
-    customer = get_or_create_customer(request.user)
-    order = Order.objects.filter(customer=customer, status='cart').first()
-
-    if order:
-        order_items = order.order_items.all()
-        order_items_dict = {item.product.id: item for item in order_items}
-        for product in products:
-            product.cart_item = order_items_dict.get(product.id)
-    else:
-        for product in products:
-            product.cart_item = None
+    sort = request.GET.get('sort', DEFAULT_SORT)
+    if sort not in SORTS:
+        sort = DEFAULT_SORT
+    cursor = request.GET.get('cursor')
+    page = get_catalog_page(sort, cursor)
+    products = page['products']
+    overlay_cart(products, request.user)
+    overlay_stock(products)
+
+    next_cursor = page['next_cursor']
+    return render(request, "electronics/products_page.html", {
+        'products': products,
+        'next_url': '?' + urlencode({'sort': sort, 'cursor': next_cursor}) if next_cursor else None,
+        'first_url': '?' + urlencode({'sort': sort}) if cursor else None,
+    })
 
-    cart_item_count = order.order_items.count() if order else 0
+@login_required(login_url='account_login')
+def product_search(request):
+    query = request.GET.get('q', '').strip()
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+    products, has_next = search_products(query, page)
+    overlay_cart(products, request.user)
+    overlay_stock(products)
 
     return render(request, "electronics/products_page.html", {
         'products': products,
-        'cart_item_count': cart_item_count
+        'query': query,
+        'next_url': '?' + urlencode({'q': query, 'page': page + 1}) if has_next else None,
+        'first_url': '?' + urlencode({'q': query}) if page > 1 else None,
     })
 
 def about_us(request):
-    founders = FounderInfo.objects.filter(is_active=True).order_by('created_date')
-    total_products = Product.objects.filter(is_active=True).count()
-    total_orders = Order.objects.filter(status__in=['processing', 'shipped', 'completed']).count()
-    total_reviews = Review.objects.filter(is_approved=True).count()
+    # read inside the cached founder grid only, from the primary like every cache fill
+    founders = FounderInfo.objects.using(DEFAULT_DB_ALIAS).filter(is_active=True).order_by('created_date')
+    counters = get_storefront_stats()
     
     context = {
         'founders': founders,
-        'total_products': total_products,
-        'total_orders': total_orders,
-        'total_reviews': total_reviews,
+        'total_products': counters['active_products'],
+        'total_orders': counters['placed_orders'],
+        'total_reviews': counters['approved_reviews'],
     }
     return render(request, 'electronics/about_us.html', context)
 
@@ -82,140 +121,153 @@ def about_us(request):
 @login_required
 def create_order(request, product_id):
     product = get_object_or_404(Product, id=product_id)
-    customer = get_or_create_customer(request.user)
-    
-    order, created = Order.objects.get_or_create(
-        customer=customer, 
-        status='cart',
-        defaults={'total_price': 0}
-    )
-    
-    order_item, item_created = OrderProduct.objects.get_or_create(
-        order=order,
-        product=product,
-        defaults={'quantity': 1, 'price': product.price}
-    )
-    
-    if not item_created:
-        order_item.quantity += 1
-        order_item.save()
-    
-    order.update_total() # Calling the method from models.py
+    customer = request.customer
+    cart_service.add_to_cart(customer, product)
     messages.success(request, f"✅ {product.name} added to cart!")
     return redirect('laptops-list')
 
 @login_required
 def update_cart(request, product_id, action):
-    customer = get_or_create_customer(request.user)
-    order = Order.objects.filter(customer=customer, status='cart').first()
-    if not order:
-        order = Order.objects.create(customer=customer, status='cart', total_price=0)
-    
+    customer = request.customer
     product = get_object_or_404(Product, id=product_id)
-    order_item, created = OrderProduct.objects.get_or_create(
-        order=order, product=product, defaults={'quantity': 1, 'price': product.price}
-    )
-    
+
     if action == 'add':
-        order_item.quantity += 1
-        order_item.save()
+        cart_service.add_to_cart(customer, product)
         messages.success(request, f"➕ Added {product.name}")
     elif action == 'subtract':
-        if order_item.quantity > 1:
-            order_item.quantity -= 1
-            order_item.save()
+        remaining = cart_service.subtract_from_cart(customer, product)
+        if remaining:
             messages.success(request, f"➖ Removed {product.name}")
-        else:
-            order_item.delete()
+        elif remaining == 0:
             messages.success(request, f"🗑️ Removed {product.name}")
-    
-    if order.order_items.count() == 0:
-        order.delete()
-    else:
-        order.update_total()
     return redirect('laptops-list')
 
 @login_required
 def update_cart_in_cart(request, product_id, action):
-    customer = get_or_create_customer(request.user)
-    order = Order.objects.filter(customer=customer, status='cart').first()
+    customer = request.customer
     product = get_object_or_404(Product, id=product_id)
-    order_item = get_object_or_404(OrderProduct, order=order, product=product)
-    
+
     if action == 'add':
-        order_item.quantity += 1
-        order_item.save()
+        cart_service.add_to_cart(customer, product)
     elif action == 'subtract':
-        if order_item.quantity > 1:
-            order_item.quantity -= 1
-            order_item.save()
-        else:
-            order_item.delete()
-    
-    if order.order_items.count() == 0:
-        order.delete()
-    else:
-        order.update_total()
+        if cart_service.subtract_from_cart(customer, product) is None:
+            raise Http404("Product is not in the cart")
     return redirect('electronics-cart')
 
 @login_required
 def cart(request):
-    customer = get_or_create_customer(request.user)
-    order = Order.objects.filter(customer=customer, status='cart').first()
-    if not order or order.order_items.count() == 0:
+    customer = request.customer
+    order = cart_service.get_cart(customer)
+    if not order or order.line_count == 0:
         return render(request, 'electronics/cart.html', {'empty_cart': True})
     
-    items = order.order_items.all()
-    total_items = sum(item.quantity for item in items)
+    items = order.order_items.select_related('product')
     return render(request, 'electronics/cart.html', {
-        'order': order, 'items': items, 'total_items': total_items, 'empty_cart': False
+        'order': order, 'items': items, 'total_items': order.unit_count, 'empty_cart': False
     })
 
 @login_required
 def remove_from_cart(request, item_id):
-    customer = get_or_create_customer(request.user)
-    try:
-        order_item = OrderProduct.objects.get(id=item_id, order__customer=customer)
-        order = order_item.order
-        order_item.delete()
-        if order.order_items.count() == 0:
-            order.delete()
-        else:
-            order.update_total()
+    customer = request.customer
+    if cart_service.remove_line(customer, item_id):
         messages.success(request, "🗑️ Item removed")
-    except OrderProduct.DoesNotExist:
+    else:
         messages.error(request, "Item not found")
     return redirect('electronics-cart')
 
 @login_required
 def clear_cart(request):
-    customer = get_or_create_customer(request.user)
-    order = Order.objects.filter(customer=customer, status='cart').first()
-    if order:
-        order.delete()
+    customer = request.customer
+    if cart_service.clear_cart(customer):
         messages.success(request, "🗑️ Cart cleared")
     return redirect('electronics-cart')
 
 @login_required
 def checkout(request):
-    customer = get_or_create_customer(request.user)
-    order = Order.objects.filter(customer=customer, status='cart').first()
-    if not order or order.order_items.count() == 0:
+    customer = request.customer
+    order = cart_service.get_cart(customer)
+    if not order or order.line_count == 0:
         return redirect('electronics-cart')
     if request.method == 'POST':
-        order.status = 'pending'
-        order.save()
-        return redirect('order_success')
+        try:
+            placed = cart_service.checkout(customer)
+        except OutOfStock as exc:
+            messages.error(request, f"Not enough stock left for {exc}, please update your cart")
+            return redirect('electronics-cart')
+        return redirect('order_success' if placed else 'electronics-cart')
     return render(request, 'electronics/checkout.html', {'order': order})
 
 @login_required
 def order_success(request):
     return render(request, 'electronics/order_success.html')
 
+# --- Cart API ---
+# The +/- and remove buttons post here from static/electronics/cart.js and patch
+# the page in place; the form views above stay as the no-JS fallback.
+
+def _cart_api(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': "Log in to use the cart"}, status=401)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+def _money(value):
+    return f"{value:.2f}"
+
+def _cart_json(item, summary, status=200):
+    line = item and {
+        'id': item.id, 'product': item.product_id, 'quantity': item.quantity,
+        'subtotal': _money(item.subtotal),
+    }
+    return JsonResponse({
+        'line': line,
+        'cart': {'lines': summary.lines, 'units': summary.units, 'total': _money(summary.total)},
+    }, status=status)
+
+def _line_missing():
+    return JsonResponse({'error': "Item not found"}, status=404)
+
+@require_GET
+@_cart_api
+def cart_api_summary(request):
+    return _cart_json(None, cart_service.get_cart_summary(request.user))
+
+@require_POST
+@_cart_api
+def cart_api_add(request, product_id):
+    product = get_object_or_404(Product.objects.only('id', 'price'), id=product_id)
+    cart_service.add_to_cart(request.customer, product)
+    return _cart_json(*cart_service.cart_state(request.customer, product_id=product_id))
+
+@require_POST
+@_cart_api
+def cart_api_subtract(request, product_id):
+    if cart_service.subtract_from_cart(request.customer, Product(id=product_id)) is None:
+        return _line_missing()
+    return _cart_json(*cart_service.cart_state(request.customer, product_id=product_id))
+
+@require_POST
+@_cart_api
+def cart_api_remove(request, item_id):
+    if not cart_service.remove_line(request.customer, item_id):
+        return _line_missing()
+    return _cart_json(*cart_service.cart_state(request.customer))
+
+@require_POST
+@_cart_api
+def cart_api_clear(request):
+    cart_service.clear_cart(request.customer)
+    return _cart_json(None, cart_service.EMPTY_SUMMARY)
+
 def product_detail(request, pk):
     product = get_object_or_404(Product, pk=pk)
-    related_products = Product.objects.filter(is_active=True).exclude(id=product.id).order_by('?')[:4]
-    return render(request, 'electronics/detail.html', {'product': product, 'related_products': related_products})
+    # the row was just read, no need for the cached snapshot the cards use
+    overlay_stock([product], {product.id: product.stock})
+    return render(request, 'electronics/detail.html', {
+        'product': product, 'related_products': related_products(product)
+    })
 
 # --- Reviews Views ---
 class SubmitReviewView(LoginRequiredMixin, CreateView):
@@ -224,7 +276,7 @@ class SubmitReviewView(LoginRequiredMixin, CreateView):
     template_name = 'electronics/review_form.html'
     success_url = reverse_lazy('review_thanks')
     def form_valid(self, form):
-        form.instance.customer = get_or_create_customer(self.request.user)
+        form.instance.customer = self.request.customer
         return super().form_valid(form)
 
 class ReviewThanksView(TemplateView):
@@ -238,18 +290,28 @@ class ListReviewsView(ListView):
     model = Review
     template_name = 'electronics/review_list.html'
     context_object_name = 'reviews'
-    paginate_by = 10
     def get_queryset(self):
-        return Review.objects.filter(is_approved=True).order_by('-created_date')
+        self.cursor = self.request.GET.get('cursor')
+        self.page = get_review_page(self.cursor)
+        return self.page['reviews']
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        next_cursor = self.page['next_cursor']
+        context['next_url'] = '?' + urlencode({'cursor': next_cursor}) if next_cursor else None
+        context['first_url'] = '?' if self.cursor else None
+        context['rating_summary'] = get_rating_summary()
+        return context
 
 class ReviewDetailView(DetailView):
     model = Review
     template_name = 'electronics/review_detail.html'
     context_object_name = 'review'
+    queryset = Review.objects.select_related('customer__user')
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        self.object.likes += pending_likes(self.object.id)
         if self.request.user.is_authenticated:
-            customer = get_or_create_customer(self.request.user)
+            customer = self.request.customer
             context['has_liked'] = ReviewLike.objects.filter(review=self.object, customer=customer).exists()
         else:
             context['has_liked'] = False
@@ -257,16 +319,12 @@ class ReviewDetailView(DetailView):
 
 @login_required
 def toggle_review_like(request, review_id):
-    review = get_object_or_404(Review, id=review_id)
-    customer = get_or_create_customer(request.user)
-    like, created = ReviewLike.objects.get_or_create(review=review, customer=customer)
-    if not created:
-        like.delete()
-        messages.info(request, "Removed like")
-    else:
+    review = get_object_or_404(Review.objects.only('id'), id=review_id)
+    customer = request.customer
+    if toggle_like(review.id, customer):
         messages.success(request, "Liked review!")
-    review.likes = ReviewLike.objects.filter(review=review).count()
-    review.save()
+    else:
+        messages.info(request, "Removed like")
     return redirect('review_detail', pk=review_id)
 
 # --- Account / Social Views ---
@@ -285,9 +343,42 @@ class CustomSignupView(SignupView):
     success_url = reverse_lazy('laptops-list')
     def form_valid(self, form):
         response = super().form_valid(form)
-        get_or_create_customer(self.user)
+        # the user_signed_up receiver made the row, this warms the request cache
+        get_customer(self.user)
         return response
 
+# --- Monitoring ---
+def _metrics_scraper(request):
+    # REMOTE_ADDR proves nothing behind a reverse proxy, the scraper sends a token instead
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    sent = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    return bool(token) and constant_time_compare(sent, token)
+
+def metrics_export(request):
+    """Expose in-process request metrics to staff or to a scraper holding METRICS_TOKEN"""
+    if not (request.user.is_staff or _metrics_scraper(request)):
+        raise Http404
+    if request.GET.get('format') == 'json':
+        return HttpResponse(metrics.registry.to_json(), content_type='application/json')
+    return HttpResponse(metrics.registry.to_prometheus(), content_type='text/plain; version=0.0.4')
+
+# --- Reporting ---
+REPORT_DAYS = 30
+
+def _report_date(value):
+    try:
+        return parse_date(value or '')
+    except ValueError:
+        return None
+
+@staff_member_required
+def sales_report(request):
+    """Revenue, top sellers, basket size and status funnel, read from the daily rollups"""
+    end = _report_date(request.GET.get('end')) or timezone.localdate()
+    start = _report_date(request.GET.get('start')) or end - timedelta(days=REPORT_DAYS - 1)
+    start, end = min(start, end), max(start, end)
+    return render(request, 'electronics/sales_report.html', {'report': reports.sales_report(start, end)})
+
 def debug_google_url(request):
     return HttpResponse("Debug: Google callback check.")
 def create_admin_account(request):
@@ -9,8 +9,34 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 
 import os
 
+from asgiref.wsgi import WsgiToAsgi
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'electronix_shop.settings')
+os.environ.setdefault('ASYNC_VIEWS', '1')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from django.conf import settings  # noqa: E402
+from whitenoise import WhiteNoise  # noqa: E402
+
+
+def _not_found(environ, start_response):
+    start_response('404 Not Found', [('Content-Type', 'text/plain')])
+    return [b'Not Found']
+
+
+# WhiteNoise only speaks WSGI, so it serves STATIC_URL here, on a thread per
+# static file, and the Django middleware chain stays async for every page
+STATIC_PREFIX = '/' + settings.STATIC_URL.strip('/') + '/'
+static_files = WsgiToAsgi(WhiteNoise(
+    _not_found, root=settings.STATIC_ROOT, prefix=STATIC_PREFIX,
+    immutable_file_test=settings.WHITENOISE_IMMUTABLE_FILE_TEST,
+))
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'].startswith(STATIC_PREFIX):
+        await static_files(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -15,7 +15,10 @@ from pathlib import Path
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 import os
+import tempfile
 import dj_database_url # Make sure this is imported!
+from dotenv import load_dotenv
+load_dotenv()
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
@@ -37,6 +40,8 @@ INSTALLED_APPS = [
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
+    # runserver leaves /static/ to WhiteNoise, which also finds the hashed bundles
+    'whitenoise.runserver_nostatic',
     'django.contrib.staticfiles',
 
     # Your apps
@@ -51,11 +56,17 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'electronix.metrics.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # serves the hashed, pre-compressed files from STATIC_ROOT with far-future
+    # caching; it is sync only, so under ASGI asgi.py serves them instead
+    'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'electronix.customers.CustomerMiddleware',
+    'electronix.routers.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'allauth.account.middleware.AccountMiddleware',
@@ -63,9 +74,19 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'electronix_shop.urls'
 
+# Route the read-heavy storefront pages to electronix.async_views; asgi.py turns
+# this on so those pages never borrow a thread per request under ASGI
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', '0') == '1'
+# left out of the ASGI middleware chain: Django would run each request's whole
+# chain on a worker thread to call one of them
+SYNC_ONLY_MIDDLEWARE = ['whitenoise.middleware.WhiteNoiseMiddleware']
+if ASYNC_VIEWS:
+    MIDDLEWARE = [name for name in MIDDLEWARE if name not in SYNC_ONLY_MIDDLEWARE]
+
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates that reports render time to PerformanceMiddleware
+        'BACKEND': 'electronix.metrics.InstrumentedDjangoTemplates',
         'DIRS': [BASE_DIR / 'electronix' / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -73,6 +94,8 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'electronix.context_processors.cart_summary',
+                'electronix.context_processors.fragment_versions',
             ],
         },
     },
@@ -84,14 +107,90 @@ WSGI_APPLICATION = 'electronix_shop.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': dj_database_url.config(
-        # This line is the magic: it looks for DATABASE_URL on Render
-        # If it doesn't find it (like on your laptop), it uses SQLite
-        default='sqlite:///' + os.path.join(BASE_DIR, 'db.sqlite3'),
-        conn_max_age=600
+try:
+    import psycopg_pool
+except ImportError:  # psycopg2 only, no pooling
+    psycopg_pool = None
+
+DATABASE_POOL_SIZE = int(os.environ.get('DATABASE_POOL_SIZE', '10'))
+
+
+def database(env, default=None):
+    config = dj_database_url.config(
+        env=env,
+        default=default,
+        # ASGI runs each request's ORM work on a fresh thread, persistent
+        # per-thread connections would pile up instead of being reused
+        conn_max_age=0 if ASYNC_VIEWS else 600,
+        # a connection the server dropped is replaced instead of failing a
+        # request; with the pool below, each connection is checked before it is lent
+        conn_health_checks=True,
     )
+    if config.get('ENGINE') == 'django.db.backends.postgresql' and psycopg_pool:
+        # one psycopg pool per process, shared by every thread, in place of
+        # persistent per-thread connections
+        config['CONN_MAX_AGE'] = 0
+        config.setdefault('OPTIONS', {})['pool'] = {
+            'min_size': 2,
+            'max_size': DATABASE_POOL_SIZE,
+            'timeout': 10,
+        }
+    return config
+
+
+DATABASES = {
+    # DATABASE_URL on Render, SQLite on your laptop
+    'default': database('DATABASE_URL', 'sqlite:///' + os.path.join(BASE_DIR, 'db.sqlite3')),
 }
+# The read-only storefront pages read from REPLICA_DATABASE_URL when it is set
+# (electronix.routers); everything else stays on the primary
+READ_REPLICA = None
+if os.environ.get('REPLICA_DATABASE_URL'):
+    DATABASES['replica'] = database('REPLICA_DATABASE_URL')
+    READ_REPLICA = 'replica'
+DATABASE_ROUTERS = ['electronix.routers.ReplicaRouter']
+
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    # Take the write lock when a transaction starts so concurrent cart writes
+    # wait on the busy timeout instead of failing on a lock upgrade
+    DATABASES['default']['OPTIONS'] = {'transaction_mode': 'IMMEDIATE', 'timeout': 20}
+    DATABASES['default']['TEST'] = {'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3')}
+    if 'replica' not in DATABASES:
+        # a second connection to the same file, routed to only when READ_REPLICA
+        # is set; its test database is separate, the replica stand-in for tests
+        DATABASES['replica'] = {
+            **DATABASES['default'],
+            'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+            'TEST': {'NAME': os.path.join(BASE_DIR, 'test_replica.sqlite3')},
+        }
+
+# Cache: sessions, cart summaries, catalog pages and template fragments.
+# REDIS_URL shares it between hosts (needs the redis package); otherwise a file
+# cache in CACHE_DIR (a temp directory by default) shares it between the worker
+# processes of one host, so an invalidation in one worker reaches the others.
+# The tests keep theirs in memory (test_settings.py).  No DatabaseCache: the
+# async views would block on it.
+if os.environ.get('REDIS_URL'):
+    CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+    }}
+else:
+    CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CACHE_DIR', os.path.join(tempfile.gettempdir(), 'electronix-cache')),
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    }}
+
+# Sessions are read from the cache and written through to the database, so a
+# cleared cache or a cache restart never logs anybody out
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+# Flash messages travel in a signed cookie and never touch the session
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
+# /metrics/ is open to staff, and to a scraper sending "Authorization: Bearer
+# <METRICS_TOKEN>"; without a token only staff can read it
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -131,6 +230,16 @@ STATIC_URL = 'static/'
 # Add this line right here
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# collectstatic builds the CSS bundles (electronix.assets), content-hashes every
+# file into a manifest and writes .gz/.br variants next to them
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'electronix.assets.BundledStaticFilesStorage'},
+}
+# collectstatic's content-hashed names never change, so WhiteNoise caches them
+# for good; its own test asks the manifest storage, which skips hashing under DEBUG
+WHITENOISE_IMMUTABLE_FILE_TEST = r'^.+\.[0-9a-f]{12}\..+$'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -153,9 +262,6 @@ LOGOUT_REDIRECT_URL = '/'
 SIGNUP_REDIRECT_URL = '/laptops/'  
 #app name google oath Electronixx
 
-import os
-from dotenv import load_dotenv
-load_dotenv()
 SOCIALACCOUNT_PROVIDERS = {
     'google': {
         'SCOPE': ['profile', 'email'],
@@ -193,5 +299,8 @@ SOCIALACCOUNT_ADAPTER = 'allauth.socialaccount.adapter.DefaultSocialAccountAdapt
 # Media files (Uploaded images)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Render has no file server in front of media/, so Django serves it even
+# without DEBUG; set SERVE_MEDIA=0 once media/ moves to a real media host
+SERVE_MEDIA = os.environ.get('SERVE_MEDIA', '1') == '1'
 ACCOUNT_EMAIL_VERIFICATION = 'none' # Don't wait for email confirmation
 ACCOUNT_LOGIN_ON_SIGNUP = True
@@ -0,0 +1,11 @@
+"""Settings for `manage.py test`: the production settings with a cache private to the test process"""
+
+from .settings import *  # noqa: F401,F403
+
+# the configured file cache is shared with any server on this host; tests
+# clear the cache and would wipe, or read, its entries
+CACHES = {'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'electronix',
+    'OPTIONS': {'MAX_ENTRIES': 10000},
+}}
@@ -6,7 +6,8 @@ import sys
 
 def main():
     """Run administrative tasks."""
-    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'electronix_shop.settings')
+    test = sys.argv[1:2] == ['test']
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'electronix_shop.test_settings' if test else 'electronix_shop.settings')
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc: